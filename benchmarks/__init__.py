@@ -0,0 +1,6 @@
+'''
+Package with the benchmarks of the api and of the pipeline components
+
+Author: Vitor Abdo
+Date: October/2026
+'''
@@ -0,0 +1,143 @@
+'''
+Benchmark of the consolidation of the raw files in the trusted data
+step. It times the old append loop, the single pass concatenation and
+the bounded memory streaming mode from 10 to 10000 input files and
+saves the time curve in a json file
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable, List
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    filemode='w',
+    format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_trusted_step():
+    '''Import the trusted data component from its folder'''
+    spec = importlib.util.spec_from_file_location(
+        'upload_trusted_data',
+        os.path.join(ROOT_DIR, 'components', '02_upload_trusted_data', 'upload_trusted_data.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_raw_files(folder: str, n_files: int, rows_per_file: int, seed: int = 42) -> None:
+    '''Write n_files raw csv files shaped like the daily drops'''
+    rng = np.random.default_rng(seed)
+    corporations = [''.join(name) for name in rng.choice(list('abcdefghijklmnopqrstuvwxyz'), (500, 4))]
+    for i in range(n_files):
+        pd.DataFrame({
+            'corporation': rng.choice(corporations, rows_per_file),
+            'lastmonth_activity': rng.integers(0, 2000, rows_per_file),
+            'lastyear_activity': rng.integers(0, 15000, rows_per_file),
+            'number_of_employees': rng.integers(0, 1500, rows_per_file),
+            'exited': rng.integers(0, 2, rows_per_file)}).to_csv(
+                os.path.join(folder, f'dataset{i}.csv'))
+
+
+def append_loop(data_directory: List[str]) -> pd.DataFrame:
+    '''The consolidation before the single pass rewrite: the dataframe grows
+    file by file, so every file copies all the rows read before it'''
+    pdf = pd.DataFrame(
+        columns=['corporation', 'lastmonth_activity', 'lastyear_activity', 'number_of_employees', 'exited'])
+    for directory in data_directory:
+        for each_filename in os.listdir(directory):
+            if each_filename.endswith('.csv'):
+                current_pdf = pd.read_csv(directory + '/' + each_filename)
+                pdf = pd.concat([pdf, current_pdf]).reset_index(drop=True)
+
+    pdf.drop([col for col in pdf.columns if 'Unnamed' in col], axis=1, inplace=True)
+    pdf.drop_duplicates(inplace=True)
+    return pdf
+
+
+def measure(function: Callable, *args, trace_memory: bool = False) -> dict:
+    '''Time a function and, in a second run, trace the peak of the memory
+    it allocates, since tracing slows pandas down a lot'''
+    start = perf_counter()
+    function(*args)
+    result = {'seconds': perf_counter() - start}
+
+    if trace_memory:
+        tracemalloc.start()
+        function(*args)
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def benchmark(args: argparse.Namespace) -> List[dict]:
+    '''Run every consolidation on each number of files'''
+    trusted_step = load_trusted_step()
+    results = []
+    for n_files in args.files:
+        with tempfile.TemporaryDirectory() as work_dir:
+            raw_dir = os.path.join(work_dir, 'raw')
+            os.makedirs(raw_dir)
+            write_raw_files(raw_dir, n_files, args.rows_per_file)
+
+            result = {'files': n_files, 'rows': n_files * args.rows_per_file}
+            if n_files <= args.max_append_files:
+                result['append_loop'] = measure(
+                    append_loop, [raw_dir], trace_memory=args.trace_memory)
+            result['single_pass'] = measure(
+                trusted_step.transform_raw_data, [raw_dir], trace_memory=args.trace_memory)
+            result['streaming'] = measure(
+                trusted_step.stream_raw_data, [raw_dir],
+                os.path.join(work_dir, 'trusted.csv'), os.path.join(work_dir, 'dataset.csv'),
+                args.chunk_size, trace_memory=args.trace_memory)
+
+        logging.info(f'{n_files} files: {json.dumps(result)}')
+        results.append(result)
+    return results
+
+
+def table(results: List[dict]) -> str:
+    '''Time curve of the modes, one row for each number of files'''
+    modes = ['append_loop', 'single_pass', 'streaming']
+    lines = [f'{"files":>8}{"rows":>10}' + ''.join(f'{mode + " (s)":>18}' for mode in modes)]
+    for result in results:
+        lines.append(f'{result["files"]:>8}{result["rows"]:>10}' + ''.join(
+            f'{result[mode]["seconds"]:>18.3f}' if mode in result else f'{"-":>18}'
+            for mode in modes))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    sys.path.append(ROOT_DIR)
+    from benchmarks.load_test import git_commit
+
+    parser = argparse.ArgumentParser(description='Benchmark the consolidation of the raw files')
+    parser.add_argument('--files', type=int, nargs='+', default=[10, 100, 1000, 10000], help='Numbers of input files')
+    parser.add_argument('--rows_per_file', type=int, default=20, help='Rows of each raw file')
+    parser.add_argument('--chunk_size', type=int, default=10000, help='Rows of each chunk of the streaming mode')
+    parser.add_argument('--max_append_files', type=int, default=10000, help='Largest run of the old append loop')
+    parser.add_argument('--trace_memory', action='store_true', help='Also trace the peak memory of each mode')
+    parser.add_argument('--output', type=str, default='consolidation_results.json', help='Json file for the results')
+    args = parser.parse_args()
+
+    logging.info('About to start the consolidation benchmark')
+    results = benchmark(args)
+    with open(args.output, 'w') as output_file:
+        json.dump({'git_commit': git_commit(), 'config': vars(args), 'results': results}, output_file, indent=2)
+    print(table(results))
+    logging.info(f'Saved the results to {args.output}')
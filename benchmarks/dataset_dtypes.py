@@ -0,0 +1,121 @@
+'''
+Benchmark of the compact types of the loaded datasets. It loads the
+same scaled up dataset with the types pandas infers and with the
+DATASET_DTYPES of components/dataset_format.py, each load in a fresh
+process, and compares the load times, the peak memory of the loads
+and the memory of the loaded frames
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from time import perf_counter
+from typing import List
+import pandas as pd
+import pyarrow.parquet as pq
+
+logging.basicConfig(
+    level=logging.INFO,
+    filemode='w',
+    format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from components.dataset_format import DATASET_COLUMNS, DATASET_FORMATS, read_dataset, write_dataset
+from components.memory_usage import peak_rss_mb, rss_mb
+
+LOADERS = ('inferred', 'compact')
+
+
+def load(path: str, loader: str) -> pd.DataFrame:
+    '''Load a dataset file with the inferred types, as the loaders did, or with the compact ones'''
+    if loader == 'compact':
+        return read_dataset(path, DATASET_COLUMNS)
+    if path.endswith('.parquet'):
+        return pq.read_table(path).to_pandas()
+    return pd.read_csv(path)
+
+
+def measure(path: str, loader: str) -> dict:
+    '''Time and memory of one load, in the current process'''
+    baseline = rss_mb()
+    start = perf_counter()
+    pdf = load(path, loader)
+    return {
+        'load_seconds': perf_counter() - start,
+        'peak_mb': peak_rss_mb() - baseline,
+        'frame_mb': pdf.memory_usage(deep=True).sum() / 1e6,
+        'columns': len(pdf.columns)}
+
+
+def benchmark(args: argparse.Namespace) -> List[dict]:
+    '''Load the dataset of each format with each loader for each number of rows'''
+    from benchmarks.storage_format import make_dataset
+
+    results = []
+    for n_rows in args.rows:
+        result = {'rows': n_rows}
+        with tempfile.TemporaryDirectory() as work_dir:
+            pdf = make_dataset(n_rows)
+            for file_format in DATASET_FORMATS:
+                path = os.path.join(work_dir, f'train_set.{file_format}')
+                if file_format == 'csv':
+                    # like the old uploads, with the "Unnamed: 0" index
+                    pdf.to_csv(path)
+                else:
+                    write_dataset(pdf, path, file_format)
+            del pdf
+
+            for file_format in DATASET_FORMATS:
+                path = os.path.join(work_dir, f'train_set.{file_format}')
+                for loader in LOADERS:
+                    # a fresh process for each load, so that its peak memory is the one of the load
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--measure', path, loader],
+                        capture_output=True, text=True, check=True, cwd=ROOT_DIR).stdout
+                    result[f'{file_format}_{loader}'] = json.loads(output.strip().splitlines()[-1])
+
+        logging.info(f'{n_rows} rows: {json.dumps(result)}')
+        results.append(result)
+    return results
+
+
+def table(results: List[dict]) -> str:
+    '''Side by side comparison of the loaders, one row for each size and format'''
+    metrics = ['load_seconds', 'peak_mb', 'frame_mb', 'columns']
+    lines = [f'{"rows":>10}{"format":>9}{"loader":>10}' + ''.join(f'{metric:>16}' for metric in metrics)]
+    for result in results:
+        for file_format in DATASET_FORMATS:
+            for loader in LOADERS:
+                lines.append(f'{result["rows"]:>10}{file_format:>9}{loader:>10}' + ''.join(
+                    f'{result[f"{file_format}_{loader}"][metric]:>16.3f}' for metric in metrics))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    from benchmarks.load_test import git_commit
+
+    parser = argparse.ArgumentParser(description='Benchmark the compact types of the loaded datasets')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000, 5000000], help='Numbers of rows')
+    parser.add_argument('--measure', type=str, nargs=2, metavar=('PATH', 'LOADER'), help=argparse.SUPPRESS)
+    parser.add_argument('--output', type=str, default='dataset_dtypes_results.json', help='Json file for the results')
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        sys.exit(0)
+
+    logging.info('About to start the dataset types benchmark')
+    results = benchmark(args)
+    with open(args.output, 'w') as output_file:
+        json.dump({'git_commit': git_commit(), 'config': vars(args), 'results': results}, output_file, indent=2)
+    print(table(results))
+    logging.info(f'Saved the results to {args.output}')
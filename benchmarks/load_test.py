@@ -0,0 +1,250 @@
+'''
+Load testing and latency benchmark of the inference api. It replays a
+request file (or synthetic ModelInput payloads) at a configurable
+concurrency and rate, in-process or against a local uvicorn instance,
+and saves the throughput and latency percentiles in a json file
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from time import perf_counter
+from typing import List
+import httpx
+import numpy as np
+
+logging.basicConfig(
+    level=logging.INFO,
+    filemode='w',
+    format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
+
+PERCENTILES = [50, 95, 99]
+
+
+def synthetic_payloads(n_payloads: int, seed: int = 42) -> List[dict]:
+    '''Generate random ModelInput payloads
+
+    :param n_payloads: (int)
+    Number of payloads
+
+    :param seed: (int)
+    Seed of the random generator, so that two runs replay the same requests
+
+    :return: (list)
+    List of ModelInput dicts
+    '''
+    rng = np.random.default_rng(seed)
+    corporations = [''.join(name) for name in rng.choice(list('abcdefghijklmnopqrstuvwxyz'), (500, 4))]
+    return [
+        {
+            'corporation': corporations[rng.integers(len(corporations))],
+            'lastmonth_activity': int(rng.integers(0, 2000)),
+            'lastyear_activity': int(rng.integers(0, 15000)),
+            'number_of_employees': int(rng.integers(0, 1500))}
+        for _ in range(n_payloads)]
+
+
+def read_payloads(requests_file: str) -> List[dict]:
+    '''Read the payloads of a newline-delimited json file'''
+    with open(requests_file) as payloads_file:
+        return [json.loads(line) for line in payloads_file if line.strip()]
+
+
+async def run_load(
+        client: httpx.AsyncClient,
+        endpoint: str,
+        payloads: List[dict],
+        n_requests: int,
+        concurrency: int,
+        rate: float = 0.0) -> dict:
+    '''Send the requests and measure their latency
+
+    :param client: (AsyncClient)
+    Client connected to the api, in-process or over http
+
+    :param endpoint: (str)
+    Path of the endpoint receiving the payloads
+
+    :param payloads: (list)
+    Payloads replayed in a loop until n_requests are sent
+
+    :param n_requests: (int)
+    Total number of requests
+
+    :param concurrency: (int)
+    Number of requests in flight at the same time
+
+    :param rate: (float)
+    Requests per second. With 0 every worker sends its next request as
+    soon as the previous one finishes. With a rate the requests are
+    scheduled in advance and the latency counts from the scheduled time,
+    so a slow api is not hidden by the requests it delayed
+
+    :return: (dict)
+    Throughput, latency percentiles and status codes
+    '''
+    requests = islice(cycle(payloads), n_requests)
+    latencies, statuses = [], {}
+    sent = 0
+    start = perf_counter()
+
+    async def worker():
+        nonlocal sent
+        for payload in requests:
+            index, sent = sent, sent + 1
+            request_start = perf_counter()
+            if rate > 0:
+                scheduled = start + index / rate
+                await asyncio.sleep(max(0.0, scheduled - request_start))
+                request_start = scheduled
+            try:
+                response = await client.post(endpoint, json=payload)
+                status = str(response.status_code)
+            except httpx.HTTPError as err:
+                status = type(err).__name__
+            latencies.append(perf_counter() - request_start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'status_codes': statuses,
+        'elapsed_seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_ms': {
+            'mean': float(latencies_ms.mean()),
+            **{f'p{p}': float(np.percentile(latencies_ms, p)) for p in PERCENTILES},
+            'max': float(latencies_ms.max())}}
+
+
+async def benchmark(args: argparse.Namespace) -> dict:
+    '''Run the benchmark described by the command line arguments'''
+    payloads = read_payloads(args.requests_file) if args.requests_file \
+        else synthetic_payloads(args.synthetic, args.seed)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        app = None
+    else:
+        from ml_api import app
+        await app.router.startup()
+        client = httpx.AsyncClient(app=app, base_url='http://benchmark', timeout=args.timeout)
+
+    try:
+        status = await client.get('/model/status')
+        model_version = status.json().get('version') if status.status_code == 200 else None
+
+        # requests not measured, so that the results don't count the cold start
+        if args.warmup_requests:
+            await run_load(
+                client, args.endpoint, payloads, args.warmup_requests, args.concurrency)
+
+        results = await run_load(
+            client, args.endpoint, payloads, args.n_requests, args.concurrency, args.rate)
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+
+    return {
+        'label': args.label,
+        'date': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'model_version': model_version,
+        'config': {
+            'target': args.url or 'in-process',
+            'endpoint': args.endpoint,
+            'payloads': args.requests_file or f'synthetic:{args.synthetic}:seed={args.seed}',
+            'n_requests': args.n_requests,
+            'warmup_requests': args.warmup_requests,
+            'concurrency': args.concurrency,
+            'rate': args.rate},
+        'results': results}
+
+
+def git_commit() -> str:
+    '''Current git commit of the repository, if there is one'''
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result_paths: List[str]) -> str:
+    '''Side by side table of saved benchmark results
+
+    :param result_paths: (list)
+    Paths of the json files saved by the benchmark
+
+    :return: (str)
+    The table, one column for each result
+    '''
+    runs = []
+    for result_path in result_paths:
+        with open(result_path) as result_file:
+            runs.append(json.load(result_file))
+
+    rows = [
+        ('label', lambda run: run['label']),
+        ('git commit', lambda run: run['git_commit']),
+        ('model version', lambda run: run['model_version']),
+        ('concurrency', lambda run: run['config']['concurrency']),
+        ('rate', lambda run: run['config']['rate']),
+        ('requests', lambda run: run['results']['requests']),
+        ('errors', lambda run: run['results']['errors']),
+        ('throughput (rps)', lambda run: f"{run['results']['throughput_rps']:.1f}")]
+    rows += [
+        (f'{name} (ms)', lambda run, name=name: f"{run['results']['latency_ms'][name]:.2f}")
+        for name in ['mean'] + [f'p{p}' for p in PERCENTILES] + ['max']]
+
+    return '\n'.join(
+        f'{name:<18}' + ''.join(f'{str(get(run)):>20}' for run in runs)
+        for name, get in rows)
+
+
+if __name__ == '__main__':
+    # the api is imported from the root of the repository
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    parser = argparse.ArgumentParser(description='Load test the inference api')
+    parser.add_argument('--url', type=str, default=None, help='Base url of a running api, in-process if not given')
+    parser.add_argument('--endpoint', type=str, default='/risk_assessment_prediction', help='Endpoint to load')
+    parser.add_argument('--requests_file', type=str, default=None, help='jsonl file with the payloads to replay')
+    parser.add_argument('--synthetic', type=int, default=1000, help='Number of synthetic payloads')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the synthetic payloads')
+    parser.add_argument('--n_requests', type=int, default=5000, help='Total number of requests')
+    parser.add_argument('--warmup_requests', type=int, default=200, help='Requests sent before measuring')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight')
+    parser.add_argument('--rate', type=float, default=0.0, help='Requests per second, 0 for no limit')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Timeout of each request')
+    parser.add_argument('--label', type=str, default='', help='Name of this run in the comparisons')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='Json file for the results')
+    parser.add_argument('--compare', type=str, nargs='+', default=None, help='Saved results to compare')
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare(args.compare))
+    else:
+        logging.info('About to start the load test')
+        report = asyncio.run(benchmark(args))
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+        logging.info(f"Results: {json.dumps(report['results'])}")
+        logging.info(f'Saved the results to {args.output}')
@@ -0,0 +1,103 @@
+'''
+Benchmark of the storage formats of the trusted layer and of the
+dataset artifacts. It writes the same scaled up dataset as csv and
+as parquet and compares the file sizes, the write times and the load
+times of all the columns and of a projection of two of them
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from time import perf_counter
+from typing import List
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    filemode='w',
+    format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+from components.dataset_format import DATASET_COLUMNS, DATASET_FORMATS, read_dataset, write_dataset
+
+PROJECTED_COLUMNS = ['lastmonth_activity', 'exited']
+
+
+def make_dataset(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    '''Dataset shaped like the trusted train set'''
+    rng = np.random.default_rng(seed)
+    corporations = np.array([''.join(name) for name in rng.choice(list('abcdefghijklmnopqrstuvwxyz'), (5000, 4))])
+    return pd.DataFrame({
+        'corporation': rng.choice(corporations, n_rows),
+        'lastmonth_activity': rng.integers(0, 2000, n_rows),
+        'lastyear_activity': rng.integers(0, 15000, n_rows),
+        'number_of_employees': rng.integers(0, 1500, n_rows),
+        'exited': rng.integers(0, 2, n_rows)})
+
+
+def best_time(function, *args, repeat: int = 3, **kwargs) -> float:
+    '''Best of a few runs, in seconds'''
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(*args, **kwargs)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def benchmark(args: argparse.Namespace) -> List[dict]:
+    '''Write and load the dataset in each format for each number of rows'''
+    results = []
+    for n_rows in args.rows:
+        pdf = make_dataset(n_rows)
+        result = {'rows': n_rows}
+        with tempfile.TemporaryDirectory() as work_dir:
+            for file_format in DATASET_FORMATS:
+                path = os.path.join(work_dir, f'train_set.{file_format}')
+                result[file_format] = {
+                    # the trusted layer is written with the row index as the ID
+                    'write_seconds': best_time(write_dataset, pdf, path, file_format, with_id=True, repeat=args.repeat),
+                    'size_mb': os.path.getsize(path) / 1e6,
+                    'load_seconds': best_time(read_dataset, path, DATASET_COLUMNS, repeat=args.repeat),
+                    'projected_load_seconds': best_time(read_dataset, path, PROJECTED_COLUMNS, repeat=args.repeat)}
+
+        logging.info(f'{n_rows} rows: {json.dumps(result)}')
+        results.append(result)
+    return results
+
+
+def table(results: List[dict]) -> str:
+    '''Side by side comparison of the formats, one row for each size'''
+    metrics = ['size_mb', 'write_seconds', 'load_seconds', 'projected_load_seconds']
+    lines = [f'{"rows":>10}{"format":>9}' + ''.join(f'{metric:>24}' for metric in metrics)]
+    for result in results:
+        for file_format in DATASET_FORMATS:
+            lines.append(f'{result["rows"]:>10}{file_format:>9}' + ''.join(
+                f'{result[file_format][metric]:>24.3f}' for metric in metrics))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    from benchmarks.load_test import git_commit
+
+    parser = argparse.ArgumentParser(description='Benchmark the storage formats of the datasets')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000, 5000000], help='Numbers of rows')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each measure, the best one is kept')
+    parser.add_argument('--output', type=str, default='storage_format_results.json', help='Json file for the results')
+    args = parser.parse_args()
+
+    logging.info('About to start the dataset format benchmark')
+    results = benchmark(args)
+    with open(args.output, 'w') as output_file:
+        json.dump({'git_commit': git_commit(), 'config': vars(args), 'results': results}, output_file, indent=2)
+    print(table(results))
+    logging.info(f'Saved the results to {args.output}')
@@ -0,0 +1,238 @@
+'''
+Command line batch scorer: streams a newline-delimited json (or csv) file
+of model inputs in chunks through a pool of worker processes and writes
+the predictions, in order, to an output file. With --top_n it writes only
+the ranking of the records most likely to leave
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import argparse
+import json
+import logging
+import os
+import timeit
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+import numpy as np
+from serving.inference import load_model
+from serving.ranking import TopN
+from serving.records import detect_format, parse_records, read_chunks
+
+logging.basicConfig(
+    level=logging.INFO,
+    filemode='w',
+    format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
+
+# model loaded once by each worker process
+_worker_model = None
+
+
+def init_worker(model_path: str) -> None:
+    '''Load the model once in each worker process'''
+    global _worker_model
+    _worker_model = load_model(model_path)
+
+
+def score_chunk(lines: List[str], input_format: str, output_format: str) -> str:
+    '''Parse and predict one chunk in a worker process
+
+    :param lines: (list)
+    Raw lines of the chunk, the csv ones start with the header
+
+    :param input_format: (str)
+    "jsonl" or "csv"
+
+    :param output_format: (str)
+    "jsonl" or "csv"
+
+    :return: (str)
+    Serialized predictions of the chunk, one line for each record
+    '''
+    features = parse_records(lines, input_format, _worker_model.feature_names)
+    proba = _worker_model.predict_proba(features)
+    classes = _worker_model.classes
+    predictions = classes.take(proba.argmax(axis=1))
+    risk_proba = proba[:, list(classes).index(1)]
+
+    if output_format == 'csv':
+        return ''.join(
+            f'{prediction},{probability:.6f}\n'
+            for prediction, probability in zip(predictions.tolist(), risk_proba.tolist()))
+    return ''.join(
+        json.dumps({'prediction': prediction, 'risk_probability': probability}) + '\n'
+        for prediction, probability in zip(predictions.tolist(), risk_proba.tolist()))
+
+
+def score_file(
+        input_path: str,
+        output_path: str,
+        model_path: str,
+        chunk_size: int = 10000,
+        workers: int = None) -> int:
+    '''Score every record of the input file and write the predictions
+    in the input order
+
+    :param input_path: (str)
+    Path to the newline-delimited json or csv file with the model inputs
+
+    :param output_path: (str)
+    Path of the output file, csv if it ends with .csv and jsonl otherwise
+
+    :param model_path: (str)
+    Path to the model.pkl file
+
+    :param chunk_size: (int)
+    Number of records sent to a worker at a time
+
+    :param workers: (int)
+    Number of worker processes, the number of cores if None
+
+    :return: (int)
+    Number of chunks scored
+    '''
+    input_format = detect_format(input_path)
+    output_format = detect_format(output_path)
+    n_chunks = 0
+
+    with open(output_path, 'w') as output_file:
+        if output_format == 'csv':
+            output_file.write('prediction,risk_probability\n')
+
+        for scored_chunk in map_chunks(
+                score_chunk, input_path, model_path, chunk_size, workers,
+                input_format, output_format):
+            output_file.write(scored_chunk)
+            n_chunks += 1
+
+    return n_chunks
+
+
+def risk_chunk(lines: List[str], input_format: str, id_column: str) -> Tuple[list, np.ndarray]:
+    '''Parse one chunk and compute its risk probabilities in a worker process
+
+    :param lines: (list)
+    Raw lines of the chunk, the csv ones start with the header
+
+    :param input_format: (str)
+    "jsonl" or "csv"
+
+    :param id_column: (str)
+    Column identifying each record
+
+    :return: (tuple)
+    Ids and probabilities of leaving of the records of the chunk
+    '''
+    features = parse_records(
+        lines, input_format, list(dict.fromkeys([id_column] + _worker_model.feature_names)))
+    proba = _worker_model.predict_proba(features)
+    risk_proba = proba[:, list(_worker_model.classes).index(1)]
+    return list(features[id_column]), risk_proba
+
+
+def rank_file(
+        input_path: str,
+        model_path: str,
+        top_n: int,
+        id_column: str = 'corporation',
+        chunk_size: int = 10000,
+        workers: int = None) -> List[dict]:
+    '''Score a whole population and keep only the top_n records most likely
+    to leave, so the memory is O(top_n) and not O(population)
+
+    :param input_path: (str)
+    Path to the newline-delimited json or csv file with the population
+
+    :param model_path: (str)
+    Path to the model.pkl file
+
+    :param top_n: (int)
+    Number of records of the ranking
+
+    :param id_column: (str)
+    Column identifying each record in the ranking
+
+    :param chunk_size: (int)
+    Number of records sent to a worker at a time
+
+    :param workers: (int)
+    Number of worker processes, the number of cores if None
+
+    :return: (list)
+    The ranking, from the highest to the lowest risk
+    '''
+    ranker = TopN(top_n)
+    for ids, risk_proba in map_chunks(
+            risk_chunk, input_path, model_path, chunk_size, workers,
+            detect_format(input_path), id_column):
+        ranker.push(ids, risk_proba)
+    return ranker.ranking()
+
+
+def map_chunks(
+        function, input_path: str, model_path: str, chunk_size: int,
+        workers: int, *args) -> Iterator:
+    '''Apply a function to the chunks of a file in a pool of worker
+    processes and yield the results in the input order. At most two
+    chunks per worker are in flight, so the memory stays flat whatever
+    the input size
+    '''
+    workers = workers or os.cpu_count()
+    max_pending = 2 * workers
+
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(model_path,)) as executor:
+        pending = deque()
+        for lines in read_chunks(input_path, chunk_size, detect_format(input_path)):
+            pending.append(executor.submit(function, lines, *args))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a file of model inputs in bulk')
+    parser.add_argument('input_path', type=str, help='jsonl or csv file with the model inputs')
+    parser.add_argument('output_path', type=str, help='jsonl or csv file for the predictions (or the ranking)')
+    parser.add_argument(
+        '--model_path', type=str,
+        default=os.path.join('prod_deployment_path', 'model.pkl'), help='Path to the model.pkl')
+    parser.add_argument('--chunk_size', type=int, default=10000, help='Records in each chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Number of worker processes')
+    parser.add_argument(
+        '--top_n', type=int, default=None,
+        help='Write only the ranking of the top_n records most likely to leave')
+    parser.add_argument('--id_column', type=str, default='corporation', help='Column identifying the records')
+    args = parser.parse_args()
+
+    logging.info('About to start the bulk scoring')
+    starttime = timeit.default_timer()
+
+    if args.top_n:
+        ranking = rank_file(
+            args.input_path, args.model_path, args.top_n, args.id_column,
+            args.chunk_size, args.workers)
+        with open(args.output_path, 'w') as output_file:
+            if detect_format(args.output_path) == 'csv':
+                output_file.write(f'rank,{args.id_column},risk_probability,row\n')
+                output_file.writelines(
+                    f"{record['rank']},{record['id']},{record['risk_probability']:.6f},{record['row']}\n"
+                    for record in ranking)
+            else:
+                output_file.writelines(json.dumps(record) + '\n' for record in ranking)
+        logging.info(f'Ranked the top {len(ranking)} records')
+    else:
+        chunks = score_file(
+            args.input_path, args.output_path, args.model_path, args.chunk_size, args.workers)
+        logging.info(f'Scored {chunks} chunks')
+
+    timing = timeit.default_timer() - starttime
+    logging.info(f'The execution time of the bulk scoring was: {timing}')
+    logging.info('Done executing the bulk scoring')
@@ -11,23 +11,100 @@ import timeit
 import os
 import sys
 import logging
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
 import pandas as pd
 from google.cloud import storage
 
+# the ingestion manifest is shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestion_manifest import MANIFEST_FILE_NAME, IngestionManifest, file_md5
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
     format='%(name)s - %(levelname)s - %(message)s')
 
-# config
-BUCKET_NAME = sys.argv[1]
-DESTINATION_TRAIN_BLOB_PATH = sys.argv[2]
-DESTINATION_TEST_BLOB_PATH = sys.argv[3]
-TRAIN_DATA_FOLDER_PATH = sys.argv[4]
-TEST_DATA_FOLDER_PATH = sys.argv[5]
 # key code for managing the entire infrastructure
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:/Users/4YouSee/Desktop/personal_work/risk_assessment/risk-assessment-380822-38a40f93abec.json'
 
+# bucket names with this prefix are folders of the local filesystem
+LOCAL_BUCKET_PREFIX = 'file://'
+
+# size of the chunks of the resumable uploads, a multiple of 256 KB
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class LocalBlob:
+    '''Blob of a LocalBucket, a file under the root folder of the bucket'''
+
+    def __init__(self, root_dir: str, name: str, chunk_size: int = None) -> None:
+        self.name = name
+        self.path = os.path.join(root_dir, name)
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def download_as_bytes(self) -> bytes:
+        with open(self.path, 'rb') as blob_file:
+            return blob_file.read()
+
+    def upload_from_string(self, data) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'wb') as blob_file:
+            blob_file.write(data.encode() if isinstance(data, str) else data)
+
+    def upload_from_filename(self, filename: str, content_type: str = None, checksum: str = None) -> None:
+        '''Copy the file chunk by chunk. With a checksum the copy is read
+        back and compared with the md5 of the source, whatever the algorithm'''
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        source_hash = hashlib.md5()
+        with open(filename, 'rb') as source, open(temp_path, 'wb') as blob_file:
+            for chunk in iter(lambda: source.read(self.chunk_size), b''):
+                source_hash.update(chunk)
+                blob_file.write(chunk)
+
+        if checksum and file_md5(temp_path, self.chunk_size) != source_hash.hexdigest():
+            os.remove(temp_path)
+            raise ValueError(f'checksum mismatch on the upload of {filename}')
+        os.replace(temp_path, self.path)
+
+
+class LocalBucket:
+    '''Bucket backed by a local folder, with the part of the
+    google storage bucket api used by this step. Used to run
+    the step without the cloud and to test it
+
+    :param root_dir: (str)
+    Folder where the blobs are written
+    '''
+
+    def __init__(self, root_dir: str) -> None:
+        self.root_dir = root_dir
+
+    def blob(self, blob_name: str, chunk_size: int = None) -> LocalBlob:
+        return LocalBlob(self.root_dir, blob_name, chunk_size)
+
+
+def get_bucket(bucket_name: str):
+    '''Handle of the bucket, shared by all the uploads
+
+    :param bucket_name: (str)
+    Name of the google storage bucket, or file://<folder> for a local bucket
+
+    :return: (bucket)
+    google storage Bucket or LocalBucket
+    '''
+    if bucket_name.startswith(LOCAL_BUCKET_PREFIX):
+        return LocalBucket(bucket_name[len(LOCAL_BUCKET_PREFIX):])
+
+    storage_client = storage.Client()
+    return storage_client.get_bucket(bucket_name)
+
 
 def import_data(file_path: str) -> pd.DataFrame:
     '''Load dataset as a pandas dataframe for the csv found at the path
@@ -49,13 +126,13 @@ def import_data(file_path: str) -> pd.DataFrame:
 
 
 def upload_to_storage(
-        bucket_name: str,
+        bucket,
         data: pd.DataFrame,
         destination_blob_path: str) -> None:
     '''Function that uploads a dataframe into a google storage bucket
 
-    :param bucket_name: (str)
-    Name of the respective bucket
+    :param bucket: (bucket)
+    Handle of the respective bucket, see get_bucket
 
     :param data: (dataframe)
     Dataframe you want to upload
@@ -63,49 +140,290 @@ def upload_to_storage(
     :param destination_blob_path: (str)
     destination path of the file you want to upload to the google storage bucket
     '''
-    storage_client = storage.Client()
-    bucket = storage_client.get_bucket(bucket_name)
     blob = bucket.blob(destination_blob_path)
     blob.upload_from_string(data.to_csv())
 
     return logging.info(
-        'Loading the NEW CSV FILE into the bucket: SUCCESS\n')
+        f'Loading the NEW CSV FILE {destination_blob_path} into the bucket: SUCCESS')
+
+
+def stream_to_storage(
+        bucket,
+        file_path: str,
+        destination_blob_path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        checksum: str = None) -> None:
+    '''Function that uploads the original bytes of a file into a google
+    storage bucket, without parsing it. The large files are sent in a
+    resumable upload of chunk_size bytes per request, so the memory used
+    does not depend on the size of the file
+
+    :param bucket: (bucket)
+    Handle of the respective bucket, see get_bucket
+
+    :param file_path: (str)
+    Path to the file you want to upload
+
+    :param destination_blob_path: (str)
+    destination path of the file you want to upload to the google storage bucket
+
+    :param chunk_size: (int)
+    Bytes sent in each request of the resumable upload, a multiple of 256 KB
+
+    :param checksum: (str)
+    "md5" or "crc32c" to have the checksum of the upload verified
+    against the one computed by the server, None to skip it
+    '''
+    # files smaller than a chunk go in a single request, which holds at most
+    # chunk_size bytes in memory as well
+    if os.path.getsize(file_path) <= chunk_size:
+        blob = bucket.blob(destination_blob_path)
+    else:
+        blob = bucket.blob(destination_blob_path, chunk_size=chunk_size)
+    blob.upload_from_filename(file_path, content_type='text/csv', checksum=checksum)
+
+    return logging.info(
+        f'Streaming the ORIGINAL FILE {destination_blob_path} into the bucket: SUCCESS')
+
+
+def upload_file(
+        bucket,
+        file_path: str,
+        destination_blob_path: str,
+        retries: int = 3,
+        backoff: float = 1.0,
+        mode: str = 'raw',
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        checksum: str = None) -> float:
+    '''Upload one file, retrying the failed attempts with an exponential backoff
+
+    :param bucket: (bucket)
+    Handle of the respective bucket, see get_bucket
+
+    :param file_path: (str)
+    Path to the csv file
+
+    :param destination_blob_path: (str)
+    destination path of the file in the bucket
+
+    :param retries: (int)
+    Number of attempts after the first one fails
+
+    :param backoff: (float)
+    Seconds waited before the first retry, doubled at each new retry
+
+    :param mode: (str)
+    "raw" streams the original bytes of the file, "csv" parses it with
+    pandas and uploads the dataframe written back as csv
+
+    :param chunk_size: (int)
+    Bytes sent in each request of the raw uploads
+
+    :param checksum: (str)
+    "md5" or "crc32c" to verify the raw uploads, None to skip it
+
+    :return: (float)
+    Seconds taken by the upload, retries included
+    '''
+    starttime = timeit.default_timer()
+    for attempt in range(retries + 1):
+        try:
+            if mode == 'raw':
+                stream_to_storage(bucket, file_path, destination_blob_path, chunk_size, checksum)
+            else:
+                data = import_data(file_path)
+                if data is None:
+                    raise FileNotFoundError(file_path)
+                upload_to_storage(bucket, data, destination_blob_path)
+            return timeit.default_timer() - starttime
+
+        except Exception as err:
+            if attempt == retries:
+                raise
+            logging.warning(
+                f'Upload of {file_path} failed ({err}), retry {attempt + 1} of {retries}')
+            time.sleep(backoff * 2 ** attempt)
+
+
+def ingest_file(
+        bucket,
+        file_path: str,
+        destination_blob_path: str,
+        manifest: IngestionManifest = None,
+        **upload_options) -> Tuple[float, int, str]:
+    '''Upload one file unless the manifest has it with the same content
+
+    :param bucket: (bucket)
+    Handle of the respective bucket, see get_bucket
+
+    :param file_path: (str)
+    Path to the csv file
+
+    :param destination_blob_path: (str)
+    destination path of the file in the bucket
+
+    :param manifest: (IngestionManifest)
+    Files already ingested, None to upload the file anyway
+
+    :param upload_options: (dict)
+    Options of upload_file
+
+    :return: (tuple)
+    Seconds taken by the upload (None if the file was skipped),
+    size and md5 of the file
+    '''
+    size, md5 = os.path.getsize(file_path), file_md5(file_path)
+    if manifest is not None and manifest.is_unchanged(destination_blob_path, size, md5):
+        return None, size, md5
+
+    return upload_file(bucket, file_path, destination_blob_path, **upload_options), size, md5
+
+
+def upload_folder(
+        bucket,
+        folder_path: str,
+        destination_blob_path: str,
+        max_workers: int = 16,
+        retries: int = 3,
+        backoff: float = 1.0,
+        mode: str = 'raw',
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        checksum: str = None,
+        manifest: IngestionManifest = None) -> Tuple[Dict[str, float], List[str], List[str]]:
+    '''Upload all the files of a folder concurrently, through a bounded thread pool.
+    With a manifest the unchanged files are skipped and the uploaded ones recorded
+
+    :param bucket: (bucket)
+    Handle of the respective bucket, shared by all the threads
+
+    :param folder_path: (str)
+    Folder with the files to upload
+
+    :param destination_blob_path: (str)
+    destination folder of the files in the bucket
+
+    :param max_workers: (int)
+    Maximum number of uploads at the same time
+
+    :param retries: (int)
+    Number of attempts after the first one fails, for each file
+
+    :param backoff: (float)
+    Seconds waited before the first retry of a file
+
+    :param mode: (str)
+    "raw" or "csv", see upload_file
+
+    :param chunk_size: (int)
+    Bytes sent in each request of the raw uploads
+
+    :param checksum: (str)
+    "md5" or "crc32c" to verify the raw uploads, None to skip it
+
+    :param manifest: (IngestionManifest)
+    Files already ingested, with a run started by the caller
+
+    :return: (tuple)
+    Seconds taken by each uploaded file, keyed by the file name,
+    and the sorted names of the files that failed and were skipped
+    '''
+    filenames = sorted(os.listdir(folder_path))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            filename: executor.submit(
+                ingest_file,
+                bucket,
+                os.path.join(folder_path, filename),
+                destination_blob_path + filename,
+                manifest,
+                retries=retries,
+                backoff=backoff,
+                mode=mode,
+                chunk_size=chunk_size,
+                checksum=checksum)
+            for filename in filenames}
+
+    timings, failed, skipped = {}, [], []
+    for filename, future in futures.items():
+        try:
+            timing, size, md5 = future.result()
+        except Exception as err:
+            failed.append(filename)
+            logging.error(f'Upload of {filename} failed after {retries} retries: {err}')
+            continue
+
+        if timing is None:
+            skipped.append(filename)
+            continue
+        timings[filename] = timing
+        logging.info(f'Uploaded {filename} in {timing:.3f}s')
+        # the manifest is only changed here, by the main thread
+        if manifest is not None:
+            manifest.record(destination_blob_path + filename, filename, size, md5)
+
+    return timings, failed, skipped
+
+
+def write_ingested_files(filenames: List[str], ingested_files_path: str = 'ingested_files') -> None:
+    '''Write the names of the ingested files, one per line and sorted
+
+    :param filenames: (list)
+    Names of the ingested files
+
+    :param ingested_files_path: (str)
+    Path of the ingested files list
+    '''
+    with open(ingested_files_path, 'w') as ingested_files:
+        ingested_files.writelines(f'{filename}\n' for filename in sorted(filenames))
 
 
 if __name__ == "__main__":
+    # config
+    BUCKET_NAME = sys.argv[1]
+    DESTINATION_TRAIN_BLOB_PATH = sys.argv[2]
+    DESTINATION_TEST_BLOB_PATH = sys.argv[3]
+    TRAIN_DATA_FOLDER_PATH = sys.argv[4]
+    TEST_DATA_FOLDER_PATH = sys.argv[5]
+    MAX_WORKERS = int(sys.argv[6]) if len(sys.argv) > 6 else 16
+    RETRIES = int(sys.argv[7]) if len(sys.argv) > 7 else 3
+    UPLOAD_MODE = sys.argv[8] if len(sys.argv) > 8 else 'raw'
+    CHUNK_SIZE = int(float(sys.argv[9]) * 1024 * 1024) if len(sys.argv) > 9 else DEFAULT_CHUNK_SIZE
+    CHECKSUM = sys.argv[10] if len(sys.argv) > 10 and sys.argv[10] != 'none' else None
+    MANIFEST_BLOB_PATH = sys.argv[11] if len(sys.argv) > 11 else 'raw/' + MANIFEST_FILE_NAME
+    upload_options = {'mode': UPLOAD_MODE, 'chunk_size': CHUNK_SIZE, 'checksum': CHECKSUM}
+
     logging.info('About to start executing of the functions\n')
     starttime = timeit.default_timer()
+    bucket = get_bucket(BUCKET_NAME)
+
+    # the manifest kept in the bucket is the reference of what was already ingested
+    manifest = IngestionManifest.download(bucket, MANIFEST_BLOB_PATH)
+    run = manifest.start_run()
+    logging.info(f'Ingestion run {run}, {len(manifest.files)} files already ingested')
 
     # 1. upload train data to raw/train_data folder in the bucket
-    train_data_directory = [TRAIN_DATA_FOLDER_PATH]
-    ingested_files = open('ingested_files', 'w')
-    sys.stdout = ingested_files
-    for directory in train_data_directory:
-        filenames = os.listdir(directory)
-        for each_filename in filenames:
-            current_train_df = import_data(directory + '/' + each_filename)
-            upload_to_storage(
-                BUCKET_NAME,
-                current_train_df,
-                DESTINATION_TRAIN_BLOB_PATH +
-                each_filename)
-            
-            # printing ingested files to a txt file
-            print(each_filename)
-    ingested_files.close()
+    train_timings, train_failed, train_skipped = upload_folder(
+        bucket, TRAIN_DATA_FOLDER_PATH, DESTINATION_TRAIN_BLOB_PATH, MAX_WORKERS, RETRIES,
+        manifest=manifest, **upload_options)
 
     # 2. upload test data to raw/test_data folder in the bucket
-    test_data_directory = [TEST_DATA_FOLDER_PATH]
-    for directory in test_data_directory:
-        filenames = os.listdir(directory)
-        for each_filename in filenames:
-            current_test_df = import_data(directory + '/' + each_filename)
-            upload_to_storage(
-                BUCKET_NAME,
-                current_test_df,
-                DESTINATION_TEST_BLOB_PATH +
-                each_filename)
-            
+    test_timings, test_failed, test_skipped = upload_folder(
+        bucket, TEST_DATA_FOLDER_PATH, DESTINATION_TEST_BLOB_PATH, MAX_WORKERS, RETRIES,
+        manifest=manifest, **upload_options)
+
+    # save the manifest and the list of the train files ingested so far
+    manifest.save(MANIFEST_FILE_NAME)
+    manifest.upload(bucket, MANIFEST_BLOB_PATH)
+    write_ingested_files(manifest.names(DESTINATION_TRAIN_BLOB_PATH))
+
     timing = timeit.default_timer() - starttime
+    logging.info(
+        f'Uploaded {len(train_timings) + len(test_timings)} files, '
+        f'skipped {len(train_skipped) + len(test_skipped)} unchanged files, '
+        f'sum of the file upload times: {sum(train_timings.values()) + sum(test_timings.values()):.3f}s')
     logging.info(f'The execution time of this step was:{timing}')
+
+    if train_failed or test_failed:
+        logging.error(f'Files not uploaded: {train_failed + test_failed}')
+        sys.exit(1)
     logging.info('Done executing the functions')
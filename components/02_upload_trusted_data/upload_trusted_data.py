@@ -9,26 +9,45 @@ Date: March/2023
 
 # import necessary packages
 import timeit
+import io
 import os
 import sys
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 import wandb
+import numpy as np
 import pandas as pd
 from google.cloud import storage
 
+# the ingestion manifest and the dataset formats are shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestion_manifest import MANIFEST_FILE_NAME, IngestionManifest
+from dataset_format import (
+    DatasetWriter, content_type, dataset_bytes, dataset_file_name, part_file_name, write_dataset)
+from memory_usage import peak_rss_mb
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
     format='%(name)s - %(levelname)s - %(message)s')
 
-# config
-BUCKET_NAME = sys.argv[1]
-DESTINATION_RAW_BLOB_PATH = sys.argv[2]
-COMPONENT_CURRENT_DIRECTORY = sys.argv[3]
-DESTINATION_TRUSTED_BLOB_PATH = sys.argv[4]
 # key code for managing the entire infrastructure
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:/Users/4YouSee/Desktop/personal_work/risk_assessment/risk-assessment-380822-38a40f93abec.json'
 
+# columns of the trusted layer and their types, all nullable so that a
+# missing value does not fail the whole step nor becomes the string "nan"
+TRUSTED_SCHEMA = {
+    'corporation': 'string',
+    'lastmonth_activity': 'Int64',
+    'lastyear_activity': 'Int64',
+    'number_of_employees': 'Int64',
+    'exited': 'Int64'}
+
+# size of the chunks of the resumable uploads of the streamed trusted files
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 def download_raw_data(
         bucket_name: str, 
         destination_raw_blob_path: str, 
@@ -59,44 +78,364 @@ def download_raw_data(
     logging.info('Finish the download on raw data: SUCCESS')
 
 
-def transform_raw_data(component_current_directory: str) -> pd.DataFrame:
+def list_raw_files(component_current_directory: list) -> List[str]:
+    '''Sorted paths of the raw csv files of the data directories'''
+    return [
+        os.path.join(directory, each_filename)
+        for directory in component_current_directory
+        for each_filename in sorted(os.listdir(directory))
+        if each_filename.endswith('.csv')]  # some files in this directory are not .csv
+
+
+def read_raw_file(source, chunk_size: int = None):
+    '''Read the columns of the trusted schema of a raw csv, the other
+    columns (e.g. the "Unnamed: 0" index of the old uploads) are not read.
+    The integer types are applied by apply_schema on the whole batch, which
+    is cheaper than converting file by file
+
+    :param source: (str or file)
+    Path or buffer of the csv
+
+    :param chunk_size: (int)
+    Rows of each chunk, None to read the whole file
+
+    :return: (dataframe or iterator)
+    Pandas dataframe, or an iterator of dataframes with chunk_size rows
+    '''
+    return pd.read_csv(
+        source, usecols=list(TRUSTED_SCHEMA), dtype={'corporation': str}, chunksize=chunk_size)
+
+
+def apply_schema(pdf: pd.DataFrame) -> pd.DataFrame:
+    '''Cast a batch of raw rows to the trusted schema, in the schema column order.
+    Raises ValueError when a value does not fit its type'''
+    return pdf[list(TRUSTED_SCHEMA)].astype(TRUSTED_SCHEMA)
+
+
+def transform_raw_data(component_current_directory: list) -> pd.DataFrame:
     '''Function that does some transformations to the raw data coming from the data lake
 
-    :param component_current_directory: (str)
+    :param component_current_directory: (list)
     Current component path "02" to get some files (.csv) and do some actions
 
     :return: (dataframe)
     Pandas dataframe
     '''
-    # make some transformations (transform)
+    # make some transformations (transform): each file is read once and all
+    # of them are concatenated in a single pass
     logging.info('Start making the transformations on raw data: SUCCESS')
-    data_directory = component_current_directory
-    pdf = pd.DataFrame(
-        columns=[
-            'corporation',
-            'lastmonth_activity',
-            'lastyear_activity',
-            'number_of_employees',
-            'exited'])
-    for directory in data_directory:
-        filenames = os.listdir(directory)
-        for each_filename in filenames:
-            if each_filename.endswith('.csv'): # some files in this directory are not .csv
-                current_pdf = pd.read_csv(directory + '/' + each_filename)
-                pdf = pdf.append(current_pdf).reset_index(drop=True)
-
-
-    drop_unnecessary_cols = [col for col in pdf.columns if 'Unnamed' in col]
-    pdf.drop(drop_unnecessary_cols, axis=1, inplace=True)
-    pdf.drop_duplicates(inplace=True)
+    frames = [read_raw_file(file_path) for file_path in list_raw_files(component_current_directory)]
+    pdf = consolidate(frames)
     logging.info('Finish making the transformations on raw data: SUCCESS')
     return pdf
 
 
+def consolidate(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    '''Concatenate the raw frames in a single pass, cast them to the trusted
+    schema and drop the duplicated rows'''
+    if frames:
+        pdf = apply_schema(pd.concat(frames, ignore_index=True))
+    else:
+        pdf = apply_schema(pd.DataFrame(columns=list(TRUSTED_SCHEMA)))
+
+    pdf.drop_duplicates(inplace=True)
+    return pdf
+
+
+def fetch_raw_data(
+        bucket,
+        destination_raw_blob_path: str,
+        max_workers: int = 16) -> pd.DataFrame:
+    '''In memory version of download_raw_data followed by transform_raw_data:
+    the raw blobs are downloaded by a pool of threads and each one is parsed
+    from its bytes as soon as it arrives, so the downloads and the parsing
+    overlap and nothing is written to disk
+
+    :param bucket: (bucket)
+    Handle of the respective bucket, shared by the threads
+
+    :param destination_raw_blob_path: (str)
+    Destination folder from which you want to download the raw data
+
+    :param max_workers: (int)
+    Number of blobs downloaded at the same time
+
+    :return: (dataframe)
+    Pandas dataframe, the same as the one of transform_raw_data
+    '''
+    logging.info('Start the in memory download on raw data: SUCCESS')
+    blob_names = sorted(
+        blob.name for blob in bucket.list_blobs(prefix=destination_raw_blob_path)
+        if blob.name.endswith('.csv'))  # some files in this folder are not .csv
+    frames = fetch_raw_blobs(bucket, blob_names, max_workers)
+    logging.info(f'Finish the in memory download of {len(blob_names)} raw files: SUCCESS')
+
+    return consolidate(frames)
+
+
+def fetch_raw_blobs(bucket, blob_names: List[str], max_workers: int = 16) -> List[pd.DataFrame]:
+    '''Download raw csv blobs concurrently and parse each one from memory
+
+    :return: (list)
+    Pandas dataframes, in the order of the blob names
+    '''
+    def fetch(blob_name):
+        return read_raw_file(io.BytesIO(bucket.blob(blob_name).download_as_bytes()))
+
+    # map keeps the order of the blobs, so the rows are the ones of the sorted files
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, blob_names))
+
+
+def row_hashes(pdf: pd.DataFrame) -> np.ndarray:
+    '''64 bit hash of each row of the trusted schema, equal rows have equal hashes'''
+    return pd.util.hash_pandas_object(apply_schema(pdf), index=False).to_numpy()
+
+
+def select_new_rows(pdf: pd.DataFrame, hash_index: np.ndarray) -> Tuple[pd.DataFrame, np.ndarray]:
+    '''Keep the rows of a batch that are not duplicated in the batch
+    nor already in the trusted layer
+
+    :param pdf: (dataframe)
+    Batch of raw rows with the trusted schema
+
+    :param hash_index: (array)
+    Sorted hashes of the rows of the trusted layer
+
+    :return: (tuple)
+    The new rows, and the hash index with their hashes merged in
+    '''
+    hashes = row_hashes(pdf)
+    new_rows = ~pd.Series(hashes).duplicated().to_numpy()
+    positions = np.searchsorted(hash_index, hashes)
+    in_index = positions < len(hash_index)
+    in_index[in_index] = hash_index[positions[in_index]] == hashes[in_index]
+    new_rows &= ~in_index
+
+    # both arrays are sorted, so the merge is a single linear insert
+    new_hashes = np.sort(hashes[new_rows])
+    hash_index = np.insert(hash_index, np.searchsorted(hash_index, new_hashes), new_hashes)
+    return pdf[new_rows], hash_index
+
+
+def load_hash_index(bucket, hash_index_blob_path: str) -> np.ndarray:
+    '''Read the sorted row hashes of a trusted set, None if there are none'''
+    blob = bucket.blob(hash_index_blob_path)
+    if not blob.exists():
+        return None
+    return np.load(io.BytesIO(blob.download_as_bytes()))
+
+
+def save_hash_index(bucket, hash_index_blob_path: str, hash_index: np.ndarray) -> None:
+    '''Write the sorted row hashes of a trusted set, 8 bytes per row'''
+    buffer = io.BytesIO()
+    np.save(buffer, hash_index)
+    bucket.blob(hash_index_blob_path).upload_from_string(buffer.getvalue())
+
+
+def load_next_id(bucket, next_id_blob_path: str) -> int:
+    '''Read the ID of the next row of a trusted set, None if there is none'''
+    blob = bucket.blob(next_id_blob_path)
+    if not blob.exists():
+        return None
+    return int(blob.download_as_bytes())
+
+
+def save_next_id(bucket, next_id_blob_path: str, next_id: int) -> None:
+    '''Write the ID of the next row of a trusted set'''
+    bucket.blob(next_id_blob_path).upload_from_string(str(next_id))
+
+
+def delete_trusted_parts(bucket, trusted_blob_path: str) -> int:
+    '''Delete the parts appended to a trusted set, before it is rebuilt
+
+    :return: (int)
+    Number of parts deleted
+    '''
+    n_parts = 0
+    for blob in bucket.list_blobs(prefix=os.path.splitext(trusted_blob_path)[0] + '.part-'):
+        blob.delete()
+        n_parts += 1
+    return n_parts
+
+
+def update_trusted_data(
+        bucket,
+        raw_blob_names: List[str],
+        hash_index: np.ndarray,
+        next_id: int,
+        max_workers: int = 16) -> Tuple[pd.DataFrame, np.ndarray]:
+    '''Incremental version of the trusted data step: only the new raw files
+    are downloaded and their rows are deduplicated against the hash index of
+    the trusted set. The new rows are the part appended by this run, the
+    trusted set itself is neither downloaded nor rewritten, so the work
+    grows with the new rows and not with the history (except for the hash
+    index, 8 bytes per row). A raw file modified after it was ingested only
+    adds its new rows, its old ones are kept: the caller rebuilds the set
+    in that case
+
+    :param bucket: (bucket)
+    Handle of the respective bucket
+
+    :param raw_blob_names: (list)
+    Raw blobs ingested since the trusted set was built
+
+    :param hash_index: (array)
+    Sorted hashes of the rows of the trusted set
+
+    :param next_id: (int)
+    ID of the first new row
+
+    :param max_workers: (int)
+    Number of raw blobs downloaded at the same time
+
+    :return: (tuple)
+    The new rows with their IDs as the index, and the updated hash index
+    '''
+    logging.info(f'Start the incremental update with {len(raw_blob_names)} raw files: SUCCESS')
+    frames = fetch_raw_blobs(bucket, sorted(raw_blob_names), max_workers)
+    if frames:
+        raw_rows = apply_schema(pd.concat(frames, ignore_index=True))
+    else:
+        raw_rows = apply_schema(pd.DataFrame(columns=list(TRUSTED_SCHEMA)))
+    new_rows, hash_index = select_new_rows(raw_rows, hash_index)
+    new_rows = new_rows.set_axis(pd.RangeIndex(next_id, next_id + len(new_rows)))
+
+    logging.info(f'Kept {len(new_rows)} of {len(raw_rows)} raw rows for the trusted set: SUCCESS')
+    return new_rows, hash_index
+
+
+def stream_raw_data(
+        component_current_directory: list,
+        trusted_path: str,
+        dataset_path: str,
+        chunk_size: int,
+        file_format: str = 'parquet') -> Tuple[int, int, np.ndarray]:
+    '''Bounded memory version of transform_raw_data: the raw files are read
+    in chunks and the new rows of each chunk are appended to the output files
+    right away. The duplicates are found with the sorted array of the 64 bit
+    hashes of the rows kept, so the memory grows by 8 bytes per distinct row,
+    not with the size of the rows. The outputs are the same as the ones
+    written from transform_raw_data
+
+    :param component_current_directory: (list)
+    Current component path "02" to get some files (.csv) and do some actions
+
+    :param trusted_path: (str)
+    Local file for the trusted layer, written with the row index
+
+    :param dataset_path: (str)
+    Local file for the wandb dataset, written without the index
+
+    :param chunk_size: (int)
+    Number of rows held in memory at a time
+
+    :param file_format: (str)
+    "parquet" or "csv"
+
+    :return: (tuple)
+    Number of rows read and written, and the hash index of the rows written
+    '''
+    logging.info('Start streaming the transformations on raw data: SUCCESS')
+    hash_index = np.array([], dtype=np.uint64)
+    rows_read, rows_written, empty = 0, 0, True
+    with DatasetWriter(trusted_path, file_format, with_id=True) as trusted_file, \
+            DatasetWriter(dataset_path, file_format) as dataset_file:
+
+        def write_batch(chunks):
+            '''Append the rows of a batch not seen before to the outputs'''
+            nonlocal rows_read, rows_written, empty, hash_index
+            batch = apply_schema(pd.concat(chunks))
+            # the index continues across batches, as in the concatenation
+            batch.index = pd.RangeIndex(rows_read, rows_read + len(batch))
+            rows_read += len(batch)
+
+            new_rows, hash_index = select_new_rows(batch, hash_index)
+            trusted_file.write(new_rows)
+            dataset_file.write(new_rows)
+            rows_written += len(new_rows)
+            empty = False
+
+        # the chunks of the small files are grouped in batches of about chunk_size rows
+        chunks, batch_rows = [], 0
+        for file_path in list_raw_files(component_current_directory):
+            for chunk in read_raw_file(file_path, chunk_size):
+                chunks.append(chunk)
+                batch_rows += len(chunk)
+                if batch_rows >= chunk_size:
+                    write_batch(chunks)
+                    chunks, batch_rows = [], 0
+        if chunks or empty:
+            write_batch(chunks or [pd.DataFrame(columns=list(TRUSTED_SCHEMA))])
+
+    logging.info(f'Finish streaming {rows_read} raw rows, {rows_written} kept: SUCCESS')
+    return rows_read, rows_written, hash_index
+
+
+def stream_trusted_update(
+        bucket,
+        raw_blob_names: List[str],
+        trusted_output_path: str,
+        dataset_output_path: str,
+        hash_index: np.ndarray,
+        next_id: int,
+        chunk_size: int,
+        file_format: str = 'parquet') -> Tuple[np.ndarray, int]:
+    '''Bounded memory version of update_trusted_data: each new raw file is
+    downloaded to disk and its new rows are written chunk by chunk to the
+    part appended by this run
+
+    :param bucket: (bucket)
+    Handle of the respective bucket
+
+    :param raw_blob_names: (list)
+    Raw blobs ingested since the trusted set was built
+
+    :param trusted_output_path: (str)
+    Local file for the new rows of the trusted set, written with the IDs
+
+    :param dataset_output_path: (str)
+    Local file for the new rows of the wandb dataset, written without the IDs
+
+    :param hash_index: (array)
+    Sorted hashes of the rows of the trusted set
+
+    :param next_id: (int)
+    ID of the first new row
+
+    :param chunk_size: (int)
+    Number of rows held in memory at a time
+
+    :param file_format: (str)
+    "parquet" or "csv", the format of the trusted set
+
+    :return: (tuple)
+    The updated hash index and the number of new rows
+    '''
+    logging.info(f'Start streaming the incremental update with {len(raw_blob_names)} raw files: SUCCESS')
+    rows_written = 0
+    with DatasetWriter(trusted_output_path, file_format, with_id=True) as trusted_file, \
+            DatasetWriter(dataset_output_path, file_format) as dataset_file, \
+            tempfile.TemporaryDirectory() as raw_directory:
+        for blob_name in sorted(raw_blob_names):
+            raw_path = os.path.join(raw_directory, 'raw.csv')
+            bucket.blob(blob_name).download_to_filename(raw_path)
+            for chunk in read_raw_file(raw_path, chunk_size):
+                new_rows, hash_index = select_new_rows(apply_schema(chunk), hash_index)
+                new_rows.index = pd.RangeIndex(next_id + rows_written, next_id + rows_written + len(new_rows))
+                trusted_file.write(new_rows)
+                dataset_file.write(new_rows)
+                rows_written += len(new_rows)
+
+    logging.info(f'Kept {rows_written} raw rows for the trusted set: SUCCESS')
+    return hash_index, rows_written
+
+
 def upload_to_storage(
         bucket_name: str,
         data: pd.DataFrame,
-        destination_trusted_blob_path: str) -> None:
+        destination_trusted_blob_path: str,
+        file_format: str = 'parquet') -> None:
     '''Function that uploads a dataframe into a google storage bucket
 
     :param bucket_name: (str)
@@ -107,26 +446,114 @@ def upload_to_storage(
 
     :param destination_trusted_blob_path: (str)
     Destination folder to upload the already transformed data in the trusted training layer
+
+    :param file_format: (str)
+    "parquet" or "csv", both with the row index as the ID column
     '''
     # load transformed datasets (load) to google storage bucket
     storage_client = storage.Client()
     bucket = storage_client.get_bucket(bucket_name)
     trusted_blob = bucket.blob(destination_trusted_blob_path)
-    trusted_blob.upload_from_string(data.to_csv())
+    trusted_blob.upload_from_string(
+        dataset_bytes(data, file_format, with_id=True), content_type=content_type(file_format))
+
+    return logging.info(
+        f'Loading the NEW {file_format.upper()} FILE into the bucket: SUCCESS')
+
+
+def upload_file_to_storage(
+        bucket_name: str,
+        file_path: str,
+        destination_trusted_blob_path: str,
+        file_format: str = 'parquet') -> None:
+    '''Function that uploads a local file into a google storage bucket in a
+    resumable upload, without loading it in memory
+
+    :param bucket_name: (str)
+    Name of the respective bucket
+
+    :param file_path: (str)
+    Local file you want to upload
+
+    :param destination_trusted_blob_path: (str)
+    Destination folder to upload the already transformed data in the trusted training layer
+
+    :param file_format: (str)
+    "parquet" or "csv"
+    '''
+    storage_client = storage.Client()
+    bucket = storage_client.get_bucket(bucket_name)
+    trusted_blob = bucket.blob(destination_trusted_blob_path, chunk_size=UPLOAD_CHUNK_SIZE)
+    trusted_blob.upload_from_filename(file_path, content_type=content_type(file_format))
 
     return logging.info(
-        'Loading the NEW CSV FILE into the bucket: SUCCESS')
+        f'Streaming the NEW {file_format.upper()} FILE into the bucket: SUCCESS')
 
 
-def upload_to_wandb(name_set: str, data: pd.DataFrame) -> None:
+def new_raw_files(
+        bucket,
+        manifest_blob_path: str,
+        raw_folder_blob_path: str,
+        trusted_folder_blob_path: str) -> tuple:
+    '''Ask the ingestion manifest which raw files are new since the
+    ingestion run the trusted set of a folder was last built from
+
+    :param bucket: (bucket)
+    Handle of the respective bucket
+
+    :param manifest_blob_path: (str)
+    Blob of the ingestion manifest
+
+    :param raw_folder_blob_path: (str)
+    Raw folder of the files, e.g. "raw/train_data/"
+
+    :param trusted_folder_blob_path: (str)
+    Trusted folder where the built run is kept, e.g. "trusted/train_data/"
+
+    :return: (tuple)
+    Entries of the new or modified files, None when there is no manifest,
+    entries of the files among them that were already ingested when the
+    trusted set was built, and the latest ingestion run
+    '''
+    manifest = IngestionManifest.download(bucket, manifest_blob_path)
+    if not manifest.files:
+        return None, [], 0
+
+    built_run_blob = bucket.blob(trusted_folder_blob_path + 'ingestion_run')
+    built_run = int(built_run_blob.download_as_bytes()) if built_run_blob.exists() else 0
+    return (
+        manifest.new_since(built_run, raw_folder_blob_path),
+        manifest.changed_since(built_run, raw_folder_blob_path),
+        manifest.last_run)
+
+
+def upload_to_wandb(
+        name_set: str,
+        data: pd.DataFrame = None,
+        file_path: str = None,
+        file_format: str = 'parquet',
+        file_name: str = None,
+        incremental: bool = False) -> None:
     '''Function that uploads data to wandb
 
     :param name_set: (str)
-    Final dataset name you want to name to be saved
+    Final dataset name you want to name to be saved, with the extension of the format
 
     :param data: (dataframe)
     Dataframe you want to upload
 
+    :param file_path: (str)
+    File already written, uploaded instead of the dataframe
+
+    :param file_format: (str)
+    "parquet" or "csv", the format the dataframe is written in
+
+    :param file_name: (str)
+    Name of the file in the artifact, name_set by default
+
+    :param incremental: (bool)
+    Add the file to the files of the latest version of the artifact
+    instead of replacing them, e.g. for the part of an incremental run
     '''
     # load transformed datasets (load) to wandb
     run = wandb.init(
@@ -138,25 +565,119 @@ def upload_to_wandb(name_set: str, data: pd.DataFrame) -> None:
     artifact = wandb.Artifact(
         name=name_set,
         type='dataset',
-        description='Raw dataset transformed with some necessary things to start DS pipeline')
-
-    data.to_csv(name_set, index=False)
-    artifact.add_file(name_set)
+        description='Raw dataset transformed with some necessary things to start DS pipeline',
+        incremental=incremental)
+
+    file_name = file_name or name_set
+    if file_path is None:
+        write_dataset(data, file_name, file_format)
+        file_path = file_name
+    artifact.add_file(file_path, name=file_name)
     run.log_artifact(artifact)
-    logging.info(f'Uploaded {name_set} to wandb: SUCCESS\n')
+    logging.info(f'Uploaded {file_name} to {name_set} in wandb: SUCCESS\n')
 
 
 if __name__ == "__main__":
+    # config
+    BUCKET_NAME = sys.argv[1]
+    DESTINATION_RAW_BLOB_PATH = sys.argv[2]
+    COMPONENT_CURRENT_DIRECTORY = sys.argv[3]
+    DESTINATION_TRUSTED_BLOB_PATH = sys.argv[4]
+    MANIFEST_BLOB_PATH = sys.argv[5] if len(sys.argv) > 5 else DESTINATION_RAW_BLOB_PATH + MANIFEST_FILE_NAME
+    # rows held in memory by the chunked mode, 0 transforms everything in memory
+    CHUNK_SIZE = int(sys.argv[6]) if len(sys.argv) > 6 else 0
+    # blobs downloaded at the same time straight to memory, 0 downloads them
+    # one by one to the component directory
+    DOWNLOAD_WORKERS = int(sys.argv[7]) if len(sys.argv) > 7 else 16
+    # format of the trusted files and of the wandb datasets, "parquet" or "csv"
+    FILE_FORMAT = sys.argv[8] if len(sys.argv) > 8 else 'parquet'
+    # "incremental" writes the new rows of the new raw files as a part next to
+    # the trusted sets, "full" rebuilds them from the whole raw history (e.g. to recover)
+    TRUSTED_MODE = sys.argv[9] if len(sys.argv) > 9 else 'incremental'
+
     logging.info('About to start executing of the script\n')
     starttime = timeit.default_timer()
 
-    for folder, name in zip(['train_data/', 'test_data/'], ['train_set.csv', 'test_set.csv']):
+    bucket = storage.Client().get_bucket(BUCKET_NAME)
+    for folder, name in zip(['train_data/', 'test_data/'], ['train_set', 'test_set']):
+        name = dataset_file_name(name, FILE_FORMAT)
+        # nothing to append when no raw file changed since the last trusted set,
+        # the full mode always rebuilds it
+        new_files, changed_files, ingestion_run = new_raw_files(
+            bucket, MANIFEST_BLOB_PATH,
+            DESTINATION_RAW_BLOB_PATH + folder, DESTINATION_TRUSTED_BLOB_PATH + folder)
+        if new_files == [] and TRUSTED_MODE == 'incremental':
+            logging.info(f'No new raw files in {folder} since the last trusted set, skipping it')
+            continue
+        if new_files is not None:
+            logging.info(f'{len(new_files)} new raw files in {folder}: {[file["name"] for file in new_files]}')
+
+        trusted_blob_path = DESTINATION_TRUSTED_BLOB_PATH + folder + name
+        part_blob_path = DESTINATION_TRUSTED_BLOB_PATH + folder + part_file_name(name, ingestion_run)
+        hash_index_blob_path = DESTINATION_TRUSTED_BLOB_PATH + folder + 'row_hashes.npy'
+        next_id_blob_path = DESTINATION_TRUSTED_BLOB_PATH + folder + 'next_id'
+        hash_index, next_id = None, None
+        if TRUSTED_MODE == 'incremental' and new_files is not None and bucket.blob(trusted_blob_path).exists():
+            # the rows of a modified raw file can not be taken out of the
+            # trusted set, it is rebuilt to give the rows of the raw files as they are
+            if changed_files:
+                logging.info(
+                    f'{len(changed_files)} raw files of {folder} were modified since the last trusted set, '
+                    f'rebuilding it: {[file["name"] for file in changed_files]}')
+            else:
+                hash_index = load_hash_index(bucket, hash_index_blob_path)
+                next_id = load_next_id(bucket, next_id_blob_path)
+
         # upload train and test data to trusted folder in the bucket
         component_current_directory = [COMPONENT_CURRENT_DIRECTORY]
-        download_raw_data(BUCKET_NAME, DESTINATION_RAW_BLOB_PATH + folder, COMPONENT_CURRENT_DIRECTORY)
-        trusted_train_set = transform_raw_data(component_current_directory)
-        upload_to_storage(BUCKET_NAME, trusted_train_set, DESTINATION_TRUSTED_BLOB_PATH + folder + name)
-        upload_to_wandb(name, trusted_train_set)
+        if hash_index is not None and next_id is not None and CHUNK_SIZE > 0:
+            # only the new rows are written, as a part next to the trusted set
+            with tempfile.TemporaryDirectory() as output_directory:
+                trusted_path = os.path.join(output_directory, 'trusted_' + name)
+                dataset_path = os.path.join(output_directory, name)
+                hash_index, n_new = stream_trusted_update(
+                    bucket, [file['blob'] for file in new_files], trusted_path, dataset_path,
+                    hash_index, next_id, CHUNK_SIZE, FILE_FORMAT)
+                if n_new:
+                    upload_file_to_storage(BUCKET_NAME, trusted_path, part_blob_path, FILE_FORMAT)
+                    upload_to_wandb(
+                        name, file_path=dataset_path, file_format=FILE_FORMAT,
+                        file_name=part_file_name(name, ingestion_run), incremental=True)
+            next_id += n_new
+        elif hash_index is not None and next_id is not None:
+            new_rows, hash_index = update_trusted_data(
+                bucket, [file['blob'] for file in new_files], hash_index, next_id, DOWNLOAD_WORKERS or 1)
+            if len(new_rows):
+                upload_to_storage(BUCKET_NAME, new_rows, part_blob_path, FILE_FORMAT)
+                upload_to_wandb(
+                    name, new_rows, file_format=FILE_FORMAT,
+                    file_name=part_file_name(name, ingestion_run), incremental=True)
+            next_id += len(new_rows)
+        elif CHUNK_SIZE > 0:
+            download_raw_data(BUCKET_NAME, DESTINATION_RAW_BLOB_PATH + folder, COMPONENT_CURRENT_DIRECTORY)
+            # the outputs are written out of the raw data directory
+            with tempfile.TemporaryDirectory() as output_directory:
+                trusted_path = os.path.join(output_directory, 'trusted_' + name)
+                dataset_path = os.path.join(output_directory, name)
+                next_id, _, hash_index = stream_raw_data(
+                    component_current_directory, trusted_path, dataset_path, CHUNK_SIZE, FILE_FORMAT)
+                upload_file_to_storage(BUCKET_NAME, trusted_path, trusted_blob_path, FILE_FORMAT)
+                upload_to_wandb(name, file_path=dataset_path, file_format=FILE_FORMAT)
+            delete_trusted_parts(bucket, trusted_blob_path)
+        else:
+            if DOWNLOAD_WORKERS > 0:
+                trusted_train_set = fetch_raw_data(bucket, DESTINATION_RAW_BLOB_PATH + folder, DOWNLOAD_WORKERS)
+            else:
+                download_raw_data(BUCKET_NAME, DESTINATION_RAW_BLOB_PATH + folder, COMPONENT_CURRENT_DIRECTORY)
+                trusted_train_set = transform_raw_data(component_current_directory)
+            upload_to_storage(BUCKET_NAME, trusted_train_set, trusted_blob_path, FILE_FORMAT)
+            upload_to_wandb(name, trusted_train_set, file_format=FILE_FORMAT)
+            delete_trusted_parts(bucket, trusted_blob_path)
+            hash_index = np.sort(row_hashes(trusted_train_set))
+            next_id = int(trusted_train_set.index.max()) + 1 if len(trusted_train_set) else 0
+        save_hash_index(bucket, hash_index_blob_path, hash_index)
+        save_next_id(bucket, next_id_blob_path, next_id)
+        bucket.blob(DESTINATION_TRUSTED_BLOB_PATH + folder + 'ingestion_run').upload_from_string(str(ingestion_run))
 
         for directory in component_current_directory:
             filenames = os.listdir(directory)
@@ -166,4 +687,5 @@ if __name__ == "__main__":
 
     timing = timeit.default_timer() - starttime
     logging.info(f'The execution time of this step was:{timing}')
+    logging.info(f'The peak RSS of this step was: {peak_rss_mb():.1f} MB')
     logging.info('Done executing the script')
@@ -7,55 +7,149 @@ Date: March/2023
 '''
 
 # import necessary packages
+import os
 import sys
+import json
 import logging
-import pandas as pd
+from typing import List
 import wandb
 
+# the dataset formats are shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_format import DATASET_COLUMNS, DatasetWriter, dataset_file_name, iter_dataset, read_dataset, write_dataset
+from memory_usage import peak_rss_mb
+from cleaning_rules import CleaningEngine
+from dataset_statistics import DatasetStatistics
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
     format='%(asctime)-15s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# config
-TRAIN_SET = sys.argv[1]
+# rules of the cleaning, shipped with the component
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaning_rules.json')
+
+
+def clean_file(
+        input_path: str,
+        output_path: str,
+        file_format: str = 'parquet',
+        chunk_size: int = 0,
+        rules: List[dict] = None,
+        statistics: DatasetStatistics = None) -> dict:
+    '''Clean a dataset file into another one. The outlier bounds are fitted
+    on the whole dataset first, then every row goes once through the rules
+
+    :param input_path: (str)
+    Trusted dataset, parquet or csv, or a folder with its parts
+
+    :param output_path: (str)
+    Clean dataset
 
+    :param file_format: (str)
+    Format of the clean dataset, "parquet" or "csv"
 
-def clean_data(train_set: str) -> None:
+    :param chunk_size: (int)
+    Rows held in memory at a time, 0 cleans the whole dataset at once
+
+    :param rules: (list)
+    Cleaning rules of cleaning_rules.CleaningEngine, by default the ones of cleaning_rules.json
+
+    :param statistics: (DatasetStatistics)
+    Statistics updated with the clean rows as they are written, without reading them again
+
+    :return: (dict)
+    Rows in, dropped and out, and the rows affected by each rule
+    '''
+    if rules is None:
+        engine = CleaningEngine.load(DEFAULT_RULES_PATH)
+    else:
+        engine = CleaningEngine(rules)
+
+    if chunk_size <= 0:
+        df_trusted = read_dataset(input_path, columns=DATASET_COLUMNS)
+        if engine.fitted_columns:
+            engine.fit([df_trusted])
+        df_clean = engine.apply(df_trusted)
+        write_dataset(df_clean, output_path, file_format)
+        if statistics is not None:
+            statistics.update(df_clean)
+        return engine.report
+
+    if engine.fitted_columns:
+        engine.fit(iter_dataset(input_path, chunk_size, engine.fitted_columns))
+    with DatasetWriter(output_path, file_format) as writer:
+        for chunk in iter_dataset(input_path, chunk_size, DATASET_COLUMNS):
+            df_clean = engine.apply(chunk)
+            writer.write(df_clean)
+            if statistics is not None:
+                statistics.update(df_clean)
+    return engine.report
+
+
+def clean_data(
+        train_set: str,
+        file_format: str = 'parquet',
+        chunk_size: int = 0,
+        rules_path: str = DEFAULT_RULES_PATH) -> None:
     '''Function to clean up our training dataset to feed the machine
     learning model.
 
     :param train_set: (str)
     Path to the wandb leading to the training dataset
+
+    :param file_format: (str)
+    Format of the clean dataset, "parquet" or "csv"
+
+    :param chunk_size: (int)
+    Rows held in memory at a time, 0 cleans the whole dataset at once
+
+    :param rules_path: (str)
+    Json file with the cleaning rules
     '''
     # start a new run at wandb
     run = wandb.init(
         project='risk_assessment',
         entity='vitorabdo',
         job_type='clean_data')
+    # the full set and the parts appended by the incremental runs of the trusted step
     artifact = run.use_artifact(train_set, type='dataset')
-    filepath = artifact.file()
+    filepath = artifact.download()
     logger.info('Downloaded trusted data artifact: SUCCESS')
 
     # clean the train dataset
-    df_trusted = pd.read_csv(filepath)
-    df_clean = df_trusted.copy()
-    logger.info('Train dataset are clean: SUCCESS')
+    clean_path = dataset_file_name('df_clean', file_format)
+    with open(rules_path) as rules_file:
+        rules = json.load(rules_file)
+    statistics = DatasetStatistics()
+    report = clean_file(filepath, clean_path, file_format, chunk_size, rules, statistics)
+    for rule in rules:
+        logger.info(f'Cleaning rule {rule["name"]} affected {report[rule["name"]]} rows')
+    logger.info(f'Train dataset are clean, {report["rows_out"]} rows '
+                f'({report["rows_dropped"]} dropped): SUCCESS')
 
-    # upload to W&B
+    # upload to W&B, with the statistics the data checks run on
     artifact = wandb.Artifact(
         name='clean_data',
         type='dataset',
-        description='Clean dataset after we apply "clean_data" function')
+        description='Clean dataset after we apply "clean_data" function',
+        metadata={'cleaning_report': report, 'statistics': statistics.to_dict()})
 
-    df_clean.to_csv('df_clean.csv', index=False)
-    artifact.add_file('df_clean.csv')
+    artifact.add_file(clean_path)
     run.log_artifact(artifact)
     logger.info('Artifact Uploaded: SUCCESS')
 
 
 if __name__ == "__main__":
+    # config
+    TRAIN_SET = sys.argv[1]
+    FILE_FORMAT = sys.argv[2] if len(sys.argv) > 2 else 'parquet'
+    # rows held in memory at a time, 0 cleans the whole dataset at once
+    CHUNK_SIZE = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    CLEANING_RULES = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_RULES_PATH
+
     logging.info('About to start executing the clean_data function')
-    clean_data(TRAIN_SET)
+    clean_data(TRAIN_SET, FILE_FORMAT, CHUNK_SIZE, CLEANING_RULES)
+    logging.info(f'The peak RSS of this step was: {peak_rss_mb():.1f} MB')
     logging.info('Done executing the clean_data function')
\ No newline at end of file
@@ -6,45 +6,86 @@ Date: March/2023
 '''
 
 # import necessary packages
+import os
 import sys
 import pytest
-import pandas as pd
 import wandb
 
+# the dataset formats are shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_format import DATASET_COLUMNS, iter_dataset, read_dataset
+from dataset_statistics import DatasetStatistics
+from memory_usage import peak_rss_mb
 
-@pytest.fixture(scope='session')
-def data():
-    '''Fixture to generate data to our tests'''
-    run = wandb.init(
-        project='risk_assessment',
-        entity='vitorabdo',
-        job_type='data_tests',
-        resume=True)
 
-    # download input artifact
-    data_path = run.use_artifact('vitorabdo/risk_assessment/clean_data:latest', type='dataset').file()
+def pytest_addoption(parser):
+    parser.addoption(
+        '--chunk_size', action='store', default=0, type=int,
+        help='Rows of the datasets read at a time, 0 loads each one at once')
 
-    if data_path is None:
-        pytest.fail('You must provide the csv file')
 
-    df = pd.read_csv(data_path)
-    return df
+def pytest_terminal_summary(terminalreporter):
+    terminalreporter.write_line(f'Peak RSS of the data checks: {peak_rss_mb():.1f} MB')
 
 
-@pytest.fixture(scope='session')
-def ref_data():
-    '''Fixture to generate the reference data for non-deterministic tests'''
+def dataset_statistics(data_path: str, chunk_size: int) -> DatasetStatistics:
+    '''Statistics of a dataset file, read at once or chunk by chunk
+
+    :param data_path: (str)
+    Path of the parquet or csv file
+
+    :param chunk_size: (int)
+    Rows read at a time, 0 loads the whole dataset
+
+    :return: (DatasetStatistics)
+    Statistics the tests run on, the same in both modes
+    '''
+    if chunk_size > 0:
+        return DatasetStatistics.from_chunks(iter_dataset(data_path, chunk_size, DATASET_COLUMNS))
+    return DatasetStatistics.from_frame(read_dataset(data_path, columns=DATASET_COLUMNS))
+
+
+def artifact_statistics(artifact_path: str, chunk_size: int) -> DatasetStatistics:
+    '''Statistics of a version of the clean data. They are stored in the metadata
+    of the artifact by the basic_clean step, so the data is not downloaded; the
+    versions written before are read once, at once or chunk by chunk
+
+    :param artifact_path: (str)
+    Path to the wandb leading to the clean dataset
+
+    :param chunk_size: (int)
+    Rows read at a time when the artifact has no statistics, 0 loads the whole dataset
+
+    :return: (DatasetStatistics)
+    Statistics the tests run on
+    '''
     run = wandb.init(
         project='risk_assessment',
         entity='vitorabdo',
         job_type='data_tests',
         resume=True)
+    artifact = run.use_artifact(artifact_path, type='dataset')
 
-    # download input artifact
-    data_path = run.use_artifact('vitorabdo/risk_assessment/clean_data:v0', type='dataset').file()
+    summary = artifact.metadata.get('statistics')
+    if summary is not None:
+        return DatasetStatistics.from_dict(summary)
 
+    # download input artifact
+    data_path = artifact.file()
     if data_path is None:
-        pytest.fail('You must provide the csv file')
+        pytest.fail('You must provide the dataset file')
+    return dataset_statistics(data_path, chunk_size)
+
+
+@pytest.fixture(scope='session')
+def data(request):
+    '''Fixture to generate the statistics of the data to our tests'''
+    return artifact_statistics(
+        'vitorabdo/risk_assessment/clean_data:latest', request.config.getoption('chunk_size'))
+
 
-    ref_df = pd.read_csv(data_path)
-    return ref_df
+@pytest.fixture(scope='session')
+def ref_data(request):
+    '''Fixture to generate the statistics of the reference data for non-deterministic tests'''
+    return artifact_statistics(
+        'vitorabdo/risk_assessment/clean_data:v0', request.config.getoption('chunk_size'))
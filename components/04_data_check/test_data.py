@@ -7,19 +7,19 @@ Date: March/2023
 '''
 
 # import necessary packages
-import pandas as pd
 import scipy.stats
+from dataset_statistics import DatasetStatistics
 
 # DETERMINISTIC TESTS
 
-def test_import_data(data):
+def test_import_data(data: DatasetStatistics):
     '''Test that the dataset is not empty'''
 
-    assert data.shape[0] > 0
-    assert data.shape[1] > 0
+    assert data.n_rows > 0
+    assert data.n_columns > 0
 
 
-def test_column_names(data):
+def test_column_names(data: DatasetStatistics):
     '''Tests if the column names are the same as the original
     file, including in the same order
     '''
@@ -27,70 +27,69 @@ def test_column_names(data):
         'corporation', 'lastmonth_activity', 'lastyear_activity',
         'number_of_employees', 'exited']
 
-    these_columns = data.columns.values
+    these_columns = data.columns
 
     # This also enforces the same order
     assert list(expected_colums) == list(these_columns)
 
 
-def test_entries_values(data):
+def test_entries_values(data: DatasetStatistics):
     '''Test dataset variable entries'''
 
     # independent variables
-    assert all(data.lastmonth_activity.values) >= 0
-    assert all(data.lastyear_activity.values) >= 0
-    assert all(data.number_of_employees.values) >= 0
+    assert data.minimum('lastmonth_activity') >= 0
+    assert data.minimum('lastyear_activity') >= 0
+    assert data.minimum('number_of_employees') >= 0
 
     # label
     known_label_entries = [0, 1]
-    label_column = set(data.exited.unique())
+    label_column = set(data.label_counts)
     assert set(known_label_entries) == set(label_column)
 
 
 # NON DETERMINISTIC TESTS
 
+def ttest_from_statistics(
+        data: DatasetStatistics, ref_data: DatasetStatistics, column: str) -> tuple:
+    '''scipy.stats.ttest_ind of a column of the two datasets, from their moments'''
+    return scipy.stats.ttest_ind_from_stats(
+        data.mean(column), data.std(column), data.count(column),
+        ref_data.mean(column), ref_data.std(column), ref_data.count(column))
+
+
 def test_similar_label_distrib(
-        data: pd.DataFrame, ref_data: pd.DataFrame):
+        data: DatasetStatistics, ref_data: DatasetStatistics):
     '''Apply a threshold on the KL divergence to detect if the distribution of the new
     data is significantly different than that of the reference dataset
     '''
-    dist1 = data['exited'].value_counts().sort_index()
-    dist2 = ref_data['exited'].value_counts().sort_index()
+    dist1 = data.label_distribution()
+    dist2 = ref_data.label_distribution()
 
     assert scipy.stats.entropy(dist1, dist2, base=2) < 0.20
 
 
 def test_lastmonth_activity_ttest(
-        data: pd.DataFrame, ref_data: pd.DataFrame):
+        data: DatasetStatistics, ref_data: DatasetStatistics):
     '''Tests whether the means of two independent samples are significantly different'''
 
-    dist1 = data['lastmonth_activity'].values
-    dist2 = ref_data['lastmonth_activity'].values
-
-    ts, pvalues = scipy.stats.ttest_ind(dist1, dist2)
+    ts, pvalues = ttest_from_statistics(data, ref_data, 'lastmonth_activity')
 
     assert pvalues > 0.05
 
 
 def test_lastyear_activity_ttest(
-        data: pd.DataFrame, ref_data: pd.DataFrame):
+        data: DatasetStatistics, ref_data: DatasetStatistics):
     '''Tests whether the means of two independent samples are significantly different'''
 
-    dist1 = data['lastyear_activity'].values
-    dist2 = ref_data['lastyear_activity'].values
-
-    ts, pvalues = scipy.stats.ttest_ind(dist1, dist2)
+    ts, pvalues = ttest_from_statistics(data, ref_data, 'lastyear_activity')
 
     assert pvalues > 0.05
 
 
 def test_number_of_employees_ttest(
-        data: pd.DataFrame, ref_data: pd.DataFrame):
+        data: DatasetStatistics, ref_data: DatasetStatistics):
     '''Tests whether the means of two independent samples are significantly different'''
 
-    dist1 = data['number_of_employees'].values
-    dist2 = ref_data['number_of_employees'].values
-
-    ts, pvalues = scipy.stats.ttest_ind(dist1, dist2)
+    ts, pvalues = ttest_from_statistics(data, ref_data, 'number_of_employees')
 
     assert pvalues > 0.05
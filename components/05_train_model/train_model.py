@@ -26,6 +26,10 @@ from sklearn.compose import make_column_selector as selector
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.model_selection import GridSearchCV
 
+# the dataset formats are shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_format import DATASET_COLUMNS, read_dataset
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
@@ -49,8 +53,8 @@ def get_inference_pipeline(X: pd.DataFrame) -> Pipeline:
     The pipeline that made the final model
     '''
     # 1. make pipelines to do the necessary transformations
-    # 1.1 divide the qualitative and quantitative features
-    quantitative_columns = selector(dtype_exclude=['object'])
+    # 1.1 divide the qualitative and quantitative features (the codes are categorical)
+    quantitative_columns = selector(dtype_include='number')
     quantitative_columns = quantitative_columns(X)
 
     # 1.2 apply the respective transformations with columntransformer method
@@ -138,7 +142,7 @@ def train_model(
         rf_config = {}
 
     # select only the features that we are going to use
-    df_clean = pd.read_csv(filepath)
+    df_clean = read_dataset(filepath, columns=DATASET_COLUMNS)
     X = df_clean.drop([label_column], axis=1)
     y = df_clean[label_column]
     logging.info(f"Numbers of unique incomes: {y.value_counts()}")
@@ -18,6 +18,10 @@ import wandb
 from datetime import date
 from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, classification_report, RocCurveDisplay, roc_auc_score
 
+# the dataset formats are shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dataset_format import DATASET_COLUMNS, read_dataset
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
@@ -55,11 +59,12 @@ def evaluate_model(
     logging.info('Downloaded prod mlflow model: SUCCESS')
 
     # download test dataset
-    test_data = run.use_artifact(test_set, type='dataset').file()
+    # the full set and the parts appended by the incremental runs of the trusted step
+    test_data = run.use_artifact(test_set, type='dataset').download()
     logging.info('Downloaded test dataset artifact: SUCCESS')
 
     # Read test dataset
-    test_data = pd.read_csv(test_data)
+    test_data = read_dataset(test_data, columns=DATASET_COLUMNS)
     X_test = test_data.drop([label_column], axis=1)
     y_test = test_data[label_column]
 
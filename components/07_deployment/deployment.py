@@ -12,6 +12,10 @@ import sys
 import wandb
 import shutil
 
+# the ingestion manifest is shared by the components
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestion_manifest import MANIFEST_FILE_NAME, IngestionManifest
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
@@ -29,7 +33,7 @@ def deploy_model(prod_deployment_path: str,
                  latest_scores_path: str,
                  ingested_files_path: str) -> None:
     '''Function for deployment, copy the latest pickle file, the latestscore.txt value, 
-    and the ingestedfiles.txt file into the deployment directory
+    the ingestedfiles.txt file and the ingestion manifest into the deployment directory
 
     :param prod_deployment_path: (str)
     Folder in the main directory where the production files will be copied
@@ -66,9 +70,24 @@ def deploy_model(prod_deployment_path: str,
         os.mkdir(prod_deployment_path)
 
     # copy files to the production deployment folder
-    shutil.copy(os.path.join(model_local_path, 'model.pkl'), prod_deployment_path) # copy pickle
+    # copy pickle: write a temporary file and rename it, so that the api
+    # hot reload never reads a half copied model
+    temp_model_path = os.path.join(prod_deployment_path, 'model.pkl.tmp')
+    shutil.copy(os.path.join(model_local_path, 'model.pkl'), temp_model_path)
+    os.replace(temp_model_path, os.path.join(prod_deployment_path, 'model.pkl'))
     shutil.copy(os.path.join(score_path, 'actual_metrics_output'), prod_deployment_path) # copy scores
     shutil.copy(os.path.join(ingested_path, 'ingested_files'), prod_deployment_path) # copy ingested files
+
+    # raw files ingested since the run of the previous deployment
+    deployed_manifest_path = os.path.join(prod_deployment_path, MANIFEST_FILE_NAME)
+    previous_run = IngestionManifest.load(deployed_manifest_path).last_run
+    manifest = IngestionManifest.load(os.path.join(ingested_path, MANIFEST_FILE_NAME))
+    new_files = manifest.new_since(previous_run)
+    logging.info(
+        f'{len(new_files)} raw files ingested since the deployed run {previous_run}: '
+        f'{[file["blob"] for file in new_files]}')
+    if manifest.runs:
+        manifest.save(deployed_manifest_path)
     logging.info('Copied files: SUCCESS')
 
 
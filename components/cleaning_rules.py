@@ -0,0 +1,238 @@
+'''
+Rule engine of the cleaning step. The rules (outliers by IQR or
+z-score, range checks and normalisation of the codes) are compiled
+into the bounds of each column, so a dataset or a chunk is cleaned
+in a single vectorized pass over each column whatever the number
+of rules, and the rows affected by every rule are counted
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import json
+from typing import Iterable, List, Tuple
+import numpy as np
+import pandas as pd
+
+CLEANING_RULE_KINDS = ('iqr', 'zscore', 'range', 'normalize')
+CLEANING_ACTIONS = ('clip', 'drop')
+
+
+class ValueCounts:
+    '''Count of each value of a column, accumulated chunk by chunk. The
+    quantiles, mean and standard deviation are exact, and the memory is
+    the number of distinct values, which is small for the integer
+    columns of the dataset'''
+
+    def __init__(self) -> None:
+        self.counts = pd.Series(dtype='float64')
+
+    def update(self, values: pd.Series) -> None:
+        self.counts = self.counts.add(values.value_counts(), fill_value=0)
+
+    def quantile(self, q: float) -> float:
+        '''Quantile with the linear interpolation of pandas.Series.quantile'''
+        values = self.counts.sort_index()
+        cumulative = values.to_numpy().cumsum()
+        position = (cumulative[-1] - 1) * q
+        lower, upper = np.searchsorted(cumulative, [np.floor(position), np.ceil(position)], side='right')
+        low, high = float(values.index[lower]), float(values.index[upper])
+        return low + (position - np.floor(position)) * (high - low)
+
+    def mean_std(self) -> Tuple[float, float]:
+        '''Mean and sample standard deviation (ddof=1)'''
+        values, counts = self.counts.index.to_numpy(dtype=np.float64), self.counts.to_numpy()
+        total = counts.sum()
+        mean = (values * counts).sum() / total
+        return mean, float(np.sqrt((counts * (values - mean) ** 2).sum() / (total - 1)))
+
+
+def validate_rule(rule: dict) -> None:
+    '''Raise a ValueError when a rule is not complete or not known'''
+    for key in ('name', 'rule', 'column'):
+        if key not in rule:
+            raise ValueError(f'Cleaning rule {rule} has no "{key}"')
+    if rule['rule'] not in CLEANING_RULE_KINDS:
+        raise ValueError(f'Unknown cleaning rule {rule["rule"]}, expected one of {CLEANING_RULE_KINDS}')
+    if rule['rule'] != 'normalize' and rule.get('action', 'clip') not in CLEANING_ACTIONS:
+        raise ValueError(f'Unknown action {rule["action"]}, expected one of {CLEANING_ACTIONS}')
+
+
+class CleaningEngine:
+    '''Cleaning rules compiled into one pass over the columns. Each rule is a dict:
+
+    - {"rule": "iqr", "k": 1.5}: outside [q1 - k * iqr, q3 + k * iqr]
+    - {"rule": "zscore", "k": 3}: more than k standard deviations from the mean
+    - {"rule": "range", "min": 0, "max": null}: outside fixed bounds
+    - {"rule": "normalize", "strip": true, "case": "lower"}: codes with spaces or another case
+
+    with its "name", its "column" and, except for normalize, an "action":
+    "clip" the values to the bounds or "drop" the rows. The IQR and z-score
+    bounds are fitted on the whole input (fit), so a dataset cleaned chunk
+    by chunk gives the same rows as cleaned at once. Every rule looks at
+    the input values: a row is dropped when any drop rule rejects it, and
+    the clipped values are clipped to the tightest clip bounds
+
+    :param rules: (list)
+    Cleaning rules, applied in a single pass whatever their order
+    '''
+
+    def __init__(self, rules: List[dict]) -> None:
+        for rule in rules:
+            validate_rule(rule)
+        names = [rule['name'] for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f'Cleaning rule names are not unique: {names}')
+        self.rules = rules
+        self.bounds = {}
+        self.columns = None
+        self.report = {'rows_in': 0, 'rows_dropped': 0, 'rows_out': 0}
+        self.report.update({name: 0 for name in names})
+        if not self.fitted_columns:
+            self.compile()
+
+    @classmethod
+    def load(cls, rules_path: str) -> 'CleaningEngine':
+        '''Engine of the rules of a json file'''
+        with open(rules_path) as rules_file:
+            return cls(json.load(rules_file))
+
+    @property
+    def fitted_columns(self) -> List[str]:
+        '''Columns whose bounds depend on the data'''
+        return sorted({rule['column'] for rule in self.rules if rule['rule'] in ('iqr', 'zscore')})
+
+    def fit(self, chunks: Iterable[pd.DataFrame]) -> 'CleaningEngine':
+        '''Fit the IQR and z-score bounds on the whole input, given at once or
+        chunk by chunk, before cleaning it'''
+        columns = self.fitted_columns
+        counts = {column: ValueCounts() for column in columns}
+        for chunk in chunks:
+            for column in columns:
+                counts[column].update(chunk[column])
+
+        for rule in self.rules:
+            if rule['rule'] in ('iqr', 'zscore') and counts[rule['column']].counts.empty:
+                self.bounds[rule['name']] = (-np.inf, np.inf)
+            elif rule['rule'] == 'iqr':
+                q1, q3 = counts[rule['column']].quantile(0.25), counts[rule['column']].quantile(0.75)
+                k = rule.get('k', 1.5)
+                self.bounds[rule['name']] = (q1 - k * (q3 - q1), q3 + k * (q3 - q1))
+            elif rule['rule'] == 'zscore':
+                mean, std = counts[rule['column']].mean_std()
+                k = rule.get('k', 3)
+                self.bounds[rule['name']] = (mean - k * std, mean + k * std)
+        self.compile()
+        return self
+
+    def compile(self) -> None:
+        '''Merge the bounds of the rules of each column: the tightest clip and
+        drop bounds, and the sorted thresholds the rows are counted against'''
+        self.columns = {}
+        for rule in self.rules:
+            column = self.columns.setdefault(rule['column'], {
+                'clip': [-np.inf, np.inf], 'drop': [-np.inf, np.inf], 'rules': [], 'normalize': []})
+            if rule['rule'] == 'normalize':
+                column['normalize'].append(rule)
+                continue
+            if rule['rule'] == 'range':
+                low, high = rule.get('min'), rule.get('max')
+                low, high = -np.inf if low is None else low, np.inf if high is None else high
+            elif rule['name'] in self.bounds:
+                low, high = self.bounds[rule['name']]
+            else:
+                raise RuntimeError(f'Cleaning rule {rule["name"]} is not fitted')
+            bounds = column[rule.get('action', 'clip')]
+            bounds[0], bounds[1] = max(bounds[0], low), min(bounds[1], high)
+            column['rules'].append((rule['name'], low, high))
+
+        for column in self.columns.values():
+            column['thresholds'] = np.unique([
+                bound for _, low, high in column['rules'] for bound in (low, high) if np.isfinite(bound)])
+
+    def count_outside(self, column: dict, values: np.ndarray) -> None:
+        '''Add the rows outside the bounds of each rule of a column to the report.
+        The values are binned once against the sorted thresholds of all the rules:
+        with t the thresholds, a value below t[i] is in a bin up to 2i, equal to
+        t[i] in the bin 2i + 1 and above t[i] in a bin from 2i + 2'''
+        thresholds = column['thresholds']
+        bins = (np.searchsorted(thresholds, values, side='left')
+                + np.searchsorted(thresholds, values, side='right'))
+        bins[np.isnan(values)] = 2 * len(thresholds) + 1
+        counts = np.bincount(bins, minlength=2 * len(thresholds) + 2)[:-1]
+        below = np.concatenate([[0], counts.cumsum()])
+        for name, low, high in column['rules']:
+            outside = 0
+            if np.isfinite(low):
+                outside += below[2 * np.searchsorted(thresholds, low) + 1]
+            if np.isfinite(high):
+                outside += below[-1] - below[2 * np.searchsorted(thresholds, high) + 2]
+            self.report[name] += int(outside)
+
+    def normalize(self, rules: List[dict], series: pd.Series) -> pd.Series:
+        '''Normalise the distinct codes of a column, not every row'''
+        codes, uniques = pd.factorize(series)
+        if len(uniques) == 0:
+            return series
+        rows = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        normalized = pd.Series(uniques, dtype=object)
+        for rule in rules:
+            before = normalized
+            if rule.get('strip', True):
+                normalized = normalized.str.strip()
+            if rule.get('case', 'lower') == 'lower':
+                normalized = normalized.str.lower()
+            elif rule.get('case') == 'upper':
+                normalized = normalized.str.upper()
+            self.report[rule['name']] += int(rows[(normalized != before).to_numpy()].sum())
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # codes merged by the normalisation share one category
+            categories, category_codes = np.unique(normalized.to_numpy(dtype=str), return_inverse=True)
+            new_codes = np.where(codes < 0, -1, category_codes[codes])
+            return pd.Series(
+                pd.Categorical.from_codes(new_codes, categories), index=series.index, name=series.name)
+        values = normalized.to_numpy()[codes]
+        values[codes < 0] = None
+        return pd.Series(values, index=series.index, name=series.name)
+
+    def apply(self, pdf: pd.DataFrame) -> pd.DataFrame:
+        '''Clean a dataset or a chunk of it, adding the rows affected to the report
+
+        :param pdf: (dataframe)
+        Rows to clean, with the columns of the rules
+
+        :return: (dataframe)
+        Clean rows, a new frame whose columns without rules are not copied
+        '''
+        if self.columns is None:
+            raise RuntimeError('The cleaning rules are not fitted, call fit first')
+        drop = np.zeros(len(pdf), dtype=bool)
+        for name, column in self.columns.items():
+            if not column['rules']:
+                continue
+            values = pdf[name].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.count_outside(column, values)
+            low, high = column['drop']
+            if np.isfinite(low):
+                drop |= values < low
+            if np.isfinite(high):
+                drop |= values > high
+
+        pdf = pdf.copy(deep=False)
+        for name, column in self.columns.items():
+            if column['normalize']:
+                pdf[name] = self.normalize(column['normalize'], pdf[name])
+            low, high = column['clip']
+            if np.isfinite(low) or np.isfinite(high):
+                if pd.api.types.is_integer_dtype(pdf[name].dtype):
+                    low, high = np.ceil(low), np.floor(high)
+                pdf[name] = pdf[name].clip(
+                    None if np.isinf(low) else low, None if np.isinf(high) else high)
+        if drop.any():
+            pdf = pdf[~drop]
+
+        self.report['rows_in'] += len(drop)
+        self.report['rows_dropped'] += int(drop.sum())
+        self.report['rows_out'] += len(pdf)
+        return pdf
@@ -0,0 +1,332 @@
+'''
+Storage formats of the trusted layer and of the dataset artifacts,
+shared by the components. The parquet files are written with an
+explicit arrow schema matching the bigquery table of
+infrastructure/bigquery_tables.py, and every reader loads either
+parquet or the old csv files, projecting only the columns it needs
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import io
+import os
+from typing import Iterator, List
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATASET_FORMATS = ('parquet', 'csv')
+
+# columns of the dataset artifacts (train_set, test_set and clean_data)
+DATASET_ARROW_SCHEMA = pa.schema([
+    ('corporation', pa.string()),
+    ('lastmonth_activity', pa.int64()),
+    ('lastyear_activity', pa.int64()),
+    ('number_of_employees', pa.int64()),
+    ('exited', pa.int64())])
+DATASET_COLUMNS = DATASET_ARROW_SCHEMA.names
+
+# the trusted layer also keeps the row index, loaded as the ID of the bigquery table
+TRUSTED_ARROW_SCHEMA = pa.schema([('ID', pa.int64())] + list(DATASET_ARROW_SCHEMA))
+
+PARQUET_COMPRESSION = 'zstd'
+
+# types of the dataset columns once loaded, shared by every loader: the
+# corporation codes as a categorical and the integers in the smallest type
+# that holds them. An integer column with missing values is loaded as float64
+DATASET_DTYPES = {
+    'corporation': 'category',
+    'lastmonth_activity': 'int32',
+    'lastyear_activity': 'int32',
+    'number_of_employees': 'int32',
+    'exited': 'int8'}
+CATEGORICAL_COLUMNS = [column for column, dtype in DATASET_DTYPES.items() if dtype == 'category']
+
+
+def dataset_file_name(name: str, file_format: str) -> str:
+    '''File name of a dataset in a format, e.g. "train_set" -> "train_set.parquet"'''
+    if file_format not in DATASET_FORMATS:
+        raise ValueError(f'Unknown dataset format {file_format}, expected one of {DATASET_FORMATS}')
+    return f'{os.path.splitext(name)[0]}.{file_format}'
+
+
+def part_file_name(file_name: str, run: int) -> str:
+    '''File name of the part of a dataset appended by an ingestion run, e.g.
+    "train_set.parquet" -> "train_set.part-000012.parquet". The parts sort
+    after the full set and in the order of the runs'''
+    stem, extension = os.path.splitext(file_name)
+    return f'{stem}.part-{run:06d}{extension}'
+
+
+def dataset_parts(directory: str) -> List[str]:
+    '''Sorted paths of the dataset files of a folder, e.g. of a downloaded
+    artifact with the full set and the parts appended after it'''
+    paths = [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if os.path.splitext(name)[1][1:] in DATASET_FORMATS]
+    if not paths:
+        raise ValueError(f'There is no dataset file in {directory}')
+    return paths
+
+
+def to_arrow_table(pdf: pd.DataFrame, with_id: bool = False) -> pa.Table:
+    '''Convert a dataset to an arrow table with the explicit schema. Raises
+    when a column is missing or a value does not fit its type
+
+    :param pdf: (dataframe)
+    Dataset with the columns of DATASET_ARROW_SCHEMA
+
+    :param with_id: (bool)
+    Whether the row index is kept as the ID column of the trusted layer
+
+    :return: (table)
+    Arrow table, without the pandas metadata so that it reads back as a csv would
+    '''
+    if with_id:
+        pdf, schema = pdf.rename_axis('ID').reset_index(), TRUSTED_ARROW_SCHEMA
+    else:
+        schema = DATASET_ARROW_SCHEMA
+    table = pa.Table.from_pandas(pdf[schema.names], schema=schema, preserve_index=False)
+    return table.replace_schema_metadata(None)
+
+
+def write_dataset(pdf: pd.DataFrame, destination, file_format: str = 'parquet', with_id: bool = False) -> None:
+    '''Write a dataset to a local path or a binary buffer
+
+    :param pdf: (dataframe)
+    Dataset with the columns of DATASET_ARROW_SCHEMA
+
+    :param destination: (str or file)
+    Path or binary buffer of the output
+
+    :param file_format: (str)
+    "parquet" or "csv"
+
+    :param with_id: (bool)
+    Whether the row index is written, as in the trusted layer
+    '''
+    if file_format == 'parquet':
+        pq.write_table(to_arrow_table(pdf, with_id), destination, compression=PARQUET_COMPRESSION)
+    elif file_format == 'csv':
+        if isinstance(destination, str):
+            pdf.to_csv(destination, index=with_id)
+        else:
+            destination.write(pdf.to_csv(index=with_id).encode())
+    else:
+        raise ValueError(f'Unknown dataset format {file_format}, expected one of {DATASET_FORMATS}')
+
+
+def dataset_bytes(pdf: pd.DataFrame, file_format: str = 'parquet', with_id: bool = False) -> bytes:
+    '''Content of a dataset file, to upload it without a local file'''
+    buffer = io.BytesIO()
+    write_dataset(pdf, buffer, file_format, with_id)
+    return buffer.getvalue()
+
+
+def content_type(file_format: str) -> str:
+    '''Content type of the blobs of a dataset format'''
+    return 'text/csv' if file_format == 'csv' else 'application/vnd.apache.parquet'
+
+
+def is_named(column: str) -> bool:
+    '''Whether a csv column is not an "Unnamed" index written by pandas'''
+    return not column.startswith('Unnamed')
+
+
+def csv_dtypes() -> dict:
+    '''Types given to read_csv, the categorical columns are parsed as such and
+    the integers are cast by compact_dtypes, as they may have missing values'''
+    return {column: 'category' for column in CATEGORICAL_COLUMNS}
+
+
+def compact_dtypes(pdf: pd.DataFrame) -> pd.DataFrame:
+    '''Cast the dataset columns of a loaded frame to DATASET_DTYPES, in place,
+    and drop the "Unnamed" index columns of the old csv files
+
+    :param pdf: (dataframe)
+    Frame with some of the dataset columns, the other ones are kept as they are
+
+    :return: (dataframe)
+    The same frame. Raises a ValueError when an integer does not fit its type
+    '''
+    unnamed = [column for column in pdf.columns if str(column).startswith('Unnamed')]
+    if unnamed:
+        pdf.drop(columns=unnamed, inplace=True)
+    for column, dtype in DATASET_DTYPES.items():
+        if column not in pdf.columns or pdf[column].dtype == dtype:
+            continue
+        if dtype == 'category':
+            pdf[column] = pdf[column].astype('category')
+        elif pd.api.types.is_integer_dtype(pdf[column].dtype):
+            if pdf[column].hasnans:
+                pdf[column] = pdf[column].astype('float64')
+                continue
+            limits = np.iinfo(dtype)
+            if len(pdf) and (pdf[column].min() < limits.min or pdf[column].max() > limits.max):
+                raise ValueError(f'Column {column} has values out of the range of {dtype}')
+            pdf[column] = pdf[column].astype(dtype)
+    return pdf
+
+
+def compact_table(table: pa.Table) -> pa.Table:
+    '''Cast the integer dataset columns of an arrow table to DATASET_DTYPES,
+    before it is converted to pandas, raising when a value does not fit'''
+    for i, field in enumerate(table.schema):
+        dtype = DATASET_DTYPES.get(field.name)
+        if dtype not in (None, 'category') and pa.types.is_integer(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.from_numpy_dtype(np.dtype(dtype))))
+    return table
+
+
+def read_dataset(source, columns: List[str] = None, file_format: str = None) -> pd.DataFrame:
+    '''Read a dataset written as parquet or, as a fallback, as csv
+
+    :param source: (str, bytes or file)
+    Path, content or buffer of the file, or a folder whose parts are read in order
+
+    :param columns: (list)
+    Columns to load, None loads all of them. Projecting skips the other
+    columns entirely in parquet, and the "Unnamed: 0" index of the old csv files
+
+    :param file_format: (str)
+    "parquet" or "csv", by default taken from the extension of the path
+    (anything that is not .parquet is read as csv)
+
+    :return: (dataframe)
+    Pandas dataframe with the columns in the requested order, with DATASET_DTYPES
+    '''
+    if isinstance(source, str) and os.path.isdir(source):
+        frames = [read_dataset(path, columns, file_format) for path in dataset_parts(source)]
+        if len(frames) == 1:
+            return frames[0]
+        # the parts have their own categories, merged so that the columns stay categorical
+        for column in CATEGORICAL_COLUMNS:
+            if column in frames[0].columns:
+                categories = pd.api.types.union_categoricals([frame[column] for frame in frames]).categories
+                frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+        return pd.concat(frames, ignore_index=True)
+    if file_format is None:
+        file_format = 'parquet' if isinstance(source, str) and source.endswith('.parquet') else 'csv'
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    if file_format == 'parquet':
+        # the codes are read as a dictionary and never built as python strings,
+        # and the int64 columns are released one by one as they are cast
+        return compact_table(pq.read_table(source, columns=columns, read_dictionary=CATEGORICAL_COLUMNS)).to_pandas()
+    pdf = pd.read_csv(source, usecols=columns or is_named, dtype=csv_dtypes())
+    if columns is not None and list(pdf.columns) != columns:
+        pdf = pdf[columns]
+    return compact_dtypes(pdf)
+
+
+def iter_dataset(
+        source,
+        chunk_size: int,
+        columns: List[str] = None,
+        file_format: str = None,
+        with_id: bool = False) -> Iterator[pd.DataFrame]:
+    '''Read a dataset chunk by chunk, holding at most chunk_size rows at a time
+
+    :param source: (str or file)
+    Path or buffer of the file, or a folder whose parts are read in order
+
+    :param chunk_size: (int)
+    Rows of each chunk
+
+    :param columns: (list)
+    Columns to load, None loads all of them
+
+    :param file_format: (str)
+    "parquet" or "csv", by default taken from the extension of the path
+
+    :param with_id: (bool)
+    Whether the file is of the trusted layer, its ID column is then the index of the chunks
+
+    :return: (iterator)
+    Pandas dataframes, the same rows as read_dataset (or read_trusted) in order.
+    The categories of the categorical columns are the ones of each chunk
+    '''
+    if isinstance(source, str) and os.path.isdir(source):
+        for path in dataset_parts(source):
+            yield from iter_dataset(path, chunk_size, columns, file_format, with_id)
+        return
+    if file_format is None:
+        file_format = 'parquet' if isinstance(source, str) and source.endswith('.parquet') else 'csv'
+
+    if file_format == 'parquet':
+        if with_id:
+            columns = ['ID'] + (columns or DATASET_COLUMNS)
+        parquet_file = pq.ParquetFile(source, read_dictionary=CATEGORICAL_COLUMNS)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            chunk = compact_table(pa.Table.from_batches([batch])).to_pandas()
+            yield chunk.set_index('ID').rename_axis(None) if with_id else chunk
+    elif with_id:
+        for chunk in pd.read_csv(source, index_col=0, chunksize=chunk_size, dtype=csv_dtypes()):
+            chunk = compact_dtypes(chunk.rename_axis(None))
+            yield chunk if columns is None else chunk[columns]
+    else:
+        for chunk in pd.read_csv(source, usecols=columns or is_named, chunksize=chunk_size, dtype=csv_dtypes()):
+            yield compact_dtypes(chunk if columns is None else chunk[columns])
+
+
+def read_trusted(source, file_format: str = None) -> pd.DataFrame:
+    '''Read a file of the trusted layer with its ID column as the index,
+    the reverse of write_dataset(..., with_id=True)'''
+    if file_format is None:
+        file_format = 'parquet' if isinstance(source, str) and source.endswith('.parquet') else 'csv'
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    if file_format == 'parquet':
+        pdf = read_dataset(source, ['ID'] + DATASET_COLUMNS, file_format).set_index('ID')
+    else:
+        pdf = compact_dtypes(pd.read_csv(source, index_col=0, dtype=csv_dtypes()))
+    return pdf.rename_axis(None)
+
+
+class DatasetWriter:
+    '''Append batches of a dataset to a local file, in parquet row groups
+    or csv blocks, e.g. for the bounded memory mode of the trusted data step
+
+    :param path: (str)
+    Local path of the output
+
+    :param file_format: (str)
+    "parquet" or "csv"
+
+    :param with_id: (bool)
+    Whether the row index is written, as in the trusted layer
+    '''
+
+    def __init__(self, path: str, file_format: str = 'parquet', with_id: bool = False) -> None:
+        self.file_format = file_format
+        self.with_id = with_id
+        if file_format == 'parquet':
+            schema = TRUSTED_ARROW_SCHEMA if with_id else DATASET_ARROW_SCHEMA
+            self.output = pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION)
+        elif file_format == 'csv':
+            self.output = open(path, 'w')
+            self.header = True
+        else:
+            raise ValueError(f'Unknown dataset format {file_format}, expected one of {DATASET_FORMATS}')
+
+    def write(self, pdf: pd.DataFrame) -> None:
+        if self.file_format == 'parquet':
+            if len(pdf):
+                self.output.write_table(to_arrow_table(pdf, self.with_id))
+        else:
+            pdf.to_csv(self.output, header=self.header, index=self.with_id)
+            self.header = False
+
+    def close(self) -> None:
+        self.output.close()
+
+    def __enter__(self) -> 'DatasetWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
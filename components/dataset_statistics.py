@@ -0,0 +1,142 @@
+'''
+Statistics of a dataset accumulated chunk by chunk, shared by the
+components. They are all the data checks need (row count, columns,
+moments, minimum, maximum and the label distribution), so a dataset
+larger than the memory can be checked one chunk at a time, with the
+same results as from the whole dataframe. They are computed once by
+the step that writes a dataset and stored with its artifact
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import json
+from typing import Iterable
+import numpy as np
+import pandas as pd
+
+
+class DatasetStatistics:
+    '''Row count, columns, label distribution and, for every numeric
+    column, the count, mean, sum of squared deviations (m2), minimum
+    and maximum of its non missing values. The moments of the chunks
+    are merged with the parallel algorithm of Chan et al., which is as
+    stable as computing them on the whole column
+
+    :param label_column: (str)
+    Column whose value counts are kept
+    '''
+
+    def __init__(self, label_column: str = 'exited') -> None:
+        self.label_column = label_column
+        self.columns = None
+        self.n_rows = 0
+        self.moments = {}
+        self.label_counts = {}
+
+    def update(self, pdf: pd.DataFrame) -> 'DatasetStatistics':
+        '''Add the rows of a chunk'''
+        if self.columns is None:
+            self.columns = list(pdf.columns)
+        elif list(pdf.columns) != self.columns:
+            raise ValueError(f'Chunk columns {list(pdf.columns)} differ from {self.columns}')
+        self.n_rows += len(pdf)
+
+        for column in pdf.select_dtypes('number').columns:
+            values = pdf[column].dropna().to_numpy(dtype=np.float64)
+            if len(values) == 0:
+                continue
+            self.merge_moments(column, {
+                'count': len(values),
+                'mean': values.mean(),
+                'm2': ((values - values.mean()) ** 2).sum(),
+                'min': values.min(),
+                'max': values.max()})
+
+        if self.label_column in pdf.columns:
+            for label, count in pdf[self.label_column].value_counts().items():
+                self.label_counts[label] = self.label_counts.get(label, 0) + int(count)
+        return self
+
+    def merge_moments(self, column: str, chunk: dict) -> None:
+        '''Merge the moments of a chunk into the ones of a column'''
+        total = self.moments.get(column)
+        if total is None:
+            self.moments[column] = dict(chunk)
+            return
+        count = total['count'] + chunk['count']
+        delta = chunk['mean'] - total['mean']
+        total['m2'] += chunk['m2'] + delta ** 2 * total['count'] * chunk['count'] / count
+        total['mean'] += delta * chunk['count'] / count
+        total['count'] = count
+        total['min'] = min(total['min'], chunk['min'])
+        total['max'] = max(total['max'], chunk['max'])
+
+    @classmethod
+    def from_frame(cls, pdf: pd.DataFrame, label_column: str = 'exited') -> 'DatasetStatistics':
+        return cls(label_column).update(pdf)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[pd.DataFrame], label_column: str = 'exited') -> 'DatasetStatistics':
+        statistics = cls(label_column)
+        for chunk in chunks:
+            statistics.update(chunk)
+        return statistics
+
+    @property
+    def n_columns(self) -> int:
+        return len(self.columns or [])
+
+    def mean(self, column: str) -> float:
+        return self.moments[column]['mean']
+
+    def std(self, column: str) -> float:
+        '''Sample standard deviation (ddof=1), as scipy.stats.ttest_ind uses'''
+        return float(np.sqrt(self.variance(column)))
+
+    def count(self, column: str) -> int:
+        return self.moments[column]['count']
+
+    def variance(self, column: str) -> float:
+        '''Sample variance (ddof=1)'''
+        moments = self.moments[column]
+        return moments['m2'] / (moments['count'] - 1)
+
+    def minimum(self, column: str) -> float:
+        return self.moments[column]['min']
+
+    def maximum(self, column: str) -> float:
+        return self.moments[column]['max']
+
+    def label_distribution(self) -> pd.Series:
+        '''Count of each label, sorted by label'''
+        return pd.Series(self.label_counts, dtype='int64').sort_index()
+
+    def to_dict(self) -> dict:
+        '''Summary of the statistics with json types, e.g. for the metadata of an
+        artifact. The labels are kept as pairs so that they are not turned into strings'''
+        return {
+            'label_column': self.label_column,
+            'columns': self.columns,
+            'n_rows': self.n_rows,
+            'moments': {
+                column: {name: int(value) if name == 'count' else float(value) for name, value in moments.items()}
+                for column, moments in self.moments.items()},
+            'label_counts': [[label, count] for label, count in sorted(self.label_counts.items())]}
+
+    @classmethod
+    def from_dict(cls, summary: dict) -> 'DatasetStatistics':
+        statistics = cls(summary['label_column'])
+        statistics.columns = summary['columns']
+        statistics.n_rows = summary['n_rows']
+        statistics.moments = {column: dict(moments) for column, moments in summary['moments'].items()}
+        statistics.label_counts = {label: count for label, count in summary['label_counts']}
+        return statistics
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    @classmethod
+    def from_json(cls, text) -> 'DatasetStatistics':
+        return cls.from_dict(json.loads(text))
@@ -0,0 +1,151 @@
+'''
+Manifest of the files ingested in the raw layer of the data lake,
+shared by the components. Each file is recorded with its size,
+content hash, upload time and the run that uploaded it, so that
+unchanged files are skipped and the next steps can ask which
+files are new since a given run
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from typing import List
+
+MANIFEST_FILE_NAME = 'ingestion_manifest.json'
+
+
+def file_md5(file_path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    '''md5 hex digest of a file, read chunk by chunk'''
+    file_hash = hashlib.md5()
+    with open(file_path, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class IngestionManifest:
+    '''Files ingested by every run of the raw upload. The entries are keyed
+    by the destination blob path and runs are numbered from 1
+
+    :param runs: (list)
+    Dicts with the id and the start time of each run
+
+    :param files: (dict)
+    Entry of each ingested file: name, blob, size, md5, uploaded_at, run
+    and first_run, the run that uploaded its first content
+    '''
+
+    def __init__(self, runs: List[dict] = None, files: dict = None) -> None:
+        self.runs = runs or []
+        self.files = files or {}
+
+    @property
+    def last_run(self) -> int:
+        '''Id of the latest run, 0 if there was none'''
+        return self.runs[-1]['run'] if self.runs else 0
+
+    def start_run(self) -> int:
+        '''Open a new run, the files recorded from now on belong to it
+
+        :return: (int)
+        Id of the new run
+        '''
+        run = self.last_run + 1
+        self.runs.append({'run': run, 'started_at': datetime.now(timezone.utc).isoformat()})
+        return run
+
+    def is_unchanged(self, blob_path: str, size: int, md5: str) -> bool:
+        '''Whether the file was already uploaded with this exact content'''
+        entry = self.files.get(blob_path)
+        return entry is not None and entry['size'] == size and entry['md5'] == md5
+
+    def record(self, blob_path: str, name: str, size: int, md5: str) -> None:
+        '''Record a file uploaded by the latest run'''
+        previous = self.files.get(blob_path)
+        first_run = self.last_run if previous is None else previous.get('first_run', previous['run'])
+        self.files[blob_path] = {
+            'name': name,
+            'blob': blob_path,
+            'size': size,
+            'md5': md5,
+            'uploaded_at': datetime.now(timezone.utc).isoformat(),
+            'run': self.last_run,
+            'first_run': first_run}
+
+    def new_since(self, run: int, prefix: str = '') -> List[dict]:
+        '''Files uploaded or modified after a given run
+
+        :param run: (int)
+        Id of the run, 0 for every file
+
+        :param prefix: (str)
+        Only the blobs under this path, e.g. "raw/train_data/"
+
+        :return: (list)
+        Entries of the files, sorted by blob path
+        '''
+        return [
+            self.files[blob_path] for blob_path in sorted(self.files)
+            if self.files[blob_path]['run'] > run and blob_path.startswith(prefix)]
+
+    def changed_since(self, run: int, prefix: str = '') -> List[dict]:
+        '''Files already ingested by a given run and modified after it
+
+        :param run: (int)
+        Id of the run
+
+        :param prefix: (str)
+        Only the blobs under this path, e.g. "raw/train_data/"
+
+        :return: (list)
+        Entries of the files, sorted by blob path
+        '''
+        return [
+            entry for entry in self.new_since(run, prefix)
+            if entry.get('first_run', entry['run']) <= run]
+
+    def names(self, prefix: str = '') -> List[str]:
+        '''Sorted names of all the files ingested under a path'''
+        return sorted(
+            entry['name'] for blob_path, entry in self.files.items()
+            if blob_path.startswith(prefix))
+
+    def to_json(self) -> str:
+        return json.dumps({'runs': self.runs, 'files': self.files}, indent=2, sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text) -> 'IngestionManifest':
+        manifest = json.loads(text)
+        return cls(manifest['runs'], manifest['files'])
+
+    def save(self, manifest_path: str) -> None:
+        '''Write the manifest to a local file, atomically'''
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w') as manifest_file:
+            manifest_file.write(self.to_json())
+        os.replace(temp_path, manifest_path)
+
+    @classmethod
+    def load(cls, manifest_path: str) -> 'IngestionManifest':
+        '''Read a manifest from a local file, an empty one if it does not exist'''
+        if not os.path.exists(manifest_path):
+            return cls()
+        with open(manifest_path) as manifest_file:
+            return cls.from_json(manifest_file.read())
+
+    def upload(self, bucket, blob_path: str) -> None:
+        '''Write the manifest to a blob of the bucket'''
+        bucket.blob(blob_path).upload_from_string(self.to_json())
+
+    @classmethod
+    def download(cls, bucket, blob_path: str) -> 'IngestionManifest':
+        '''Read a manifest from a blob of the bucket, an empty one if it does not exist'''
+        blob = bucket.blob(blob_path)
+        if not blob.exists():
+            return cls()
+        return cls.from_json(blob.download_as_bytes())
@@ -0,0 +1,37 @@
+'''
+Memory usage of the running component, shared by the components
+to report the peak resident memory of their chunked modes
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import sys
+import psutil
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+def peak_rss_mb() -> float:
+    '''Peak resident set size of the process since it started, in MB'''
+    if sys.platform.startswith('linux'):
+        # ru_maxrss keeps the peak of the parent process across fork and exec,
+        # the high water mark of /proc is the one of this program only
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024 / 1e6
+    if resource is None:
+        return psutil.Process().memory_info().peak_wset / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macos, kilobytes on linux
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def rss_mb() -> float:
+    '''Current resident set size of the process, in MB'''
+    return psutil.Process().memory_info().rss / 1e6
@@ -1,5 +1,5 @@
 '''
-Script that moves csv tables from cloud storage to bigquery
+Script that moves parquet (or csv) tables from cloud storage to bigquery
 
 Author: Vitor Abdo
 Date: April/2023
@@ -17,7 +17,9 @@ logging.basicConfig(
 
 # config
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:/Users/4YouSee/Desktop/personal_work/risk_assessment/risk-assessment-380822-38a40f93abec.json'
-URI = 'gs://risk_assessment_storage/trusted/train_data/train_set.csv'
+# the trusted set and the parts appended by the incremental runs, the rows
+# already loaded are skipped by the merge on their ID
+URI = 'gs://risk_assessment_storage/trusted/train_data/train_set*.parquet'
 
 
 def create_bigquery_table(uri: str) -> None:
@@ -33,7 +35,8 @@ def create_bigquery_table(uri: str) -> None:
     dataset_id = 'historical_train_data'
     dataset_ref = client.dataset(dataset_id)
 
-    # Create schema
+    # Create schema, the parquet files of the trusted layer are written with the
+    # same one (components/dataset_format.py)
     schema=[
         bigquery.SchemaField('ID', 'INTEGER'),
         bigquery.SchemaField('corporation', 'STRING'),
@@ -61,15 +64,21 @@ def create_bigquery_table(uri: str) -> None:
     except:
         logging.info('Table already exists')
 
-    # Load the CSV to a temporary table
+    # Load the file to a temporary table
     temp_table_id = 'train_set_temp'
     temp_table_ref = dataset_ref.table(temp_table_id)
 
-    job_config = bigquery.LoadJobConfig(
-        schema=schema,
-        skip_leading_rows=1,
-        source_format=bigquery.SourceFormat.CSV,
-    )
+    if uri.endswith('.parquet'):
+        job_config = bigquery.LoadJobConfig(
+            schema=schema,
+            source_format=bigquery.SourceFormat.PARQUET,
+        )
+    else:
+        job_config = bigquery.LoadJobConfig(
+            schema=schema,
+            skip_leading_rows=1,
+            source_format=bigquery.SourceFormat.CSV,
+        )
     uri = uri
 
     load_job = client.load_table_from_uri(
@@ -8,11 +8,26 @@ Date: March/2023
 # Import necessary packages
 import json
 import logging
-import pickle
+import math
 import os
-import pandas as pd
-from fastapi import FastAPI
-from pydantic import BaseModel
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import List, Union
+import numpy as np
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, conlist, root_validator
+from decouple import config
+from serving.batching import MicroBatcher, QueueFullError
+from serving.cache import PredictionCache
+from serving.columnar import (
+    ARROW_STREAM_MEDIA_TYPE, read_arrow_columns, write_arrow_predictions)
+from serving.metrics import MetricsMiddleware, MetricsRegistry
+from serving.model_store import ModelStore
+from serving.prediction_log import PredictionLog
+from serving.ranking import TopN
+from serving.records import finite_column, parse_records, stream_chunks
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +37,7 @@ logging.basicConfig(
 
 # Creating a Fastapi object
 app = FastAPI()
+metrics = MetricsRegistry()
 
 class ModelInput(BaseModel):
     '''identifying the type of our model features'''
@@ -41,10 +57,185 @@ class ModelInput(BaseModel):
         }
 
 
-# get mlflow model pkl from prod_deployment_path folder
+# maximum number of records accepted by the batch endpoint
+MAX_BATCH_SIZE = 100000
+
+
+class ModelInputColumns(BaseModel):
+    '''identifying the type of our model features in a columnar batch,
+    where each feature is a list and the i-th element of every list
+    belongs to the same record'''
+    corporation: List[str]
+    lastmonth_activity: List[int]
+    lastyear_activity: List[int]
+    number_of_employees: List[str]
+
+    @root_validator(skip_on_failure=True)
+    def check_columns_length(cls, values):
+        '''all the columns must have the same number of records'''
+        lengths = {len(column) for column in values.values()}
+        if len(lengths) != 1:
+            raise ValueError('all the columns must have the same length')
+
+        batch_size = lengths.pop()
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(
+                f'the batch must have between 1 and {MAX_BATCH_SIZE} records')
+        return values
+
+    class Config:
+        schema_extra = {
+            "example": {
+            "corporation": ["nciw", "lsid"],
+            "lastmonth_activity": [45, 36],
+            "lastyear_activity": [0, 234],
+            "number_of_employees": [99, 541]
+            }
+        }
+
+
+ModelInputBatch = Union[
+    conlist(ModelInput, min_items=1, max_items=MAX_BATCH_SIZE),
+    ModelInputColumns]
+
+NO_RISK_MESSAGE = 'The person has no risk of leaving the company'
+RISK_MESSAGE = 'The person is at risk of leaving the company'
+
+
+# mlflow model pkl from prod_deployment_path folder, it is loaded and
+# warmed up on the startup of the api instead of at import time
 model_path = os.path.join('prod_deployment_path', 'model.pkl')
-sk_pipe = pickle.load(open(model_path, 'rb'))
-logging.info('Get prod mlflow model: SUCCESS')
+model_store = ModelStore(
+    model_path,
+    warmup_rows=config('WARMUP_ROWS', default=1024, cast=int),
+    shared_dir=config('SHARED_MODEL_DIR', default='') or None)
+app.state.ready = False
+
+# seconds between two checks for a new model.pkl, 0 disables the watcher
+MODEL_RELOAD_INTERVAL = config('MODEL_RELOAD_INTERVAL', default=30.0, cast=float)
+# shared token of the admin endpoints, sent in the X-Admin-Token header.
+# Without it the admin endpoints are disabled
+ADMIN_TOKEN = config('ADMIN_TOKEN', default='')
+
+
+def predict_records(records: List[dict]) -> List[tuple]:
+    '''Predict a list of records with a single predict call
+
+    :return: (list)
+    Pairs with the prediction and the model version of each record
+    '''
+    start = perf_counter()
+    current = model_store.current
+    input_columns = {
+        column: [record[column] for record in records]
+        for column in current.model.feature_names}
+    columns_end = perf_counter()
+    metrics.observe_stage('input_columns', columns_end - start)
+
+    predictions = current.model.predict(input_columns).tolist()
+    metrics.observe_stage('model_predict', perf_counter() - columns_end)
+    return [(prediction, current.version) for prediction in predictions]
+
+
+# cache of the predictions keyed on the normalized features, fully
+# invalidated whenever a new model is swapped in
+prediction_cache = PredictionCache(
+    max_entries=config('PREDICTION_CACHE_SIZE', default=10000, cast=int),
+    ttl=config('PREDICTION_CACHE_TTL', default=0.0, cast=float) or None)
+model_store.on_swap(lambda _: prediction_cache.clear())
+metrics.register_gauges('cache', prediction_cache.stats)
+
+
+def cache_key(record: dict, feature_names: List[str]) -> tuple:
+    '''Normalized values of the model features of a record. Raises a
+    ValueError when a feature is not a finite number, which the model
+    would reject for the whole batch the record is predicted with'''
+    key = tuple(float(record[column]) for column in feature_names)
+    if not all(math.isfinite(value) for value in key):
+        raise ValueError('the model features must be finite numbers')
+    return key
+
+
+# coalesce the concurrent single record requests into batched predict calls,
+# predicted by INFERENCE_WORKERS threads, which also score the bulk endpoints.
+# Beyond MAX_QUEUE_DEPTH waiting records and bulk calls the requests are
+# rejected right away with a Retry-After header
+INFERENCE_WORKERS = config('INFERENCE_WORKERS', default=1, cast=int)
+RETRY_AFTER_SECONDS = config('RETRY_AFTER_SECONDS', default=1, cast=int)
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+micro_batcher = MicroBatcher(
+    predict_records,
+    max_batch_size=config('MICRO_BATCH_MAX_SIZE', default=64, cast=int),
+    max_wait_ms=config('MICRO_BATCH_MAX_WAIT_MS', default=2.0, cast=float),
+    executor=inference_executor,
+    workers=INFERENCE_WORKERS,
+    max_queue_depth=config('MAX_QUEUE_DEPTH', default=1024, cast=int))
+metrics.register_gauges('batching', micro_batcher.stats)
+
+
+def queue_full_error() -> HTTPException:
+    '''503 answer to the requests rejected by a full inference queue'''
+    return HTTPException(
+        status_code=503,
+        detail='The inference queue is full, retry later',
+        headers={'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+
+async def run_inference(fn, *args):
+    '''Run a bulk predict call on the inference threads, behind the
+    admission check of the micro-batcher. Answers 503 when it is full'''
+    try:
+        return await micro_batcher.run(fn, *args)
+    except QueueFullError:
+        raise queue_full_error()
+
+# every scored record goes to a ring buffer flushed in the background to
+# parquet files partitioned by hour, read by the data drift check.
+# An empty PREDICTION_LOG_DIR disables the log
+PREDICTION_LOG_DIR = config('PREDICTION_LOG_DIR', default='prediction_log')
+prediction_log = None
+if PREDICTION_LOG_DIR:
+    prediction_log = PredictionLog(
+        PREDICTION_LOG_DIR,
+        [column for column in ModelInput.__fields__ if column != 'corporation'],
+        capacity=config('PREDICTION_LOG_CAPACITY', default=100000, cast=int),
+        flush_interval=config('PREDICTION_LOG_FLUSH_INTERVAL', default=10.0, cast=float))
+    metrics.register_gauges('prediction_log', prediction_log.stats)
+
+
+def log_predictions(corporations, input_columns, predictions, version: str) -> None:
+    '''Record the scored records, never waits for the disk'''
+    if prediction_log is not None:
+        prediction_log.record(corporations, input_columns, predictions, version)
+
+
+@app.on_event('startup')
+def startup():
+    '''load and warm up the model, start watching its file for new
+    deployed versions and only then report the api as ready'''
+    startup_start = perf_counter()
+    model_store.reload()
+    for phase, seconds in model_store.last_load_timings.items():
+        logging.info(f'Startup phase {phase}: {seconds:.4f}s')
+    logging.info('Get prod mlflow model: SUCCESS')
+
+    if MODEL_RELOAD_INTERVAL > 0:
+        model_store.watch(MODEL_RELOAD_INTERVAL)
+    if prediction_log is not None:
+        prediction_log.start()
+
+    app.state.ready = True
+    logging.info(f'Startup total: {perf_counter() - startup_start:.4f}s')
+
+
+@app.on_event('shutdown')
+def shutdown():
+    '''stop the model file watcher and flush the prediction log'''
+    app.state.ready = False
+    model_store.stop()
+    if prediction_log is not None:
+        prediction_log.stop()
 
 
 @app.get('/')
@@ -54,23 +245,216 @@ def greetings():
 
 
 @app.post('/risk_assessment_prediction')
-def income_pred(input_parameters: ModelInput):
-    '''post method to our inference'''
+async def income_pred(
+        input_parameters: ModelInput, request: Request, response: Response):
+    '''post method to our inference, the record is predicted
+    together with the other requests arriving at the same time.
+    Answers 503 right away when the inference queue is full'''
+    handler_start = perf_counter()
+    metrics.observe_stage('validation', handler_start - request.state.arrival_time)
 
     input_data = input_parameters.json()
     input_dictionary = json.loads(input_data)
+    json_end = perf_counter()
+    metrics.observe_stage('json_roundtrip', json_end - handler_start)
+
+    current = model_store.current
+    try:
+        key = cache_key(input_dictionary, current.model.feature_names)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    prediction = prediction_cache.get(key, current.version)
+    cache_end = perf_counter()
+    metrics.observe_stage('cache_lookup', cache_end - json_end)
+
+    if prediction is not None:
+        version = current.version
+    else:
+        try:
+            prediction, version = await micro_batcher.submit(input_dictionary)
+        except QueueFullError:
+            raise queue_full_error()
+        prediction_cache.put(key, prediction, version)
+        metrics.observe_stage('batched_predict', perf_counter() - cache_end)
+    response.headers['X-Model-Version'] = version
+    log_predictions(
+        [input_dictionary['corporation']],
+        {column: [value] for column, value in input_dictionary.items()},
+        [prediction], version)
+
+    if prediction == 0:
+        return NO_RISK_MESSAGE
+
+    return RISK_MESSAGE
+
+
+@app.post('/risk_assessment_prediction/batch')
+async def batch_pred(input_parameters: ModelInputBatch, response: Response):
+    '''post method to our inference over a batch of records, sent either
+    as a list of records or as a dict of columns. The whole batch is scored
+    with a single predict call on the inference threads and the answers
+    keep the input order. Answers 422 with the first record whose features
+    are not finite numbers and 503 when the inference queue is full'''
+    start = perf_counter()
+
+    current = model_store.current
+    if isinstance(input_parameters, ModelInputColumns):
+        corporations = input_parameters.corporation
+        input_columns = {
+            column: getattr(input_parameters, column)
+            for column in current.model.feature_names}
+    else:
+        corporations = [record.corporation for record in input_parameters]
+        input_columns = {
+            column: [getattr(record, column) for record in input_parameters]
+            for column in current.model.feature_names}
+    # a value the model would reject fails the request, not the predict call
+    try:
+        input_columns = {
+            column: finite_column(values, column) for column, values in input_columns.items()}
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    columns_end = perf_counter()
+    metrics.observe_stage('batch_input_columns', columns_end - start)
+
+    prediction = await run_inference(current.model.predict, input_columns)
+    metrics.observe_stage('batch_model_predict', perf_counter() - columns_end)
+    response.headers['X-Model-Version'] = current.version
+    log_predictions(corporations, input_columns, prediction, current.version)
+
+    return np.where(prediction == 0, NO_RISK_MESSAGE, RISK_MESSAGE).tolist()
+
+
+@app.post('/risk_assessment_prediction/arrow')
+async def arrow_pred(request: Request):
+    '''post method to our inference for the high-volume callers: the body is
+    an Arrow IPC stream with one column per feature and the predictions
+    come back as an Arrow IPC stream, without per record python objects.
+    Answers 503 when the inference queue is full'''
+    payload = await request.body()
+    current = model_store.current
+
+    start = perf_counter()
+    try:
+        input_columns = read_arrow_columns(
+            payload, current.model.feature_names, ['corporation'], MAX_BATCH_SIZE)
+    except ValueError as err:
+        raise HTTPException(status_code=422, detail=str(err))
+    columns_end = perf_counter()
+    metrics.observe_stage('arrow_input_columns', columns_end - start)
+
+    proba = await run_inference(current.model.predict_proba, input_columns)
+    metrics.observe_stage('arrow_model_predict', perf_counter() - columns_end)
+    predictions = current.model.classes.take(proba.argmax(axis=1))
+    risk_proba = proba[:, list(current.model.classes).index(1)]
+    log_predictions(
+        input_columns['corporation'], input_columns, predictions, current.version)
+
+    return Response(
+        content=write_arrow_predictions(predictions, risk_proba),
+        media_type=ARROW_STREAM_MEDIA_TYPE,
+        headers={'X-Model-Version': current.version})
+
+
+@app.post('/risk_assessment_ranking')
+async def ranking(
+        request: Request,
+        response: Response,
+        top_n: int = Query(500, ge=1, le=MAX_BATCH_SIZE),
+        id_column: str = 'corporation',
+        chunk_size: int = Query(10000, ge=1, le=MAX_BATCH_SIZE)):
+    '''post method that ranks the top_n records most likely to leave out of
+    a population streamed in the body, as newline-delimited json or as csv
+    (content-type text/csv). The population is scored in chunks and only
+    the top_n records are kept in memory, every scored record also goes to
+    the prediction log. Answers 503 when the inference queue is full'''
+    input_format = 'csv' if 'csv' in request.headers.get('content-type', '') else 'jsonl'
+    current = model_store.current
+    columns = list(dict.fromkeys([id_column] + current.model.feature_names))
+    risk_index = list(current.model.classes).index(1)
+    ranker = TopN(top_n)
+
+    async for lines in stream_chunks(request.stream(), chunk_size, input_format):
+        try:
+            features = parse_records(lines, input_format, columns, current.model.feature_names)
+        except (KeyError, ValueError) as err:
+            raise HTTPException(
+                status_code=422,
+                detail=f'Invalid records after row {ranker.population}: {err}')
+        proba = await run_inference(current.model.predict_proba, features)
+        ids = list(features[id_column])
+        ranker.push(ids, proba[:, risk_index])
+        # the ranked population is scored traffic too, the drift check reads it from the log
+        log_predictions(ids, features, current.model.classes.take(proba.argmax(axis=1)), current.version)
+
+    response.headers['X-Model-Version'] = current.version
+    return {'population': ranker.population, 'ranking': ranker.ranking()}
+
+
+@app.get('/ready')
+def ready(response: Response):
+    '''get method for the readiness probe: ready only after the
+    model was loaded and warmed up on the startup'''
+    if not app.state.ready:
+        response.status_code = 503
+        return {'ready': False}
+    return {'ready': True, 'version': model_store.current.version}
+
+
+@app.get('/stats/batching')
+def batching_stats():
+    '''get method with the queue depth, the rejected records and the
+    sizes of the batches flushed by the micro-batcher'''
+    return micro_batcher.stats()
+
+
+@app.get('/stats/cache')
+def cache_stats():
+    '''get method with the hit, miss and eviction counters of the prediction cache'''
+    return prediction_cache.stats()
+
+
+@app.get('/stats/prediction_log')
+def prediction_log_stats():
+    '''get method with the recorded, dropped and written counters
+    and the flush latency of the prediction log'''
+    if prediction_log is None:
+        return {'enabled': False}
+    return {'enabled': True, **prediction_log.stats()}
+
+
+@app.get('/model/status')
+def model_status():
+    '''get method with the version of the model currently served'''
+    return model_store.status()
+
+
+@app.post('/admin/reload')
+def reload_model(x_admin_token: str = Header(default='')):
+    '''post method to check the model file right away and swap in
+    a new version, the requests in flight finish on the old model.
+    Only for the callers with the ADMIN_TOKEN'''
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail='The admin endpoints are disabled, set ADMIN_TOKEN')
+    if not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail='Invalid admin token')
+    reloaded = model_store.reload(force=True)
+    return {'reloaded': reloaded, 'version': model_store.current.version}
 
-    input_df = pd.DataFrame(
-        input_dictionary,
-        columns=sk_pipe.named_steps['preprocessor'].transformers_[0][2],
-        index=[0])
 
-    prediction = sk_pipe.predict(input_df)
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics_text():
+    '''get method with the latency histograms and the counters
+    of the api in the Prometheus text format'''
+    return PlainTextResponse(
+        metrics.render(), media_type='text/plain; version=0.0.4')
 
-    if prediction[0] == 0:
-        return 'The person has no risk of leaving the company'
 
-    return 'The person is at risk of leaving the company'
+# count every request, the routes are labeled by their own path
+app.add_middleware(
+    MetricsMiddleware,
+    registry=metrics,
+    paths=[route.path for route in app.routes])
 
 
 if __name__ == '__main__':
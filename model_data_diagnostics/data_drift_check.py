@@ -9,8 +9,9 @@ Date: April/2023
 
 # import necessary packages
 import logging
-import io
 import os
+import sys
+from datetime import datetime, timedelta, timezone
 import pandas as pd
 import wandb
 from google.cloud import storage
@@ -24,6 +25,11 @@ from evidently.metrics import *
 from evidently.test_suite import TestSuite
 from evidently.tests import *
 
+# the serving helpers and the dataset formats live in the root of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serving.prediction_log import read_prediction_log
+from components.dataset_format import DATASET_COLUMNS, DATASET_DTYPES, compact_dtypes, read_dataset
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
@@ -31,22 +37,28 @@ logging.basicConfig(
 
 # config
 os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'C:/Users/4YouSee/Desktop/personal_work/risk_assessment/risk-assessment-380822-38a40f93abec.json'
-BUCKET_NAME = config('BUCKET_NAME')
-FILE_PATH = config('FILE_PATH')
+BUCKET_NAME = config('BUCKET_NAME', default='')
+FILE_PATH = config('FILE_PATH', default='')
 REF_DATASET = config('REF_DATASET')
 
+# folder of the prediction log written by the api, when given it is the
+# current dataset instead of the csv from gcs
+PREDICTION_LOG_DIR = config('PREDICTION_LOG_DIR', default='')
+# hours of the prediction log compared to the reference, 0 reads all of it
+PREDICTION_LOG_HOURS = config('PREDICTION_LOG_HOURS', default=24, cast=int)
+
 
-def read_gcs_csv_to_dataframe(bucket_name: str, file_path: str) -> pd.DataFrame:
-    '''Reads a CSV file from Google Cloud Storage and returns it as a Pandas DataFrame
+def read_gcs_dataset(bucket_name: str, file_path: str) -> pd.DataFrame:
+    '''Reads a parquet (or CSV) file from Google Cloud Storage and returns it as a Pandas DataFrame
 
     :param bucket_name: (str)
     The name of the bucket containing the file
 
     :param file_path: (str)
-    The path to the CSV file within the bucket
+    The path to the file within the bucket, its extension gives the format
 
     :return: (pandas.DataFrame)
-    A DataFrame containing the contents of the CSV file.
+    A DataFrame containing the dataset columns of the file.
     '''
 
     # Create a client to access Google Cloud Storage
@@ -55,18 +67,48 @@ def read_gcs_csv_to_dataframe(bucket_name: str, file_path: str) -> pd.DataFrame:
     # Get the bucket that contains the file
     bucket = storage_client.get_bucket(bucket_name)
 
-    # Get a blob object that represents the CSV file
+    # Get a blob object that represents the file
     blob = bucket.blob(file_path)
 
-    # Download the file as a string
-    csv_data = blob.download_as_string()
+    # Download the file as bytes
+    data = blob.download_as_bytes()
 
-    # Parse the CSV data into a Pandas DataFrame
-    historical_df = pd.read_csv(io.BytesIO(csv_data))
+    # Parse the data into a Pandas DataFrame
+    file_format = 'parquet' if file_path.endswith('.parquet') else 'csv'
+    historical_df = read_dataset(data, columns=DATASET_COLUMNS, file_format=file_format)
 
     return historical_df
 
 
+def read_prediction_log_dataset(log_dir: str, since: datetime = None) -> pd.DataFrame:
+    '''Reads the records scored by the api with the types of the reference dataset
+
+    :param log_dir: (str)
+    Folder of the prediction log
+
+    :param since: (datetime)
+    Oldest records read, all of them when None
+
+    :return: (pandas.DataFrame)
+    A DataFrame with the model features, the integer ones cast from the
+    floats of the log to DATASET_DTYPES, or the column type tests would fail
+    '''
+    pdf = read_prediction_log(log_dir, since)
+    integer_columns = [
+        column for column, dtype in DATASET_DTYPES.items()
+        if column in pdf.columns and dtype != 'category' and pd.api.types.is_float_dtype(pdf[column].dtype)]
+
+    # a record that is not a finite number can not be cast, it is left out of the check
+    finite = pdf[integer_columns].notna().all(axis=1) & pdf[integer_columns].abs().lt(float('inf')).all(axis=1)
+    if not finite.all():
+        logging.warning(f'{int((~finite).sum())} records of the prediction log are not finite, skipping them')
+        pdf = pdf[finite].reset_index(drop=True)
+    for column in integer_columns:
+        pdf[column] = pdf[column].round().astype('int64')
+
+    return compact_dtypes(pdf)
+
+
 def download_reference_dataset(ref_dataset: str) -> pd.DataFrame:
     '''Function that downloads the reference dataset to monitor data drift
 
@@ -86,7 +128,7 @@ def download_reference_dataset(ref_dataset: str) -> pd.DataFrame:
     artifact = run.use_artifact(ref_dataset, type='dataset')
     filepath = artifact.file()
     wandb.finish()
-    df_reference = pd.read_csv(filepath)
+    df_reference = read_dataset(filepath, columns=DATASET_COLUMNS)
 
     return df_reference
 
@@ -95,12 +137,23 @@ if __name__ == '__main__':
     logging.info('About to start the data drift check\n')
 
     # download datasets
-    current = read_gcs_csv_to_dataframe(BUCKET_NAME, FILE_PATH)
-    logging.info('Historical dataset downloaded: SUCCESS')
+    if PREDICTION_LOG_DIR:
+        since = None
+        if PREDICTION_LOG_HOURS > 0:
+            since = datetime.now(timezone.utc) - timedelta(hours=PREDICTION_LOG_HOURS)
+        current = read_prediction_log_dataset(PREDICTION_LOG_DIR, since)
+        logging.info(f'Prediction log read with {len(current)} records: SUCCESS')
+    else:
+        current = read_gcs_dataset(BUCKET_NAME, FILE_PATH)
+        logging.info('Historical dataset downloaded: SUCCESS')
 
     reference = download_reference_dataset(REF_DATASET)
     logging.info('Reference dataset downloaded: SUCCESS')
 
+    # the prediction log has no target, only the columns on both sides are compared
+    common_columns = [column for column in reference.columns if column in current.columns]
+    reference, current = reference[common_columns], current[common_columns]
+
     # generate evidently data drift report
     report = Report(metrics=[
     DataDriftPreset(), 
@@ -10,7 +10,6 @@ Date: March/2023
 # Import necessary packages
 import os
 import sys
-import pickle
 import logging
 import pandas as pd
 import numpy as np
@@ -19,6 +18,11 @@ import smtplib
 from decouple import config
 from sklearn.metrics import f1_score
 
+# the serving helpers and the dataset formats live in the root of the repository
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serving.inference import load_model
+from components.dataset_format import DATASET_COLUMNS, read_dataset
+
 logging.basicConfig(
     level=logging.INFO,
     filemode='w',
@@ -34,6 +38,7 @@ run = wandb.init(
 FROM = config('FROM')
 TO = config('TO')
 PASS = config('PASS')
+TEST_SET = config('TEST_SET', default='vitorabdo/risk_assessment/test_set.parquet:latest')
 
 def raw_comparison_test(hist_metrics: str, newf1score: int) -> bool:
     '''raw comparison: we simply check whether current 
@@ -161,20 +166,19 @@ if __name__ == '__main__':
     
     # get mlflow model
     model_path = os.path.join('prod_deployment_path', 'model.pkl')
-    sk_pipe = pickle.load(open(model_path, 'rb'))
+    model = load_model(model_path)
     
     # download test dataset
-    test_data = run.use_artifact('vitorabdo/risk_assessment/test_set.csv:latest', 
-                                 type='dataset').file()
+    test_data = run.use_artifact(TEST_SET, type='dataset').file()
     wandb.finish()
     
     # Read test dataset
-    test_data = pd.read_csv(test_data)
+    test_data = read_dataset(test_data, columns=DATASET_COLUMNS)
     X_test = test_data.drop(['exited'], axis=1)
     y_test = test_data['exited']
 
     # making inference on test set
-    y_pred = sk_pipe.predict(X_test)
+    y_pred = model.predict(X_test)
     new_f1score = f1_score(y_test, y_pred)
 
     # Test to check if there was model drift
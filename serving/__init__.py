@@ -0,0 +1,7 @@
+'''
+Package with the helpers used to serve the production model,
+shared by the inference api and the diagnostics scripts
+
+Author: Vitor Abdo
+Date: October/2026
+'''
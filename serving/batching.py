@@ -0,0 +1,237 @@
+'''
+This file creates an asyncio micro-batcher that coalesces the single
+record requests of the api into batched predict calls, with a bounded
+queue that rejects the records it could not serve in time. The bulk
+calls of the other endpoints run on the same executor, behind the same
+admission check
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import asyncio
+from functools import partial
+from typing import Any, Callable, List
+
+
+class QueueFullError(Exception):
+    '''Raised when a record is submitted to a full micro-batcher queue'''
+
+
+class MicroBatcher:
+    '''Queue the records submitted by concurrent callers and flush them as
+    one batch when either max_batch_size records are waiting or the oldest
+    record waited max_wait_ms. While a batch is being predicted the next
+    one keeps filling, so the batches grow with the traffic. Up to
+    workers batches are predicted at the same time and, once
+    max_queue_depth records are waiting, new records are rejected
+    instead of queued. Each bulk call in flight (run) counts as one
+    waiting record
+
+    :param predict_fn: (callable)
+    Function that receives a list of records and returns a list with
+    one result for each record, in the same order
+
+    :param max_batch_size: (int)
+    Maximum number of records in each batch
+
+    :param max_wait_ms: (float)
+    Maximum time, in milliseconds, a record waits for the batch to fill up
+
+    :param executor: (Executor)
+    Executor where predict_fn runs, the default executor of the loop if None
+
+    :param workers: (int)
+    Number of batches predicted at the same time
+
+    :param max_queue_depth: (int)
+    Maximum number of records waiting for a batch and bulk calls in
+    flight, 0 for no limit
+    '''
+
+    def __init__(
+            self,
+            predict_fn: Callable[[List[Any]], List[Any]],
+            max_batch_size: int = 64,
+            max_wait_ms: float = 2.0,
+            executor=None,
+            workers: int = 1,
+            max_queue_depth: int = 0) -> None:
+        if max_batch_size < 1:
+            raise ValueError('max_batch_size must be at least 1')
+        if workers < 1:
+            raise ValueError('workers must be at least 1')
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.workers = workers
+        self.max_queue_depth = max_queue_depth
+        self.in_flight = 0
+        # bulk calls waiting for or running on the executor
+        self.calls_in_flight = 0
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self.reset_stats()
+
+    async def submit(self, record: Any) -> Any:
+        '''Queue a record and wait for its own result
+
+        :param record: (any)
+        Record to be predicted
+
+        :return: (any)
+        The result of predict_fn for this record. Raises QueueFullError
+        without waiting when max_queue_depth records and calls are already waiting
+        '''
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._start(loop)
+        elif any(worker.done() for worker in self._workers):
+            # replace the flushing tasks that died, the others keep their batches
+            self._workers = [
+                loop.create_task(self._run()) if worker.done() else worker
+                for worker in self._workers]
+
+        self._admit()
+        future = loop.create_future()
+        self._queue.put_nowait((record, future))
+        return await future
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        '''Run a whole bulk call, already batched by its caller, on the
+        executor of the batches and behind the same admission check, so
+        that it does not get around the bounded queue
+
+        :param fn: (callable)
+        Function to run, called as fn(*args)
+
+        :return: (any)
+        The result of fn. Raises QueueFullError without waiting when
+        max_queue_depth records and calls are already waiting
+        '''
+        self._admit()
+        self.calls_in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args))
+        finally:
+            self.calls_in_flight -= 1
+
+    def queue_depth(self) -> int:
+        '''Records waiting for a batch plus the bulk calls in flight'''
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + self.calls_in_flight
+
+    def _admit(self) -> None:
+        '''Raise QueueFullError when max_queue_depth is reached'''
+        if self.max_queue_depth and self.queue_depth() >= self.max_queue_depth:
+            self.n_rejected += 1
+            raise QueueFullError(f'{self.queue_depth()} records and calls are already waiting')
+
+    def reset_stats(self) -> None:
+        '''Zero the batch size statistics'''
+        self.n_batches = 0
+        self.n_records = 0
+        self.largest_batch = 0
+        self.n_rejected = 0
+        # batches that failed and were predicted again record by record
+        self.n_failed_batches = 0
+        # histogram of the batch sizes in power of two buckets
+        self.batch_size_buckets = {}
+
+    def stats(self) -> dict:
+        '''Statistics of the sizes of the flushed batches
+
+        :return: (dict)
+        Queue depth, bulk calls in flight, rejected records, number of batches and records, mean
+        and largest batch size and the histogram of the batch sizes, keyed
+        by the bucket upper bound
+        '''
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'workers': self.workers,
+            'max_queue_depth': self.max_queue_depth,
+            'queued_records': self._queue.qsize() if self._queue is not None else 0,
+            'batches_in_flight': self.in_flight,
+            'calls_in_flight': self.calls_in_flight,
+            'rejected_records': self.n_rejected,
+            'failed_batches': self.n_failed_batches,
+            'batches': self.n_batches,
+            'records': self.n_records,
+            'mean_batch_size': self.n_records / self.n_batches if self.n_batches else 0.0,
+            'largest_batch_size': self.largest_batch,
+            'batch_size_histogram': {
+                str(bucket): self.batch_size_buckets[bucket]
+                for bucket in sorted(self.batch_size_buckets)}}
+
+    def _start(self, loop: asyncio.AbstractEventLoop) -> None:
+        '''Create the queue and the flushing tasks in the running loop'''
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._workers = [loop.create_task(self._run()) for _ in range(self.workers)]
+
+    async def _run(self) -> None:
+        '''Flushing task: collect a batch, predict it and hand out the results'''
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._flush(loop, batch)
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop, batch: list) -> None:
+        '''Predict one batch and resolve the future of each caller. When the
+        batch fails, its records are predicted one at a time, so that only
+        the callers of the records that fail on their own get the error'''
+        self._record_batch(len(batch))
+        records = [record for record, _ in batch]
+        self.in_flight += 1
+        try:
+            results = await loop.run_in_executor(self.executor, self.predict_fn, records)
+        except Exception as err:
+            if len(batch) == 1:
+                self._set_exception(batch[0][1], err)
+                return
+            self.n_failed_batches += 1
+            for record, future in batch:
+                try:
+                    result = (await loop.run_in_executor(self.executor, self.predict_fn, [record]))[0]
+                except Exception as record_err:
+                    self._set_exception(future, record_err)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            return
+        finally:
+            self.in_flight -= 1
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _set_exception(future: asyncio.Future, err: Exception) -> None:
+        if not future.done():
+            future.set_exception(err)
+
+    def _record_batch(self, batch_size: int) -> None:
+        self.n_batches += 1
+        self.n_records += batch_size
+        self.largest_batch = max(self.largest_batch, batch_size)
+        bucket = 1 << (batch_size - 1).bit_length()
+        self.batch_size_buckets[bucket] = self.batch_size_buckets.get(bucket, 0) + 1
@@ -0,0 +1,120 @@
+'''
+This file creates a bounded LRU cache for the predictions of the api
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class PredictionCache:
+    '''In-process LRU cache of predictions. Each entry remembers the model
+    version that produced it, so an entry of an older model is never served
+
+    :param max_entries: (int)
+    Maximum number of cached predictions, the least recently used
+    entry is evicted when it is full. 0 disables the cache
+
+    :param ttl: (float)
+    Seconds an entry stays valid, None for entries without expiration
+    '''
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        '''Whether the cache keeps any entry'''
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, version: str) -> Optional[Any]:
+        '''Cached prediction for the key
+
+        :param key: (hashable)
+        Normalized values of the record
+
+        :param version: (str)
+        Version of the model currently served
+
+        :return: (any)
+        The cached prediction, or None on a miss
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, entry_version, expires_at = entry
+            if entry_version != version:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, version: str) -> None:
+        '''Cache the prediction of a record
+
+        :param key: (hashable)
+        Normalized values of the record
+
+        :param value: (any)
+        Prediction of the record
+
+        :param version: (str)
+        Version of the model that made the prediction
+        '''
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, version, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        '''Drop every entry, used when the served model changes'''
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        '''Counters to size the cache
+
+        :return: (dict)
+        Size, capacity, hits, misses, evictions, expirations and invalidations
+        '''
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations}
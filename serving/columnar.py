@@ -0,0 +1,91 @@
+'''
+This file reads and writes the Apache Arrow IPC stream payloads of the
+high-volume callers: the columns become the model input arrays without
+building one python object per record, and the schema is checked once
+per column
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+from typing import Dict, List
+import numpy as np
+import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+
+def read_arrow_columns(
+        payload: bytes,
+        numeric_columns: List[str],
+        string_columns: List[str],
+        max_rows: int) -> Dict[str, np.ndarray]:
+    '''Validate an Arrow IPC stream and turn its columns into numpy arrays
+
+    :param payload: (bytes)
+    Body with an Arrow IPC stream
+
+    :param numeric_columns: (list)
+    Columns that must be integer or floating point
+
+    :param string_columns: (list)
+    Columns that must be strings
+
+    :param max_rows: (int)
+    Maximum number of records accepted
+
+    :return: (dict)
+    One numpy array for each column. Raises ValueError with
+    the problems of every invalid column
+    '''
+    try:
+        table = pa.ipc.open_stream(payload).read_all()
+    except pa.ArrowInvalid as err:
+        raise ValueError(f'the body is not an Arrow IPC stream: {err}')
+
+    if not 1 <= table.num_rows <= max_rows:
+        raise ValueError(f'the batch must have between 1 and {max_rows} records')
+
+    errors = []
+    for column in numeric_columns + string_columns:
+        if column not in table.column_names:
+            errors.append(f'{column}: missing column')
+            continue
+
+        data = table.column(column)
+        if column in numeric_columns and not (
+                pa.types.is_integer(data.type) or pa.types.is_floating(data.type)):
+            errors.append(f'{column}: expected a numeric column, got {data.type}')
+        elif column in string_columns and not (
+                pa.types.is_string(data.type) or pa.types.is_large_string(data.type)):
+            errors.append(f'{column}: expected a string column, got {data.type}')
+        elif data.null_count:
+            errors.append(f'{column}: {data.null_count} null values')
+    if errors:
+        raise ValueError('; '.join(errors))
+
+    return {
+        column: table.column(column).to_numpy()
+        for column in numeric_columns + string_columns}
+
+
+def write_arrow_predictions(predictions: np.ndarray, risk_proba: np.ndarray) -> bytes:
+    '''Serialize the predictions as an Arrow IPC stream
+
+    :param predictions: (array)
+    Predicted label of each record
+
+    :param risk_proba: (array)
+    Probability of leaving of each record
+
+    :return: (bytes)
+    Arrow IPC stream with the "prediction" and "risk_probability" columns
+    '''
+    table = pa.table({
+        'prediction': pa.array(predictions),
+        'risk_probability': pa.array(risk_proba)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
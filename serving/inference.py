@@ -0,0 +1,314 @@
+'''
+This file compiles the production pipeline (StandardScaler + DecisionTree)
+into flat numpy arrays, so that the inference can skip the sklearn
+validations, the pandas column selection and the ColumnTransformer
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import logging
+import pickle
+from typing import TYPE_CHECKING, Mapping
+import numpy as np
+
+# pandas and sklearn are only imported when they are needed (unpickling
+# the model already imports sklearn), so importing this file is cheap
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.pipeline import Pipeline
+
+# sklearn marks the leaves of the tree with this child index
+TREE_LEAF = -1
+
+
+class CompiledPipeline:
+    '''Flat numpy version of the StandardScaler + DecisionTreeClassifier
+    pipeline. It predicts over raw feature arrays, vectorized across
+    the whole batch, and gives the same results as the sklearn pipeline
+
+    :param feature_names: (list)
+    Name of the features, in the order of the columns of the input arrays
+
+    :param mean: (array)
+    Mean of each feature learned by the StandardScaler
+
+    :param scale: (array)
+    Scale of each feature learned by the StandardScaler
+
+    :param children_left: (array)
+    Index of the left child of each node of the tree (-1 for the leaves)
+
+    :param children_right: (array)
+    Index of the right child of each node of the tree (-1 for the leaves)
+
+    :param feature: (array)
+    Index of the feature used to split each node of the tree, the
+    leaves must point to a valid column (e.g. 0)
+
+    :param threshold: (array)
+    Threshold used to split each node of the tree
+
+    :param value: (array)
+    Class distribution of each node of the tree, shape (n_nodes, n_classes)
+
+    :param classes: (array)
+    Labels of the classes learned by the tree
+
+    :param max_depth: (int)
+    Number of split levels of the tree, computed from the children if None
+    '''
+
+    def __init__(
+            self,
+            feature_names: list,
+            mean: np.ndarray,
+            scale: np.ndarray,
+            children_left: np.ndarray,
+            children_right: np.ndarray,
+            feature: np.ndarray,
+            threshold: np.ndarray,
+            value: np.ndarray,
+            classes: np.ndarray,
+            max_depth: int = None) -> None:
+        # the arrays are kept as given, so they can be read-only views
+        # of a memory-mapped file shared by many processes
+        self.feature_names = list(feature_names)
+        self.mean = mean
+        self.scale = scale
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.classes = classes
+        self.max_depth = (
+            _tree_depth(children_left, children_right) if max_depth is None else max_depth)
+
+    @classmethod
+    def from_pipeline(cls, sk_pipe: 'Pipeline') -> 'CompiledPipeline':
+        '''Extract the arrays of a fitted sklearn pipeline
+
+        :param sk_pipe: (Pipeline)
+        Fitted pipeline with a "preprocessor" ColumnTransformer holding
+        a single StandardScaler and a "dt" DecisionTreeClassifier
+
+        :return: (CompiledPipeline)
+        The compiled version of the pipeline. Raises ValueError when
+        the pipeline doesn't have the supported shape
+        '''
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.tree import DecisionTreeClassifier
+
+        steps = dict(sk_pipe.steps) if isinstance(sk_pipe, Pipeline) else {}
+        preprocessor = steps.get('preprocessor')
+        model = steps.get('dt')
+        if (len(steps) != 2 or
+                not isinstance(preprocessor, ColumnTransformer) or
+                type(model) is not DecisionTreeClassifier):
+            raise ValueError('Only the StandardScaler + DecisionTree pipeline can be compiled')
+
+        transformers = [
+            (name, transformer, columns)
+            for name, transformer, columns in preprocessor.transformers_
+            if not (name == 'remainder' and transformer == 'drop')]
+        if len(transformers) != 1 or not isinstance(transformers[0][1], StandardScaler):
+            raise ValueError('The preprocessor must be a single StandardScaler')
+        _, scaler, feature_names = transformers[0]
+
+        if model.n_outputs_ != 1:
+            raise ValueError('Only single output trees can be compiled')
+
+        n_features = len(feature_names)
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+        tree = model.tree_
+        return cls(
+            feature_names=feature_names,
+            mean=np.asarray(mean, dtype=np.float64),
+            scale=np.asarray(scale, dtype=np.float64),
+            children_left=tree.children_left.copy(),
+            children_right=tree.children_right.copy(),
+            # leaves have a negative feature index, point them to a valid column
+            feature=np.maximum(tree.feature, 0),
+            threshold=tree.threshold.copy(),
+            value=tree.value[:, 0, :].copy(),
+            classes=model.classes_.copy())
+
+    def to_array(self, features: Mapping) -> np.ndarray:
+        '''Stack the model features into a float array
+
+        :param features: (mapping)
+        DataFrame or dict with one array-like for each feature
+
+        :return: (array)
+        Array of shape (n_rows, n_features) in the order of the model features
+        '''
+        return np.column_stack([
+            np.asarray(features[column], dtype=np.float64)
+            for column in self.feature_names])
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        '''Find the leaf of the tree reached by each row
+
+        :param X: (array)
+        Raw (not scaled) features, shape (n_rows, n_features)
+
+        :return: (array)
+        Index of the leaf reached by each row
+        '''
+        X = np.asarray(X, dtype=np.float64)
+        if not np.isfinite(X).all():
+            raise ValueError('Input contains NaN or infinity')
+
+        # same arithmetic as StandardScaler followed by the float32 cast of the tree
+        X = ((X - self.mean) / self.scale).astype(np.float32)
+        rows = np.arange(X.shape[0])
+        node = np.zeros(X.shape[0], dtype=np.intp)
+
+        for _ in range(self.max_depth):
+            left = self.children_left[node]
+            is_split = left != TREE_LEAF
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(
+                is_split,
+                np.where(go_left, left, self.children_right[node]),
+                node)
+        return node
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        '''Probability of each class for each row
+
+        :param X: (array)
+        Raw (not scaled) features, shape (n_rows, n_features)
+
+        :return: (array)
+        Array of shape (n_rows, n_classes)
+        '''
+        proba = self.value[self.apply(X)]
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        '''Predicted class for each row
+
+        :param X: (array)
+        Raw (not scaled) features, shape (n_rows, n_features)
+
+        :return: (array)
+        Predicted labels
+        '''
+        return self.classes.take(np.argmax(self.value[self.apply(X)], axis=1))
+
+
+class InferenceModel:
+    '''Production model used for the inferences. It uses the compiled
+    pipeline when the pipeline shape is supported and falls back to
+    sklearn otherwise
+
+    :param sk_pipe: (Pipeline)
+    Fitted sklearn pipeline
+
+    :param compile_model: (bool)
+    Whether to try the compiled inference path
+    '''
+
+    @classmethod
+    def from_compiled(cls, compiled: CompiledPipeline) -> 'InferenceModel':
+        '''Model served only by a compiled pipeline, without sklearn
+
+        :param compiled: (CompiledPipeline)
+        Compiled pipeline, e.g. mapped from a shared file
+
+        :return: (InferenceModel)
+        The model ready for the inferences
+        '''
+        model = cls.__new__(cls)
+        model.sk_pipe = None
+        model.feature_names = compiled.feature_names
+        model.classes = compiled.classes
+        model.compiled = compiled
+        return model
+
+    def __init__(self, sk_pipe: 'Pipeline', compile_model: bool = True) -> None:
+        self.sk_pipe = sk_pipe
+        self.feature_names = list(
+            sk_pipe.named_steps['preprocessor'].transformers_[0][2])
+        self.classes = sk_pipe.classes_
+        self.compiled = None
+
+        if compile_model:
+            try:
+                self.compiled = CompiledPipeline.from_pipeline(sk_pipe)
+                logging.info('Compile the model pipeline: SUCCESS')
+            except (ValueError, AttributeError) as err:
+                logging.warning(f'Model pipeline not compiled, using sklearn: {err}')
+
+    def predict(self, features: Mapping) -> np.ndarray:
+        '''Predicted class for each record
+
+        :param features: (mapping)
+        DataFrame or dict with one array-like for each feature
+
+        :return: (array)
+        Predicted labels
+        '''
+        if self.compiled is not None:
+            return self.compiled.predict(self.compiled.to_array(features))
+        return self.sk_pipe.predict(self._to_frame(features))
+
+    def predict_proba(self, features: Mapping) -> np.ndarray:
+        '''Probability of each class for each record
+
+        :param features: (mapping)
+        DataFrame or dict with one array-like for each feature
+
+        :return: (array)
+        Array of shape (n_records, n_classes)
+        '''
+        if self.compiled is not None:
+            return self.compiled.predict_proba(self.compiled.to_array(features))
+        return self.sk_pipe.predict_proba(self._to_frame(features))
+
+    def _to_frame(self, features: Mapping) -> 'pd.DataFrame':
+        import pandas as pd
+
+        if isinstance(features, pd.DataFrame):
+            return features
+        return pd.DataFrame(
+            {column: features[column] for column in self.feature_names},
+            columns=self.feature_names)
+
+
+def load_model(model_path: str, compile_model: bool = True) -> InferenceModel:
+    '''Load the pickled production pipeline
+
+    :param model_path: (str)
+    Path to the model.pkl file
+
+    :param compile_model: (bool)
+    Whether to try the compiled inference path
+
+    :return: (InferenceModel)
+    The model ready for the inferences
+    '''
+    with open(model_path, 'rb') as model_file:
+        sk_pipe = pickle.load(model_file)
+    return InferenceModel(sk_pipe, compile_model=compile_model)
+
+
+def _tree_depth(children_left: np.ndarray, children_right: np.ndarray) -> int:
+    '''Number of split levels of the tree'''
+    depth = 0
+    nodes = np.array([0])
+    while nodes.size:
+        nodes = nodes[children_left[nodes] != TREE_LEAF]
+        if nodes.size:
+            depth += 1
+            nodes = np.concatenate([children_left[nodes], children_right[nodes]])
+    return depth
@@ -0,0 +1,213 @@
+'''
+This file creates the low overhead instrumentation of the api: latency
+histograms per stage, request and error counters, exported in the
+Prometheus text format
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List
+
+# upper bounds, in seconds, of the latency buckets: 10us to 10s
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    '''Histogram of latencies with fixed buckets. Observing a value is
+    a binary search and two increments, around a microsecond
+
+    :param buckets: (tuple)
+    Sorted upper bounds of the buckets, in seconds
+    '''
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # the last position counts the values above the largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        '''Record one latency, in seconds'''
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        '''Number of values lower or equal to each bound, plus +Inf'''
+        cumulative, running = [], 0
+        for count in self.counts:
+            running += count
+            cumulative.append(running)
+        return cumulative
+
+
+class MetricsRegistry:
+    '''Latency histograms per stage, request and error counters and the
+    gauges of other components, rendered in the Prometheus text format
+
+    :param namespace: (str)
+    Prefix of the name of every metric
+    '''
+
+    def __init__(self, namespace: str = 'risk_assessment_api') -> None:
+        self.namespace = namespace
+        self.stage_latency = {}
+        self.request_latency = {}
+        self.requests = {}
+        self.errors = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        '''Record the latency of one stage of the inference
+
+        :param stage: (str)
+        Name of the stage, e.g. "validation" or "model_predict"
+
+        :param seconds: (float)
+        Time spent in the stage
+        '''
+        histogram = self.stage_latency.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stage_latency.setdefault(stage, LatencyHistogram())
+        histogram.observe(seconds)
+
+    def observe_request(self, path: str, status: int, seconds: float) -> None:
+        '''Record a finished request
+
+        :param path: (str)
+        Route of the request
+
+        :param status: (int)
+        Http status code of the response
+
+        :param seconds: (float)
+        Total time spent in the api
+        '''
+        histogram = self.request_latency.get(path)
+        if histogram is None:
+            with self._lock:
+                histogram = self.request_latency.setdefault(path, LatencyHistogram())
+        histogram.observe(seconds)
+
+        with self._lock:
+            key = (path, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 500:
+                self.errors[path] = self.errors.get(path, 0) + 1
+
+    def register_gauges(self, subsystem: str, collect: Callable[[], dict]) -> None:
+        '''Export the numeric values of a stats function as gauges
+
+        :param subsystem: (str)
+        Name added to the metric names, e.g. "cache"
+
+        :param collect: (callable)
+        Function returning a dict of stats, the non numeric ones are skipped
+        '''
+        self._gauges.append((subsystem, collect))
+
+    def render(self) -> str:
+        '''All the metrics in the Prometheus text exposition format'''
+        # the request threads add keys to the dicts, they are copied before iterating them
+        with self._lock:
+            stage_latency = dict(self.stage_latency)
+            request_latency = dict(self.request_latency)
+            requests = dict(self.requests)
+            errors = dict(self.errors)
+
+        lines = []
+        lines += self._render_histograms(
+            'stage_latency_seconds', 'Latency of each stage of the inference',
+            'stage', stage_latency)
+        lines += self._render_histograms(
+            'request_latency_seconds', 'Latency of the requests',
+            'path', request_latency)
+
+        name = f'{self.namespace}_requests_total'
+        lines += [f'# HELP {name} Number of requests', f'# TYPE {name} counter']
+        lines += [
+            f'{name}{{path="{path}",status="{status}"}} {count}'
+            for (path, status), count in sorted(requests.items())]
+
+        name = f'{self.namespace}_errors_total'
+        lines += [f'# HELP {name} Number of requests answered with 5xx', f'# TYPE {name} counter']
+        lines += [
+            f'{name}{{path="{path}"}} {count}'
+            for path, count in sorted(errors.items())]
+
+        for subsystem, collect in self._gauges:
+            for key, value in collect().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{self.namespace}_{subsystem}_{key}'
+                lines += [f'# TYPE {name} gauge', f'{name} {value}']
+
+        return '\n'.join(lines) + '\n'
+
+    def _render_histograms(
+            self, suffix: str, description: str, label: str,
+            histograms: Dict[str, LatencyHistogram]) -> Iterable[str]:
+        name = f'{self.namespace}_{suffix}'
+        lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for value, histogram in sorted(histograms.items()):
+            bounds = [str(bound) for bound in histogram.buckets] + ['+Inf']
+            for bound, count in zip(bounds, histogram.cumulative_counts()):
+                lines.append(f'{name}_bucket{{{label}="{value}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{{label}="{value}"}} {histogram.total}')
+            lines.append(f'{name}_count{{{label}="{value}"}} {histogram.count}')
+        return lines
+
+
+class MetricsMiddleware:
+    '''Pure ASGI middleware counting the requests and their latency. It
+    also stamps the arrival time in the request state, so the handlers can
+    measure the time spent before them (body reading and pydantic validation)
+
+    :param app: (ASGI app)
+    Application wrapped by the middleware
+
+    :param registry: (MetricsRegistry)
+    Registry where the requests are recorded
+
+    :param paths: (iterable)
+    Paths recorded with their own label, the others are recorded as "other"
+    '''
+
+    def __init__(self, app, registry: MetricsRegistry, paths: Iterable[str]) -> None:
+        self.app = app
+        self.registry = registry
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = perf_counter()
+        scope.setdefault('state', {})['arrival_time'] = start
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            path = scope['path'] if scope['path'] in self.paths else 'other'
+            self.registry.observe_request(path, status, perf_counter() - start)
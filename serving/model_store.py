@@ -0,0 +1,231 @@
+'''
+This file keeps the production model served by the api and swaps it,
+without downtime, when a new model.pkl is deployed
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Callable, NamedTuple
+from serving.inference import InferenceModel
+from serving.shared_model import export_compiled, map_compiled
+
+
+class LoadedModel(NamedTuple):
+    '''Snapshot of the served model. Requests take one snapshot and use it
+    until they finish, so a reload never changes the model under them'''
+    model: InferenceModel
+    version: str
+    loaded_at: str
+
+
+class ModelStore:
+    '''Load the model, watch its file and swap in new versions atomically.
+    A new model is loaded and warmed up in the background while the old
+    one keeps serving, and only then it replaces the current snapshot
+
+    :param model_path: (str)
+    Path to the model.pkl file
+
+    :param compile_model: (bool)
+    Whether to try the compiled inference path
+
+    :param warmup_rows: (int)
+    Number of rows of the batch predicted to warm up each new model
+
+    :param shared_dir: (str)
+    Folder of the shared model files. When given, the compiled arrays are
+    written once to a file in this folder and every process maps it
+    read-only instead of unpickling its own copy of the model
+    '''
+
+    def __init__(
+            self,
+            model_path: str,
+            compile_model: bool = True,
+            warmup_rows: int = 64,
+            shared_dir: str = None) -> None:
+        self.model_path = model_path
+        self.compile_model = compile_model
+        self.warmup_rows = warmup_rows
+        self.shared_dir = shared_dir
+        self._current = None
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher = None
+        self._swap_callbacks = []
+        # seconds spent in each phase of the last model load
+        self.last_load_timings = {}
+
+    @property
+    def current(self) -> LoadedModel:
+        '''The model snapshot currently served, loaded on the first use'''
+        if self._current is None:
+            self.reload()
+        return self._current
+
+    def reload(self, force: bool = False) -> bool:
+        '''Load the model file if it changed since the last load
+
+        :param force: (bool)
+        Read and hash the file even if its mtime and size didn't change
+
+        :return: (bool)
+        True if a new model version was swapped in
+        '''
+        with self._reload_lock:
+            signature = self._file_signature()
+            if not force and self._current is not None and signature == self._signature:
+                return False
+
+            start = perf_counter()
+            with open(self.model_path, 'rb') as model_file:
+                content = model_file.read()
+            version = hashlib.sha256(content).hexdigest()[:12]
+            if self._current is not None and version == self._current.version:
+                self._signature = signature
+                return False
+            timings = {'read': perf_counter() - start}
+
+            if self.shared_dir:
+                model = self._map_shared_model(content, version, timings)
+            else:
+                model = self._unpickle_model(content, timings)
+
+            start = perf_counter()
+            self.warm_up(model)
+            timings['warmup'] = perf_counter() - start
+
+            # swap the snapshot in a single assignment
+            self._current = LoadedModel(
+                model=model,
+                version=version,
+                loaded_at=datetime.now(timezone.utc).isoformat())
+            self._signature = signature
+            self.last_load_timings = timings
+            logging.info(f'Load model version {version}: SUCCESS')
+
+            for callback in self._swap_callbacks:
+                callback(self._current)
+            return True
+
+    def on_swap(self, callback: Callable[[LoadedModel], None]) -> None:
+        '''Register a function called with the new snapshot after each swap
+
+        :param callback: (callable)
+        Function that receives the new LoadedModel
+        '''
+        self._swap_callbacks.append(callback)
+
+    def warm_up(self, model: InferenceModel) -> None:
+        '''Run a batch through the model so that the first real
+        request doesn't pay for the lazy initialisations
+
+        :param model: (InferenceModel)
+        Model to be warmed up
+        '''
+        if self.warmup_rows < 1:
+            return
+        warmup_batch = {
+            column: [0] * self.warmup_rows for column in model.feature_names}
+        model.predict(warmup_batch)
+        model.predict_proba(warmup_batch)
+
+    def watch(self, interval: float) -> None:
+        '''Start a background thread checking the model file for changes
+
+        :param interval: (float)
+        Seconds between two checks of the model file
+        '''
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name='model-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        '''Stop the background thread that watches the model file'''
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def status(self) -> dict:
+        '''Information about the model currently served
+
+        :return: (dict)
+        Version, load time, path and inference path of the model
+        '''
+        current = self.current
+        return {
+            'version': current.version,
+            'loaded_at': current.loaded_at,
+            'model_path': self.model_path,
+            'compiled': current.model.compiled is not None,
+            'shared': current.model.sk_pipe is None}
+
+    def shared_path(self, version: str) -> str:
+        '''Path of the shared file of a model version'''
+        return os.path.join(self.shared_dir, f'risk_assessment_model_{version}.bin')
+
+    def _unpickle_model(self, content: bytes, timings: dict) -> InferenceModel:
+        '''Private copy of the model, unpickled in this process'''
+        start = perf_counter()
+        sk_pipe = pickle.loads(content)
+        timings['unpickle'] = perf_counter() - start
+
+        start = perf_counter()
+        model = InferenceModel(sk_pipe, compile_model=self.compile_model)
+        timings['compile'] = perf_counter() - start
+        return model
+
+    def _map_shared_model(self, content: bytes, version: str, timings: dict) -> InferenceModel:
+        '''Model backed by the shared file of this version. The first process
+        to load a version unpickles it and writes the file, the others only
+        map it and never unpickle the model'''
+        shared_path = self.shared_path(version)
+        if not os.path.exists(shared_path):
+            model = self._unpickle_model(content, timings)
+            if model.compiled is None:
+                logging.warning('Model pipeline not compiled, it cannot be shared')
+                return model
+
+            start = perf_counter()
+            export_compiled(model.compiled, shared_path)
+            timings['export'] = perf_counter() - start
+
+        start = perf_counter()
+        model = InferenceModel.from_compiled(map_compiled(shared_path))
+        timings['map'] = perf_counter() - start
+
+        # the processes still mapping an older file keep it alive until they swap
+        for stale_path in glob.glob(self.shared_path('*')):
+            if stale_path != shared_path:
+                try:
+                    os.remove(stale_path)
+                except FileNotFoundError:
+                    pass
+        return model
+
+    def _watch(self, interval: float) -> None:
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload()
+            except Exception as err:
+                # a half copied file fails to unpickle, the next check retries it
+                logging.error(f'Reload of the model failed, keeping the current one: {err}')
+
+    def _file_signature(self) -> tuple:
+        stat = os.stat(self.model_path)
+        return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,255 @@
+'''
+This file records every input scored by the api and its prediction into an
+in-memory ring buffer. A background thread flushes the buffer in batches to
+compressed parquet files partitioned by hour, so the request path never
+waits for the disk, and the drift check reads those partitions directly
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import TYPE_CHECKING, List, Mapping, Sequence
+import numpy as np
+
+# pandas is only imported by the reader of the log
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class PredictionLog:
+    '''Bounded ring buffer of scored records plus its background writer.
+    Recording is a copy into preallocated arrays under a short lock; when
+    the buffer is full the new records are dropped and counted, the
+    request is never blocked. Every scoring endpoint records here, the
+    ranking one with its id column in place of the corporation
+
+    :param log_dir: (str)
+    Root folder of the parquet files, partitioned as date=YYYY-MM-DD/hour=HH
+
+    :param feature_names: (list)
+    Model features recorded for each record
+
+    :param capacity: (int)
+    Maximum number of records waiting to be flushed
+
+    :param flush_interval: (float)
+    Seconds between two flushes, the writer also wakes up when
+    the buffer is half full
+
+    :param compression: (str)
+    Parquet compression codec
+    '''
+
+    def __init__(
+            self,
+            log_dir: str,
+            feature_names: List[str],
+            capacity: int = 100000,
+            flush_interval: float = 10.0,
+            compression: str = 'zstd') -> None:
+        self.log_dir = log_dir
+        self.feature_names = list(feature_names)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.compression = compression
+
+        self._columns = {
+            'corporation': np.empty(capacity, dtype=object),
+            **{column: np.empty(capacity, dtype=np.float64) for column in self.feature_names},
+            'prediction': np.empty(capacity, dtype=np.int64),
+            'model_version': np.empty(capacity, dtype=object),
+            'scored_at': np.empty(capacity, dtype=np.float64)}
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._writer = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.files_written = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def record(
+            self,
+            corporations: Sequence,
+            features: Mapping,
+            predictions: Sequence,
+            model_version: str) -> None:
+        '''Copy a batch of scored records into the ring buffer
+
+        :param corporations: (sequence)
+        Corporation of each record
+
+        :param features: (mapping)
+        DataFrame or dict with one array-like for each model feature
+
+        :param predictions: (sequence)
+        Prediction of each record
+
+        :param model_version: (str)
+        Version of the model that scored the records
+        '''
+        n_records = len(predictions)
+        now = time.time()
+        with self._lock:
+            taken = min(n_records, self.capacity - self._count)
+            self.recorded += taken
+            self.dropped += n_records - taken
+            if taken:
+                positions = (self._head + np.arange(taken)) % self.capacity
+                self._columns['corporation'][positions] = corporations[:taken]
+                for column in self.feature_names:
+                    self._columns[column][positions] = features[column][:taken]
+                self._columns['prediction'][positions] = predictions[:taken]
+                self._columns['model_version'][positions] = model_version
+                self._columns['scored_at'][positions] = now
+                self._head = (self._head + taken) % self.capacity
+                self._count += taken
+            half_full = self._count >= self.capacity // 2
+
+        if half_full:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        '''Start the background writer'''
+        if self._writer is not None and self._writer.is_alive():
+            return
+        self._stopping = False
+        self._writer = threading.Thread(
+            target=self._run, name='prediction-log-writer', daemon=True)
+        self._writer.start()
+
+    def stop(self) -> None:
+        '''Stop the background writer and flush what is still buffered'''
+        self._stopping = True
+        self._wakeup.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        self.flush()
+
+    def flush(self) -> int:
+        '''Write the buffered records to the parquet partitions
+
+        :return: (int)
+        Number of records written
+        '''
+        with self._flush_lock:
+            start = perf_counter()
+            columns = self._drain()
+            if not columns['prediction'].size:
+                return 0
+
+            try:
+                self._write(columns)
+            except Exception as err:
+                self.flush_errors += 1
+                self.dropped += columns['prediction'].size
+                logging.error(f'Flush of the prediction log failed: {err}')
+                return 0
+
+            elapsed = perf_counter() - start
+            self.flushes += 1
+            self.written += columns['prediction'].size
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            return columns['prediction'].size
+
+    def stats(self) -> dict:
+        '''Counters of the prediction log
+
+        :return: (dict)
+        Records recorded, buffered, written and dropped, and the flush latency
+        '''
+        return {
+            'capacity': self.capacity,
+            'buffered': self._count,
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'files_written': self.files_written,
+            'last_flush_seconds': self.last_flush_seconds,
+            'max_flush_seconds': self.max_flush_seconds}
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain(self) -> dict:
+        '''Copy the buffered records out of the ring and free their slots'''
+        with self._lock:
+            tail = (self._head - self._count) % self.capacity
+            positions = (tail + np.arange(self._count)) % self.capacity
+            columns = {name: values[positions] for name, values in self._columns.items()}
+            self._count = 0
+        return columns
+
+    def _write(self, columns: dict) -> None:
+        '''Write one parquet file in the partition of each hour'''
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        hours = (columns['scored_at'] // 3600).astype(np.int64)
+        for hour in np.unique(hours):
+            mask = hours == hour
+            partition_time = datetime.fromtimestamp(hour * 3600, tz=timezone.utc)
+            partition_dir = os.path.join(
+                self.log_dir,
+                f'date={partition_time:%Y-%m-%d}',
+                f'hour={partition_time:%H}')
+            os.makedirs(partition_dir, exist_ok=True)
+
+            table = pa.table({
+                'corporation': pa.array(columns['corporation'][mask], type=pa.string()),
+                **{column: columns[column][mask] for column in self.feature_names},
+                'prediction': columns['prediction'][mask],
+                'model_version': pa.array(columns['model_version'][mask], type=pa.string()),
+                'scored_at': pa.array(
+                    (columns['scored_at'][mask] * 1e6).astype(np.int64), type=pa.timestamp('us', tz='UTC'))})
+
+            # files starting with a dot are ignored by the readers until renamed
+            file_name = f'part-{time.time_ns()}-{os.getpid()}.parquet'
+            temp_path = os.path.join(partition_dir, f'.{file_name}')
+            pq.write_table(table, temp_path, compression=self.compression)
+            os.replace(temp_path, os.path.join(partition_dir, file_name))
+            self.files_written += 1
+
+
+def read_prediction_log(log_dir: str, since: datetime = None) -> 'pd.DataFrame':
+    '''Read the partitions of the prediction log as a dataframe
+
+    :param log_dir: (str)
+    Root folder of the prediction log
+
+    :param since: (datetime)
+    Only the records scored from this moment on, all of them if None
+
+    :return: (dataframe)
+    Pandas dataframe with the scored records
+    '''
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(log_dir, format='parquet', partitioning='hive')
+    columns = [name for name in dataset.schema.names if name not in ('date', 'hour')]
+    scan_filter = None
+    if since is not None:
+        scan_filter = ds.field('scored_at') >= since
+    return dataset.to_table(columns=columns, filter=scan_filter).to_pandas()
@@ -0,0 +1,76 @@
+'''
+This file keeps the top N records most at risk of leaving out of a
+population scored in chunks, in O(N) memory
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import heapq
+from typing import List, Sequence
+import numpy as np
+
+
+class TopN:
+    '''Bounded min-heap with the n highest scores seen so far. Each chunk is
+    first reduced to its own n best rows with a vectorized partition, so the
+    heap only sees a few candidates per chunk. On equal scores the row that
+    came first in the population wins
+
+    :param n: (int)
+    Number of records to keep
+    '''
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise ValueError('n must be at least 1')
+        self.n = n
+        self.population = 0
+        # entries are (score, -row, id), so the heap top is the weakest one
+        self._heap = []
+
+    def push(self, ids: Sequence, scores: np.ndarray) -> None:
+        '''Offer a chunk of scored records
+
+        :param ids: (sequence)
+        Identifier of each record of the chunk
+
+        :param scores: (array)
+        Risk score of each record of the chunk
+        '''
+        scores = np.asarray(scores, dtype=np.float64)
+        rows = np.arange(self.population, self.population + scores.size)
+        self.population += scores.size
+
+        # later rows lose the ties, so they must beat the weakest score
+        if len(self._heap) == self.n:
+            candidates = np.flatnonzero(scores > self._heap[0][0])
+        else:
+            candidates = np.arange(scores.size)
+        if candidates.size > self.n:
+            # n-th highest score of the chunk, the ties keep the first rows
+            candidate_scores = scores[candidates]
+            kth = candidate_scores.size - self.n
+            threshold = np.partition(candidate_scores, kth)[kth]
+            above = candidates[candidate_scores > threshold]
+            ties = candidates[candidate_scores == threshold][:self.n - above.size]
+            candidates = np.sort(np.concatenate([above, ties]))
+
+        for index in candidates.tolist():
+            entry = (float(scores[index]), -int(rows[index]), ids[index])
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def ranking(self) -> List[dict]:
+        '''The records kept, from the highest to the lowest risk
+
+        :return: (list)
+        Dicts with the rank, id, risk probability and row of each record
+        '''
+        ordered = sorted(self._heap, reverse=True)
+        return [
+            {'rank': rank, 'id': record_id, 'risk_probability': score, 'row': -negative_row}
+            for rank, (score, negative_row, record_id) in enumerate(ordered, start=1)]
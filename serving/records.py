@@ -0,0 +1,144 @@
+'''
+This file reads newline-delimited json or csv records in chunks, from
+files or from streamed request bodies, without loading them whole
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import io
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Mapping
+
+
+def detect_format(file_path: str) -> str:
+    '''Format of a file from its extension: "csv" or "jsonl"'''
+    return 'csv' if file_path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_chunks(input_path: str, chunk_size: int, input_format: str) -> Iterator[List[str]]:
+    '''Read a file in chunks of raw lines, without loading it whole
+
+    :param input_path: (str)
+    Path to the newline-delimited json or csv file
+
+    :param chunk_size: (int)
+    Number of records in each chunk
+
+    :param input_format: (str)
+    "jsonl" or "csv". The csv chunks start with the header line
+
+    :return: (iterator)
+    Lists with the lines of each chunk
+    '''
+    with open(input_path, 'r') as input_file:
+        header = [next(input_file, '')] if input_format == 'csv' else []
+        records = (line for line in input_file if line.strip())
+        while True:
+            lines = list(islice(records, chunk_size))
+            if not lines:
+                break
+            yield header + lines
+
+
+async def stream_chunks(
+        stream: AsyncIterator[bytes],
+        chunk_size: int,
+        input_format: str) -> AsyncIterator[List[str]]:
+    '''Split a streamed body (e.g. request.stream()) in chunks of raw lines
+
+    :param stream: (async iterator)
+    Pieces of bytes of the body, cut anywhere
+
+    :param chunk_size: (int)
+    Number of records in each chunk
+
+    :param input_format: (str)
+    "jsonl" or "csv". The csv chunks start with the header line
+
+    :return: (async iterator)
+    Lists with the lines of each chunk
+    '''
+    header, lines, remainder = None, [], b''
+    async for piece in stream:
+        remainder += piece
+        *complete, remainder = remainder.split(b'\n')
+        for line in complete:
+            line = line.decode() + '\n'
+            if input_format == 'csv' and header is None:
+                header = [line]
+            elif line.strip():
+                lines.append(line)
+                if len(lines) == chunk_size:
+                    yield (header or []) + lines
+                    lines = []
+
+    if remainder.strip():
+        line = remainder.decode() + '\n'
+        if input_format == 'csv' and header is None:
+            header = [line]
+        else:
+            lines.append(line)
+    if lines:
+        yield (header or []) + lines
+
+
+def finite_column(values, column: str):
+    '''Values of a model feature as a float array
+
+    :param values: (sequence)
+    Values of the feature, numbers or numeric strings
+
+    :param column: (str)
+    Name of the feature, for the error message
+
+    :return: (numpy.ndarray)
+    The float values. Raises a ValueError with the index of the first
+    record whose value is not a finite number
+    '''
+    import numpy as np
+    import pandas as pd
+    series = pd.Series(list(values), dtype=object)
+    floats = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+    invalid = ~np.isfinite(floats)
+    if invalid.any():
+        index = int(invalid.argmax())
+        raise ValueError(f'record {index}: {column} must be a finite number, got {series.iloc[index]!r}')
+    return floats
+
+
+def parse_records(
+        lines: List[str],
+        input_format: str,
+        columns: List[str],
+        numeric_columns: List[str] = None) -> Mapping:
+    '''Parse the raw lines of a chunk into columns
+
+    :param lines: (list)
+    Raw lines of the chunk, the csv ones start with the header
+
+    :param input_format: (str)
+    "jsonl" or "csv"
+
+    :param columns: (list)
+    Columns needed from the records
+
+    :param numeric_columns: (list)
+    Columns converted to floats, raising a ValueError with the first
+    record whose value is not a finite number
+
+    :return: (mapping)
+    DataFrame or dict with one list for each column
+    '''
+    if input_format == 'csv':
+        import pandas as pd
+        parsed = pd.read_csv(io.StringIO(''.join(lines)), usecols=columns)
+    else:
+        records = [json.loads(line) for line in lines]
+        parsed = {column: [record[column] for record in records] for column in columns}
+
+    for column in numeric_columns or []:
+        parsed[column] = finite_column(parsed[column], column)
+    return parsed
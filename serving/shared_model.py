@@ -0,0 +1,104 @@
+'''
+This file writes the numeric parameters of the compiled pipeline (scaler
+statistics and tree node arrays) into a single file that every worker of
+the api maps read-only, instead of holding a private copy of the model
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import json
+import os
+import struct
+import numpy as np
+from serving.inference import CompiledPipeline
+
+# file layout: magic, header length, json header, then the raw arrays,
+# each one starting at a multiple of ALIGNMENT bytes
+MAGIC = b'RAMODEL1'
+ALIGNMENT = 64
+ARRAYS = {
+    'mean': np.float64,
+    'scale': np.float64,
+    'children_left': np.int64,
+    'children_right': np.int64,
+    'feature': np.int64,
+    'threshold': np.float64,
+    'value': np.float64}
+
+
+def export_compiled(compiled: CompiledPipeline, file_path: str) -> None:
+    '''Write the arrays of a compiled pipeline into a shared file. The file
+    is written under a temporary name and renamed, so that concurrent
+    workers never map a half written file
+
+    :param compiled: (CompiledPipeline)
+    Compiled pipeline to be shared
+
+    :param file_path: (str)
+    Path of the shared file
+    '''
+    arrays = {
+        name: np.ascontiguousarray(getattr(compiled, name), dtype=dtype)
+        for name, dtype in ARRAYS.items()}
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {
+            'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        'feature_names': compiled.feature_names,
+        'classes': compiled.classes.tolist(),
+        'max_depth': compiled.max_depth,
+        'arrays': layout}).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    temp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as shared_file:
+        shared_file.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            shared_file.seek(data_start + layout[name]['offset'])
+            shared_file.write(array.tobytes())
+    os.replace(temp_path, file_path)
+
+
+def map_compiled(file_path: str) -> CompiledPipeline:
+    '''Map a shared file read-only as a compiled pipeline. The arrays are
+    views of the mapping, so the operating system keeps a single copy of
+    them in memory for every process that maps the same file
+
+    :param file_path: (str)
+    Path of the shared file
+
+    :return: (CompiledPipeline)
+    Compiled pipeline backed by the mapped file
+    '''
+    buffer = np.memmap(file_path, dtype=np.uint8, mode='r')
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'{file_path} is not a shared model file')
+
+    header_length = struct.unpack('<Q', bytes(buffer[len(MAGIC):len(MAGIC) + 8]))[0]
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+    data_start = _align(header_start + header_length)
+
+    arrays = {
+        name: np.ndarray(
+            shape=tuple(spec['shape']),
+            dtype=np.dtype(spec['dtype']),
+            buffer=buffer,
+            offset=data_start + spec['offset'])
+        for name, spec in header['arrays'].items()}
+
+    return CompiledPipeline(
+        feature_names=header['feature_names'],
+        classes=np.array(header['classes']),
+        max_depth=header['max_depth'],
+        **arrays)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
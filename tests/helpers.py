@@ -0,0 +1,59 @@
+'''
+Helpers shared by the tests: random records shaped like the model
+inputs and raw csv files shaped like the uploads
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import os
+from typing import Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+def make_data(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    '''Generate random records shaped like the model inputs'''
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'corporation': rng.choice(['nciw', 'lsid', 'abcd'], n_rows),
+        'lastmonth_activity': rng.integers(0, 2000, n_rows),
+        'lastyear_activity': rng.integers(0, 15000, n_rows),
+        'number_of_employees': rng.integers(0, 1500, n_rows)})
+
+
+def make_raw_files(
+        folder,
+        n_files: int,
+        rows_per_file: int,
+        seed: int = 0,
+        corporations: Sequence[str] = ('nciw', 'lsid', 'abcd'),
+        highs: Tuple[int, int, int] = (5, 5, 3),
+        old_uploads: bool = True) -> None:
+    '''Write raw csv files with duplicated rows across and inside the files
+
+    :param corporations: (sequence)
+    Corporations the rows are drawn from
+
+    :param highs: (tuple)
+    Upper bounds (exclusive) of the activities and of the number of
+    employees, the smaller they are the more duplicated rows
+
+    :param old_uploads: (bool)
+    Write half of the files with the index column of the old uploads,
+    and a file that is not a csv next to them
+    '''
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder)
+    for i in range(n_files):
+        raw_df = pd.DataFrame({
+            'corporation': rng.choice(list(corporations), rows_per_file),
+            'lastmonth_activity': rng.integers(0, highs[0], rows_per_file),
+            'lastyear_activity': rng.integers(0, highs[1], rows_per_file),
+            'number_of_employees': rng.integers(0, highs[2], rows_per_file),
+            'exited': rng.integers(0, 2, rows_per_file)})
+        raw_df.to_csv(os.path.join(folder, f'dataset{i}.csv'), index=old_uploads and i % 2 == 0)
+    if old_uploads:
+        with open(os.path.join(folder, 'notes.txt'), 'w') as notes:
+            notes.write('not a csv')
@@ -8,7 +8,10 @@ Date: March/2023
 # import necessary packages
 import json
 import logging
+import pyarrow as pa
+import pytest
 from fastapi.testclient import TestClient
+import ml_api
 from ml_api import app
 
 logging.basicConfig(
@@ -20,6 +23,26 @@ logging.basicConfig(
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def prediction_log_dir(tmp_path, monkeypatch):
+    '''Write the prediction log of the api to a temporary folder, not to
+    the default PREDICTION_LOG_DIR in the root of the repository'''
+    monkeypatch.setattr(ml_api, 'PREDICTION_LOG_DIR', str(tmp_path / 'prediction_log'))
+    monkeypatch.setattr(ml_api.prediction_log, 'log_dir', ml_api.PREDICTION_LOG_DIR)
+    return tmp_path / 'prediction_log'
+
+
+def test_ready():
+    '''Test the api is ready only after the startup warmup'''
+    assert client.get('/ready').status_code == 503
+
+    with TestClient(app) as started_client:
+        response = started_client.get('/ready')
+
+        assert response.status_code == 200
+        assert response.json()['ready'] is True
+
+
 def test_get():
     '''Test welcome message for get at root'''
     response = client.get('/')
@@ -61,3 +84,381 @@ def test_inference_class0():
     # test response and output
     assert response.status_code == 200
     assert response.json() == 'The person has no risk of leaving the company'
+
+
+def test_batch_inference_records():
+    '''Test batch inference output keeps the order of a list of records'''
+    samples = [
+        {
+            "corporation": "nciw",
+            "lastmonth_activity": 45,
+            "lastyear_activity": 0,
+            "number_of_employees": 99
+        },
+        {
+            "corporation": "lsid",
+            "lastmonth_activity": 36,
+            "lastyear_activity": 234,
+            "number_of_employees": 541
+        }
+    ]
+
+    response = client.post('/risk_assessment_prediction/batch', json=samples)
+
+    # test response and output
+    assert response.status_code == 200
+    assert response.json() == [
+        'The person is at risk of leaving the company',
+        'The person has no risk of leaving the company']
+
+
+def test_batch_inference_columns():
+    '''Test batch inference output for a columnar payload'''
+    n_rows = 100000
+    samples = {
+        "corporation": ["nciw", "lsid"] * (n_rows // 2),
+        "lastmonth_activity": [45, 36] * (n_rows // 2),
+        "lastyear_activity": [0, 234] * (n_rows // 2),
+        "number_of_employees": [99, 541] * (n_rows // 2)
+    }
+
+    response = client.post('/risk_assessment_prediction/batch', json=samples)
+
+    # test response and output
+    assert response.status_code == 200
+    assert len(response.json()) == n_rows
+    assert response.json()[:2] == [
+        'The person is at risk of leaving the company',
+        'The person has no risk of leaving the company']
+
+
+def test_batch_inference_invalid_columns():
+    '''Test that columns with different lengths are rejected'''
+    samples = {
+        "corporation": ["nciw", "lsid"],
+        "lastmonth_activity": [45],
+        "lastyear_activity": [0, 234],
+        "number_of_employees": [99, 541]
+    }
+
+    response = client.post('/risk_assessment_prediction/batch', json=samples)
+
+    assert response.status_code == 422
+
+
+def test_batch_inference_invalid_values():
+    '''Test a batch with a feature that is not a finite number is rejected
+    with the index of the first bad record'''
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": 99
+    }
+    samples = [sample, dict(sample, number_of_employees='abc'), dict(sample, number_of_employees='nan')]
+
+    response = client.post('/risk_assessment_prediction/batch', json=samples)
+
+    assert response.status_code == 422
+    assert response.json()['detail'].startswith('record 1: number_of_employees')
+
+    columns = {column: [value] * 2 for column, value in sample.items()}
+    columns['number_of_employees'] = ['99', 'nan']
+    response = client.post('/risk_assessment_prediction/batch', json=columns)
+
+    assert response.status_code == 422
+    assert response.json()['detail'].startswith('record 1: number_of_employees')
+
+
+def test_batching_stats():
+    '''Test the micro-batcher stats count the single record requests'''
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": 99
+    }
+    client.post('/risk_assessment_prediction', json=sample)
+
+    response = client.get('/stats/batching')
+
+    assert response.status_code == 200
+    assert response.json()['records'] >= 1
+    assert response.json()['largest_batch_size'] >= 1
+
+
+def test_model_status(monkeypatch):
+    '''Test the served model version is reported'''
+    monkeypatch.setattr(ml_api, 'ADMIN_TOKEN', 'secret')
+    response = client.get('/model/status')
+
+    assert response.status_code == 200
+    version = response.json()['version']
+
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": 99
+    }
+    response = client.post('/risk_assessment_prediction', json=sample)
+    assert response.headers['X-Model-Version'] == version
+
+    response = client.post('/admin/reload', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.json() == {'reloaded': False, 'version': version}
+
+
+def test_reload_needs_the_admin_token(monkeypatch):
+    '''Test the model reload is refused without the admin token'''
+    assert client.post('/admin/reload').status_code == 403
+
+    monkeypatch.setattr(ml_api, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/admin/reload').status_code == 401
+    assert client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+
+
+def test_cache_stats():
+    '''Test repeated records are answered by the prediction cache'''
+    sample = {
+        "corporation": "lsid",
+        "lastmonth_activity": 36,
+        "lastyear_activity": 234,
+        "number_of_employees": 541
+    }
+    hits = client.get('/stats/cache').json()['hits']
+
+    for _ in range(2):
+        response = client.post('/risk_assessment_prediction', json=sample)
+        assert response.json() == 'The person has no risk of leaving the company'
+
+    response = client.get('/stats/cache')
+    assert response.status_code == 200
+    assert response.json()['hits'] >= hits + 1
+
+
+def test_metrics():
+    '''Test the stage latencies and the counters are exported'''
+    sample = {
+        "corporation": "abcd",
+        "lastmonth_activity": 99,
+        "lastyear_activity": 871,
+        "number_of_employees": 3
+    }
+    client.post('/risk_assessment_prediction', json=sample)
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    body = response.text
+    for stage in ['validation', 'json_roundtrip', 'input_columns', 'model_predict']:
+        assert f'risk_assessment_api_stage_latency_seconds_count{{stage="{stage}"}}' in body
+    assert 'risk_assessment_api_requests_total{path="/risk_assessment_prediction",status="200"}' in body
+    assert 'risk_assessment_api_cache_hits' in body
+
+
+def test_ranking():
+    '''Test the top N ranking over a streamed population'''
+    population = '\n'.join([
+        'corporation,lastmonth_activity,lastyear_activity,number_of_employees',
+        'nciw,45,0,99',
+        'lsid,36,234,541',
+        'abcd,99,871,3'])
+
+    response = client.post(
+        '/risk_assessment_ranking?top_n=1&chunk_size=2',
+        content=population,
+        headers={'content-type': 'text/csv'})
+
+    assert response.status_code == 200
+    assert response.json()['population'] == 3
+    ranking = response.json()['ranking']
+    assert len(ranking) == 1
+    assert ranking[0]['id'] == 'nciw'
+    assert ranking[0]['rank'] == 1
+
+
+def test_ranking_is_logged():
+    '''Test the records of a ranked population go to the prediction log'''
+    population = '\n'.join([
+        'corporation,lastmonth_activity,lastyear_activity,number_of_employees',
+        'nciw,45,0,99',
+        'lsid,36,234,541',
+        'abcd,99,871,3'])
+    before = client.get('/stats/prediction_log').json()
+
+    response = client.post(
+        '/risk_assessment_ranking?top_n=1&chunk_size=2',
+        content=population,
+        headers={'content-type': 'text/csv'})
+    assert response.status_code == 200
+
+    stats = client.get('/stats/prediction_log').json()
+    assert stats['recorded'] + stats['dropped'] == before['recorded'] + before['dropped'] + 3
+
+
+def test_ranking_invalid_records():
+    '''Test records without the model features are rejected'''
+    response = client.post(
+        '/risk_assessment_ranking',
+        content='{"corporation": "nciw"}\n')
+
+    assert response.status_code == 422
+
+
+def test_ranking_invalid_values():
+    '''Test records with a feature that is not a number are rejected'''
+    population = '\n'.join([
+        'corporation,lastmonth_activity,lastyear_activity,number_of_employees',
+        'nciw,45,0,99',
+        'lsid,36,234,541',
+        'abcd,99,,3'])
+
+    response = client.post(
+        '/risk_assessment_ranking?chunk_size=2',
+        content=population,
+        headers={'content-type': 'text/csv'})
+
+    assert response.status_code == 422
+    assert response.json()['detail'].startswith('Invalid records after row 2')
+
+    response = client.post(
+        '/risk_assessment_ranking',
+        content='{"corporation": "nciw", "lastmonth_activity": 45, '
+                '"lastyear_activity": 0, "number_of_employees": "many"}\n')
+
+    assert response.status_code == 422
+    assert 'number_of_employees' in response.json()['detail']
+
+
+def test_arrow_inference():
+    '''Test model inference over an Arrow IPC stream'''
+    table = pa.table({
+        'corporation': ['nciw', 'lsid'],
+        'lastmonth_activity': pa.array([45, 36], type=pa.int32()),
+        'lastyear_activity': [0, 234],
+        'number_of_employees': [99.0, 541.0]})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    response = client.post(
+        '/risk_assessment_prediction/arrow',
+        content=sink.getvalue().to_pybytes(),
+        headers={'content-type': 'application/vnd.apache.arrow.stream'})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+    predictions = pa.ipc.open_stream(response.content).read_all()
+    assert predictions.column('prediction').to_pylist() == [1, 0]
+    assert predictions.num_rows == 2
+
+
+def test_arrow_inference_invalid_schema():
+    '''Test every invalid column of an Arrow payload is reported'''
+    table = pa.table({
+        'corporation': ['nciw'],
+        'lastmonth_activity': ['45'],
+        'lastyear_activity': pa.array([None], type=pa.int64())})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    response = client.post(
+        '/risk_assessment_prediction/arrow', content=sink.getvalue().to_pybytes())
+
+    assert response.status_code == 422
+    detail = response.json()['detail']
+    assert 'lastmonth_activity: expected a numeric column' in detail
+    assert 'lastyear_activity: 1 null values' in detail
+    assert 'number_of_employees: missing column' in detail
+
+    response = client.post('/risk_assessment_prediction/arrow', content=b'not arrow')
+    assert response.status_code == 422
+
+
+def test_prediction_log_stats(prediction_log_dir):
+    '''Test the scored records are counted by the prediction log and
+    written to its folder'''
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": 99
+    }
+    before = client.get('/stats/prediction_log').json()
+
+    response = client.post('/risk_assessment_prediction/batch', json=[sample, sample])
+    assert response.status_code == 200
+
+    response = client.get('/stats/prediction_log')
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats['enabled']
+    assert stats['recorded'] + stats['dropped'] == before['recorded'] + before['dropped'] + 2
+
+    ml_api.prediction_log.flush()
+    assert list(prediction_log_dir.rglob('*.parquet'))
+
+
+def test_full_queue_answers_503(monkeypatch):
+    '''Test a full inference queue is answered right away with Retry-After'''
+    async def full_queue(record):
+        raise ml_api.QueueFullError('full')
+
+    monkeypatch.setattr(ml_api.micro_batcher, 'submit', full_queue)
+    sample = {
+        "corporation": "qwer",
+        "lastmonth_activity": 1234,
+        "lastyear_activity": 4321,
+        "number_of_employees": 777
+    }
+    response = client.post('/risk_assessment_prediction', json=sample)
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(ml_api.RETRY_AFTER_SECONDS)
+
+
+def test_full_queue_answers_503_to_bulk_calls(monkeypatch):
+    '''Test the batch, arrow and ranking endpoints go through the same
+    admission check as the single records'''
+    async def full_queue(fn, *args):
+        raise ml_api.QueueFullError('full')
+
+    monkeypatch.setattr(ml_api.micro_batcher, 'run', full_queue)
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": 99
+    }
+    table = pa.table({column: [value] for column, value in sample.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    responses = [
+        client.post('/risk_assessment_prediction/batch', json=[sample]),
+        client.post('/risk_assessment_prediction/arrow', content=sink.getvalue().to_pybytes()),
+        client.post('/risk_assessment_ranking', content=json.dumps(sample) + '\n')]
+
+    for response in responses:
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == str(ml_api.RETRY_AFTER_SECONDS)
+
+
+def test_non_finite_record_answers_422():
+    '''Test a record whose features are not finite numbers is rejected on its
+    own, before it is batched with the records of the other callers'''
+    sample = {
+        "corporation": "nciw",
+        "lastmonth_activity": 45,
+        "lastyear_activity": 0,
+        "number_of_employees": "nan"
+    }
+    response = client.post('/risk_assessment_prediction', json=sample)
+    assert response.status_code == 422
+
+    response = client.post('/risk_assessment_prediction', json=dict(sample, number_of_employees='many'))
+    assert response.status_code == 422
@@ -0,0 +1,193 @@
+'''
+Unit test of the cleaning rules of
+components/03_basic_clean with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import importlib.util
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    'basic_clean',
+    os.path.join('components', '03_basic_clean', 'basic_clean.py'))
+basic_clean = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(basic_clean)
+
+sys.path.append('components')
+from cleaning_rules import CleaningEngine, ValueCounts
+from dataset_statistics import DatasetStatistics
+from dataset_format import compact_dtypes, read_dataset, write_dataset
+
+RULES = [
+    {'name': 'lastmonth_iqr', 'rule': 'iqr', 'column': 'lastmonth_activity', 'k': 1.5, 'action': 'clip'},
+    {'name': 'lastyear_zscore', 'rule': 'zscore', 'column': 'lastyear_activity', 'k': 2, 'action': 'drop'},
+    {'name': 'employees_range', 'rule': 'range', 'column': 'number_of_employees', 'min': 0, 'max': 500,
+     'action': 'drop'},
+    {'name': 'employees_cap', 'rule': 'range', 'column': 'number_of_employees', 'min': None, 'max': 300,
+     'action': 'clip'},
+    {'name': 'corporation_codes', 'rule': 'normalize', 'column': 'corporation'}]
+
+
+def make_dataset(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'corporation': rng.choice(['abcd', ' abcd', 'XYZZ', 'acme ', 'lsid'], n_rows),
+        'lastmonth_activity': rng.integers(0, 50, n_rows) * rng.choice([1, 1, 1, 40], n_rows),
+        'lastyear_activity': rng.normal(300, 100, n_rows).round().astype('int64'),
+        'number_of_employees': rng.integers(-50, 700, n_rows),
+        'exited': rng.integers(0, 2, n_rows)})
+
+
+def expected_clean(pdf):
+    '''The rules written one by one with pandas'''
+    lastmonth = pdf['lastmonth_activity']
+    q1, q3 = lastmonth.quantile(0.25), lastmonth.quantile(0.75)
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    lastyear = pdf['lastyear_activity']
+    zscore = (lastyear - lastyear.mean()).abs() / lastyear.std()
+    employees = pdf['number_of_employees']
+
+    report = {
+        'lastmonth_iqr': int(((lastmonth < low) | (lastmonth > high)).sum()),
+        'lastyear_zscore': int((zscore > 2).sum()),
+        'employees_range': int(((employees < 0) | (employees > 500)).sum()),
+        'employees_cap': int((employees > 300).sum()),
+        'corporation_codes': int((pdf['corporation'] != pdf['corporation'].str.strip().str.lower()).sum())}
+
+    clean = pdf.assign(
+        corporation=pdf['corporation'].str.strip().str.lower(),
+        lastmonth_activity=lastmonth.clip(np.ceil(low), np.floor(high)),
+        number_of_employees=employees.clip(upper=300))
+    clean = clean[(zscore <= 2) & (employees >= 0) & (employees <= 500)]
+    return clean, report
+
+
+def test_value_counts_match_pandas():
+    '''Test the quantiles and moments from the value counts are the ones of pandas'''
+    values = pd.Series(np.random.default_rng(1).integers(0, 30, 1001))
+    counts = ValueCounts()
+    for start in range(0, len(values), 100):
+        counts.update(values[start:start + 100])
+    for q in (0, 0.1, 0.25, 0.5, 0.75, 1):
+        assert counts.quantile(q) == pytest.approx(values.quantile(q))
+    mean, std = counts.mean_std()
+    assert mean == pytest.approx(values.mean())
+    assert std == pytest.approx(values.std())
+
+
+def test_rules_match_pandas():
+    '''Test the engine cleans and counts the rows as the rules written one by one'''
+    pdf = make_dataset(20000)
+    engine = CleaningEngine(RULES).fit([pdf])
+    clean = engine.apply(pdf)
+
+    expected, report = expected_clean(pdf)
+    pd.testing.assert_frame_equal(clean, expected)
+    for name, rows in report.items():
+        assert engine.report[name] == rows > 0
+    assert engine.report['rows_in'] == len(pdf)
+    assert engine.report['rows_out'] == len(expected)
+    assert engine.report['rows_dropped'] == len(pdf) - len(expected)
+    # the input is not modified
+    assert (pdf['number_of_employees'] > 300).any()
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'csv'])
+def test_clean_file_chunked(tmp_path, file_format):
+    '''Test the chunked cleaning gives the same rows and report as in memory'''
+    pdf = make_dataset(10000)
+    input_path = str(tmp_path / f'train_set.{file_format}')
+    write_dataset(pdf, input_path, file_format)
+
+    report = basic_clean.clean_file(
+        input_path, str(tmp_path / f'df_clean.{file_format}'), file_format, rules=RULES)
+    chunked_report = basic_clean.clean_file(
+        input_path, str(tmp_path / f'df_clean_chunked.{file_format}'), file_format, 999, RULES)
+
+    clean = read_dataset(str(tmp_path / f'df_clean.{file_format}'))
+    pd.testing.assert_frame_equal(read_dataset(str(tmp_path / f'df_clean_chunked.{file_format}')), clean)
+    pd.testing.assert_frame_equal(
+        clean, compact_dtypes(expected_clean(pdf)[0].reset_index(drop=True)), check_categorical=False)
+    assert chunked_report == report
+
+
+@pytest.mark.parametrize('chunk_size', [0, 999])
+def test_clean_file_statistics(tmp_path, chunk_size):
+    '''Test the statistics accumulated while writing are the ones of the clean
+    file, and are kept through their json summary'''
+    write_dataset(make_dataset(10000), str(tmp_path / 'train_set.parquet'))
+    statistics = DatasetStatistics()
+    basic_clean.clean_file(
+        str(tmp_path / 'train_set.parquet'), str(tmp_path / 'df_clean.parquet'),
+        chunk_size=chunk_size, rules=RULES, statistics=statistics)
+
+    expected = DatasetStatistics.from_frame(read_dataset(str(tmp_path / 'df_clean.parquet')))
+    assert statistics.n_rows == expected.n_rows
+    assert statistics.columns == expected.columns
+    assert statistics.label_counts == expected.label_counts
+    for column, moments in expected.moments.items():
+        for name, value in moments.items():
+            assert statistics.moments[column][name] == pytest.approx(value, rel=1e-12)
+
+    summary = DatasetStatistics.from_json(statistics.to_json())
+    assert vars(summary) == vars(statistics)
+    assert summary.label_distribution().index.tolist() == [0, 1]
+    assert summary.std('lastyear_activity') == statistics.std('lastyear_activity')
+    assert summary.maximum('number_of_employees') == 300
+
+
+def test_default_rules(tmp_path):
+    '''Test the rules shipped with the component'''
+    pdf = make_dataset(1000)
+    write_dataset(pdf, str(tmp_path / 'train_set.parquet'))
+    report = basic_clean.clean_file(str(tmp_path / 'train_set.parquet'), str(tmp_path / 'df_clean.parquet'))
+
+    clean = read_dataset(str(tmp_path / 'df_clean.parquet'))
+    assert report['rows_out'] == len(clean) == (pdf['number_of_employees'] >= 0).sum()
+    assert (clean['corporation'] == clean['corporation'].str.strip().str.lower()).all()
+    assert report['corporation_codes'] > 0
+
+
+def test_many_rules_one_pass():
+    '''Test that repeating the bound rules only changes their report'''
+    pdf = make_dataset(5000)
+    many_rules = [
+        dict(rule, name=f'{rule["name"]}_{i}') for i in range(20) for rule in RULES if rule['rule'] != 'normalize']
+    many_rules.append(RULES[-1])
+    engine = CleaningEngine(RULES).fit([pdf])
+    many_engine = CleaningEngine(many_rules).fit([pdf])
+
+    pd.testing.assert_frame_equal(many_engine.apply(pdf), engine.apply(pdf))
+    for rule in many_rules[:-1]:
+        assert many_engine.report[rule['name']] == engine.report[rule['name'].rsplit('_', 1)[0]]
+
+
+def test_categorical_codes():
+    '''Test the codes loaded as a categorical are normalised into merged categories'''
+    pdf = make_dataset(2000)
+    engine = CleaningEngine(RULES).fit([pdf])
+    compact_engine = CleaningEngine(RULES).fit([compact_dtypes(pdf.copy())])
+
+    clean = compact_engine.apply(compact_dtypes(pdf.copy()))
+    assert list(clean['corporation'].cat.categories) == ['abcd', 'acme', 'lsid', 'xyzz']
+    pd.testing.assert_frame_equal(clean, compact_dtypes(engine.apply(pdf)), check_categorical=False)
+    assert compact_engine.report == engine.report
+
+
+def test_invalid_rules():
+    '''Test the rules are checked when the engine is built'''
+    with pytest.raises(ValueError):
+        CleaningEngine([{'name': 'a', 'rule': 'median', 'column': 'exited'}])
+    with pytest.raises(ValueError):
+        CleaningEngine([{'name': 'a', 'rule': 'range', 'column': 'exited', 'action': 'flag'}])
+    with pytest.raises(ValueError):
+        CleaningEngine([RULES[2], RULES[2]])
+    with pytest.raises(RuntimeError):
+        CleaningEngine(RULES).apply(make_dataset(10))
@@ -0,0 +1,155 @@
+'''
+Unit test of the micro-batcher of serving/batching.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from serving.batching import MicroBatcher, QueueFullError
+
+
+def double(records):
+    '''Fake predict function'''
+    return [record * 2 for record in records]
+
+
+def test_each_caller_gets_its_result():
+    '''Test concurrent callers are batched and get their own result back'''
+    batcher = MicroBatcher(double, max_batch_size=16, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit(i) for i in range(100)])
+
+    results = asyncio.run(run())
+
+    assert results == [i * 2 for i in range(100)]
+    stats = batcher.stats()
+    assert stats['records'] == 100
+    assert stats['largest_batch_size'] == 16
+    assert stats['batches'] < 100
+    assert sum(stats['batch_size_histogram'].values()) == stats['batches']
+
+
+def test_flush_after_max_wait():
+    '''Test a lonely record is flushed once the wait window ends'''
+    batcher = MicroBatcher(double, max_batch_size=64, max_wait_ms=1)
+
+    assert asyncio.run(batcher.submit(21)) == 42
+    assert batcher.stats()['batch_size_histogram'] == {'1': 1}
+
+
+def test_errors_reach_every_caller():
+    '''Test a failing predict call raises for all the callers of the batch'''
+    def fail(records):
+        raise ValueError('bad batch')
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(
+            *[batcher.submit(i) for i in range(4)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+
+    with pytest.raises(ValueError):
+        MicroBatcher(double, max_batch_size=0)
+
+
+def test_a_bad_record_only_fails_its_caller():
+    '''Test the records of a failing batch are predicted again one at a
+    time, so only the caller of the bad record gets the error'''
+    def strict(records):
+        if any(record < 0 for record in records):
+            raise ValueError('bad record')
+        return double(records)
+
+    batcher = MicroBatcher(strict, max_batch_size=8, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(
+            *[batcher.submit(i) for i in [1, 2, -1, 3]], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[:2] == [2, 4] and results[3] == 6
+    assert isinstance(results[2], ValueError)
+    assert batcher.stats()['failed_batches'] == 1
+
+
+def test_full_queue_rejects():
+    '''Test records beyond max_queue_depth are rejected without waiting'''
+    release = threading.Event()
+
+    def blocked(records):
+        release.wait(5)
+        return records
+
+    batcher = MicroBatcher(blocked, max_batch_size=1, max_wait_ms=0, max_queue_depth=2)
+
+    async def run():
+        # the first record is taken by the worker, the next two fill the queue
+        accepted = [asyncio.ensure_future(batcher.submit(0))]
+        await asyncio.sleep(0.05)
+        accepted += [asyncio.ensure_future(batcher.submit(i)) for i in (1, 2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(QueueFullError):
+            await batcher.submit(3)
+        release.set()
+        return await asyncio.gather(*accepted)
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    stats = batcher.stats()
+    assert (stats['rejected_records'], stats['records']) == (1, 3)
+
+
+def test_bulk_calls_share_the_admission_check():
+    '''Test the bulk calls run on the executor and count in the queue depth'''
+    release = threading.Event()
+
+    def blocked(records):
+        release.wait(5)
+        return records
+
+    batcher = MicroBatcher(blocked, max_batch_size=1, max_wait_ms=0, max_queue_depth=1)
+
+    async def run():
+        call = asyncio.ensure_future(batcher.run(blocked, [1, 2]))
+        await asyncio.sleep(0.05)
+        assert batcher.stats()['calls_in_flight'] == 1
+        with pytest.raises(QueueFullError):
+            await batcher.submit(3)
+        with pytest.raises(QueueFullError):
+            await batcher.run(blocked, [4])
+        release.set()
+        return await call
+
+    assert asyncio.run(run()) == [1, 2]
+    stats = batcher.stats()
+    assert (stats['rejected_records'], stats['calls_in_flight']) == (2, 0)
+
+
+def test_workers_predict_in_parallel():
+    '''Test several workers predict their batches at the same time'''
+    barrier = threading.Barrier(2, timeout=5)
+
+    def wait_for_the_other(records):
+        barrier.wait()
+        return records
+
+    executor = ThreadPoolExecutor(max_workers=2)
+    batcher = MicroBatcher(
+        wait_for_the_other, max_batch_size=1, max_wait_ms=0, executor=executor, workers=2)
+
+    async def run():
+        return await asyncio.gather(batcher.submit('a'), batcher.submit('b'))
+
+    assert asyncio.run(run()) == ['a', 'b']
+    executor.shutdown()
+
+    with pytest.raises(ValueError):
+        MicroBatcher(double, workers=0)
@@ -0,0 +1,49 @@
+'''
+Unit test of the bulk_scoring.py command line scorer with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import json
+import os
+import numpy as np
+import pandas as pd
+from bulk_scoring import score_file
+from serving.inference import load_model
+from tests.helpers import make_data
+
+MODEL_PATH = os.path.join('prod_deployment_path', 'model.pkl')
+
+
+def test_score_jsonl_in_order(tmp_path):
+    '''Test a jsonl file is scored in chunks and the output keeps the order'''
+    data = make_data(2500)
+    input_path = tmp_path / 'inputs.jsonl'
+    output_path = tmp_path / 'predictions.jsonl'
+    data.to_json(input_path, orient='records', lines=True)
+
+    n_chunks = score_file(str(input_path), str(output_path), MODEL_PATH, chunk_size=300, workers=2)
+
+    with open(output_path) as output_file:
+        predictions = [json.loads(line)['prediction'] for line in output_file]
+    expected = load_model(MODEL_PATH, compile_model=False).predict(data)
+    assert n_chunks == 9
+    np.testing.assert_array_equal(predictions, expected)
+
+
+def test_score_csv(tmp_path):
+    '''Test a csv file is scored into a csv file'''
+    data = make_data(1000)
+    input_path = tmp_path / 'inputs.csv'
+    output_path = tmp_path / 'predictions.csv'
+    data.to_csv(input_path, index=False)
+
+    score_file(str(input_path), str(output_path), MODEL_PATH, chunk_size=128, workers=2)
+
+    predictions = pd.read_csv(output_path)
+    model = load_model(MODEL_PATH, compile_model=False)
+    np.testing.assert_array_equal(predictions['prediction'], model.predict(data))
+    np.testing.assert_allclose(
+        predictions['risk_probability'], model.predict_proba(data)[:, 1], atol=1e-6)
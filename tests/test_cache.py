@@ -0,0 +1,53 @@
+'''
+Unit test of the prediction cache of serving/cache.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import time
+from serving.cache import PredictionCache
+
+
+def test_lru_eviction():
+    '''Test the least recently used entry is evicted when the cache is full'''
+    cache = PredictionCache(max_entries=2)
+    cache.put((1.0,), 1, 'v1')
+    cache.put((2.0,), 0, 'v1')
+
+    # touch the first entry so that the second one is the oldest
+    assert cache.get((1.0,), 'v1') == 1
+    cache.put((3.0,), 1, 'v1')
+
+    assert cache.get((2.0,), 'v1') is None
+    assert cache.get((3.0,), 'v1') == 1
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (2, 1, 1)
+
+
+def test_ttl_and_model_version():
+    '''Test expired entries and entries of another model are misses'''
+    cache = PredictionCache(max_entries=10, ttl=0.05)
+    cache.put((1.0,), 1, 'v1')
+    cache.put((2.0,), 0, 'v1')
+
+    assert cache.get((1.0,), 'v2') is None
+    time.sleep(0.06)
+    assert cache.get((2.0,), 'v1') is None
+    assert cache.stats()['expirations'] == 1
+
+    cache.put((3.0,), 1, 'v2')
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_disabled_cache():
+    '''Test a cache without capacity never keeps entries'''
+    cache = PredictionCache(max_entries=0)
+    cache.put((1.0,), 1, 'v1')
+
+    assert not cache.enabled
+    assert cache.get((1.0,), 'v1') is None
@@ -0,0 +1,112 @@
+'''
+Unit test of the chunked mode of the trusted data, basic clean
+and data check components with pytest: on data larger than the
+memory budget they give the same results as the in memory path
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'components'))
+# the shared helpers of the tests, also when this file runs as a script
+sys.path.append(ROOT_DIR)
+from dataset_format import read_dataset, read_trusted, to_arrow_table, write_dataset
+from dataset_statistics import DatasetStatistics
+from memory_usage import peak_rss_mb, rss_mb
+from tests.helpers import make_raw_files
+
+MEMORY_BUDGET_MB = 32
+CHUNK_SIZE = 10000
+
+
+def load_component(name, file_name):
+    spec = importlib.util.spec_from_file_location(
+        file_name, os.path.join(ROOT_DIR, 'components', name, file_name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_chunked(raw_dir, output_dir, chunk_size):
+    '''Run the three components in chunked mode and return the statistics
+    the clean step stores with the clean data, with the peak memory above
+    the one before the run'''
+    upload_trusted_data = load_component('02_upload_trusted_data', 'upload_trusted_data')
+    basic_clean = load_component('03_basic_clean', 'basic_clean')
+
+    def run(raw_dir, output_dir):
+        upload_trusted_data.stream_raw_data(
+            [raw_dir], os.path.join(output_dir, 'trusted.parquet'),
+            os.path.join(output_dir, 'train_set.parquet'), chunk_size)
+        statistics = DatasetStatistics()
+        basic_clean.clean_file(
+            os.path.join(output_dir, 'train_set.parquet'), os.path.join(output_dir, 'df_clean.parquet'),
+            chunk_size=chunk_size, statistics=statistics)
+        return statistics
+
+    # a first run on a small sample loads the lazy imports and the allocator pools
+    sample_dir = os.path.join(output_dir, 'sample')
+    os.makedirs(os.path.join(sample_dir, 'raw'))
+    first_file = os.path.join(raw_dir, sorted(os.listdir(raw_dir))[0])
+    pd.read_csv(first_file, nrows=1000).to_csv(os.path.join(sample_dir, 'raw', 'dataset.csv'), index=False)
+    run(os.path.join(sample_dir, 'raw'), sample_dir)
+
+    baseline = rss_mb()
+    statistics = run(raw_dir, output_dir)
+    return {'peak_mb': peak_rss_mb() - baseline, 'statistics': statistics.to_dict()}
+
+
+def test_chunked_mode_matches_in_memory(tmp_path):
+    '''Test the chunked mode stays within the memory budget on data larger
+    than it, and gives the same trusted rows, clean data and statistics'''
+    raw_dir, output_dir = str(tmp_path / 'raw'), str(tmp_path / 'chunked')
+    make_raw_files(
+        raw_dir, 12, 50000, corporations=[f'corp{j}' for j in range(200)], highs=(50, 500, 100), old_uploads=False)
+    os.makedirs(output_dir)
+
+    # a fresh process, so that its peak memory is the one of the chunked mode
+    result = subprocess.run(
+        [sys.executable, __file__, raw_dir, output_dir, str(CHUNK_SIZE)],
+        capture_output=True, text=True, check=True, cwd=ROOT_DIR)
+    chunked = json.loads(result.stdout.strip().splitlines()[-1])
+
+    upload_trusted_data = load_component('02_upload_trusted_data', 'upload_trusted_data')
+    basic_clean = load_component('03_basic_clean', 'basic_clean')
+    pdf = upload_trusted_data.transform_raw_data([raw_dir])
+    assert pdf.memory_usage(deep=True).sum() / 1e6 > 2 * MEMORY_BUDGET_MB
+    assert chunked['peak_mb'] < MEMORY_BUDGET_MB
+
+    # deduplication
+    # compared as arrow tables, pandas compares the string columns value by value
+    trusted = read_trusted(os.path.join(output_dir, 'trusted.parquet'))
+    assert to_arrow_table(trusted, with_id=True).equals(to_arrow_table(pdf, with_id=True))
+
+    # cleaning
+    write_dataset(pdf, str(tmp_path / 'train_set.parquet'))
+    basic_clean.clean_file(str(tmp_path / 'train_set.parquet'), str(tmp_path / 'df_clean.parquet'))
+    assert to_arrow_table(read_dataset(os.path.join(output_dir, 'df_clean.parquet'))).equals(
+        to_arrow_table(read_dataset(str(tmp_path / 'df_clean.parquet'))))
+
+    # statistics
+    expected = DatasetStatistics.from_frame(read_dataset(str(tmp_path / 'df_clean.parquet')))
+    statistics = DatasetStatistics.from_dict(chunked['statistics'])
+    assert statistics.n_rows == expected.n_rows == len(pdf)
+    assert statistics.columns == expected.columns
+    assert statistics.label_counts == expected.label_counts
+    for column, moments in expected.moments.items():
+        for name, value in moments.items():
+            assert np.isclose(statistics.moments[column][name], value, rtol=1e-12)
+
+
+if __name__ == '__main__':
+    print(json.dumps(run_chunked(sys.argv[1], sys.argv[2], int(sys.argv[3]))))
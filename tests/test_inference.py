@@ -0,0 +1,80 @@
+'''
+Unit test of the compiled inference path of serving/inference.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from serving.inference import CompiledPipeline, InferenceModel, load_model
+from tests.helpers import make_data
+
+FEATURES = ['lastmonth_activity', 'lastyear_activity', 'number_of_employees']
+MODEL_PATH = os.path.join('prod_deployment_path', 'model.pkl')
+
+
+def test_prod_model_parity():
+    '''Test the compiled prod model predicts exactly like sklearn'''
+    model = load_model(MODEL_PATH)
+    assert model.compiled is not None
+
+    data = make_data(50000)
+    np.testing.assert_array_equal(
+        model.predict(data), model.sk_pipe.predict(data))
+    np.testing.assert_allclose(
+        model.predict_proba(data), model.sk_pipe.predict_proba(data))
+
+
+def test_deep_tree_parity():
+    '''Test parity on a deep tree, including rows lying on the thresholds'''
+    data = make_data(5000, seed=1)
+    label = (data['lastmonth_activity'] * 3 > data['lastyear_activity'] % 997).astype(int)
+    sk_pipe = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            [('num', StandardScaler(), FEATURES)], remainder='drop')),
+        ('dt', DecisionTreeClassifier(random_state=42))])
+    sk_pipe.fit(data, label)
+
+    model = InferenceModel(sk_pipe)
+    compiled = model.compiled
+    assert compiled.max_depth == sk_pipe.named_steps['dt'].get_depth()
+
+    # raw values that are scaled exactly to the split thresholds
+    split = compiled.children_left != -1
+    on_threshold = data.iloc[:split.sum()].copy()
+    for row, (feature, threshold) in enumerate(
+            zip(compiled.feature[split], compiled.threshold[split])):
+        column = FEATURES[feature]
+        raw = threshold * compiled.scale[feature] + compiled.mean[feature]
+        on_threshold.iloc[row, on_threshold.columns.get_loc(column)] = np.floor(raw)
+
+    test_data = pd.concat([make_data(20000, seed=2), on_threshold])
+    np.testing.assert_array_equal(
+        model.predict(test_data), sk_pipe.predict(test_data))
+
+
+def test_fallback_to_sklearn():
+    '''Test pipelines with another shape are served by sklearn'''
+    data = make_data(200)
+    label = (data['lastmonth_activity'] > 1000).astype(int)
+    sk_pipe = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            [('num', MinMaxScaler(), FEATURES)], remainder='drop')),
+        ('dt', DecisionTreeClassifier(random_state=42))])
+    sk_pipe.fit(data, label)
+
+    with pytest.raises(ValueError):
+        CompiledPipeline.from_pipeline(sk_pipe)
+
+    model = InferenceModel(sk_pipe)
+    assert model.compiled is None
+    columns = {column: data[column].tolist() for column in FEATURES}
+    np.testing.assert_array_equal(model.predict(columns), sk_pipe.predict(data))
@@ -0,0 +1,52 @@
+'''
+Unit test of the load testing harness of benchmarks/load_test.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import asyncio
+import json
+import httpx
+from benchmarks.load_test import compare, run_load, synthetic_payloads
+from ml_api import app
+
+
+def test_run_load_in_process():
+    '''Test the harness replays the payloads and reports the percentiles'''
+    payloads = synthetic_payloads(20)
+    assert payloads == synthetic_payloads(20)
+
+    async def run():
+        async with httpx.AsyncClient(app=app, base_url='http://benchmark') as client:
+            return await run_load(
+                client, '/risk_assessment_prediction', payloads, 60, concurrency=8, rate=2000)
+
+    results = asyncio.run(run())
+
+    assert results['requests'] == 60
+    assert results['errors'] == 0
+    assert results['status_codes'] == {'200': 60}
+    latency = results['latency_ms']
+    assert latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+
+
+def test_compare_results(tmp_path):
+    '''Test two saved results are shown side by side'''
+    paths = []
+    for label, throughput in [('old', 100.0), ('new', 250.0)]:
+        report = {
+            'label': label, 'git_commit': 'abc123', 'model_version': 'v1',
+            'config': {'concurrency': 8, 'rate': 0.0},
+            'results': {
+                'requests': 10, 'errors': 0, 'throughput_rps': throughput,
+                'latency_ms': {'mean': 1.0, 'p50': 1.0, 'p95': 2.0, 'p99': 3.0, 'max': 4.0}}}
+        paths.append(str(tmp_path / f'{label}.json'))
+        with open(paths[-1], 'w') as result_file:
+            json.dump(report, result_file)
+
+    table = compare(paths)
+
+    assert 'old' in table and 'new' in table
+    assert '250.0' in table
@@ -0,0 +1,65 @@
+'''
+Unit test of the instrumentation of serving/metrics.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import threading
+from serving.metrics import LatencyHistogram, MetricsRegistry
+
+
+def test_histogram_buckets():
+    '''Test the latencies fall in cumulative buckets'''
+    histogram = LatencyHistogram(buckets=(0.001, 0.01))
+    for seconds in [0.0005, 0.001, 0.005, 0.5]:
+        histogram.observe(seconds)
+
+    assert histogram.cumulative_counts() == [2, 3, 4]
+    assert histogram.count == 4
+    assert abs(histogram.total - 0.5065) < 1e-9
+
+
+def test_render_prometheus_text():
+    '''Test the registry renders histograms, counters and gauges'''
+    registry = MetricsRegistry(namespace='test')
+    registry.observe_stage('model_predict', 0.0002)
+    registry.observe_request('/predict', 200, 0.001)
+    registry.observe_request('/predict', 500, 0.002)
+    registry.register_gauges('cache', lambda: {'hits': 3, 'ttl': None})
+
+    body = registry.render()
+
+    assert '# TYPE test_stage_latency_seconds histogram' in body
+    assert 'test_stage_latency_seconds_bucket{stage="model_predict",le="0.00025"} 1' in body
+    assert 'test_stage_latency_seconds_count{stage="model_predict"} 1' in body
+    assert 'test_requests_total{path="/predict",status="500"} 1' in body
+    assert 'test_errors_total{path="/predict"} 1' in body
+    assert 'test_cache_hits 3' in body
+    assert 'test_cache_ttl' not in body
+
+
+def test_render_while_new_paths_are_observed():
+    '''Test a scrape does not fail while the requests add new paths and stages'''
+    registry = MetricsRegistry(namespace='test')
+    errors = []
+
+    def observe(worker):
+        for i in range(300):
+            registry.observe_request(f'/path{worker}_{i}', 200 + i % 3, 0.001)
+            registry.observe_stage(f'stage{worker}_{i}', 0.001)
+
+    observers = [threading.Thread(target=observe, args=(worker,)) for worker in range(4)]
+    for thread in observers:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in observers):
+            registry.render()
+    except RuntimeError as err:
+        errors.append(err)
+    for thread in observers:
+        thread.join()
+
+    assert errors == []
+    assert len(registry.requests) == 1200
@@ -0,0 +1,75 @@
+'''
+Unit test of the model hot reload of serving/model_store.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import os
+import pickle
+import shutil
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+from serving.model_store import ModelStore
+
+FEATURES = ['lastmonth_activity', 'lastyear_activity', 'number_of_employees']
+MODEL_PATH = os.path.join('prod_deployment_path', 'model.pkl')
+SAMPLE = {
+    'lastmonth_activity': [45],
+    'lastyear_activity': [0],
+    'number_of_employees': [99]}
+
+
+def write_constant_model(path: str, label: int) -> None:
+    '''Pickle a pipeline that always predicts the same label'''
+    data = pd.DataFrame({column: [0, 1] for column in FEATURES})
+    sk_pipe = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            [('num', StandardScaler(), FEATURES)], remainder='drop')),
+        ('dt', DecisionTreeClassifier(random_state=42))])
+    sk_pipe.fit(data, [label, label])
+    with open(path, 'wb') as model_file:
+        pickle.dump(sk_pipe, model_file)
+
+
+def test_swap_new_model(tmp_path):
+    '''Test a new model is swapped in while old snapshots keep working'''
+    model_path = str(tmp_path / 'model.pkl')
+    shutil.copy(MODEL_PATH, model_path)
+    store = ModelStore(model_path)
+
+    in_flight = store.current
+    assert in_flight.model.predict(SAMPLE)[0] == 1
+    assert store.reload() is False
+
+    write_constant_model(model_path, 0)
+    assert store.reload() is True
+
+    assert store.current.version != in_flight.version
+    assert store.current.model.predict(SAMPLE)[0] == 0
+    # the request that took the old snapshot finishes on the old model
+    assert in_flight.model.predict(SAMPLE)[0] == 1
+
+
+def test_keep_model_when_reload_fails(tmp_path):
+    '''Test a half copied file doesn't replace the served model'''
+    model_path = str(tmp_path / 'model.pkl')
+    shutil.copy(MODEL_PATH, model_path)
+    store = ModelStore(model_path)
+    version = store.current.version
+
+    with open(MODEL_PATH, 'rb') as model_file:
+        content = model_file.read()
+    with open(model_path, 'wb') as model_file:
+        model_file.write(content[:len(content) // 2])
+
+    with pytest.raises(Exception):
+        store.reload()
+
+    assert store.current.version == version
+    assert store.status()['version'] == version
@@ -0,0 +1,86 @@
+'''
+Unit test of the prediction log of serving/prediction_log.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import os
+import time
+from serving.prediction_log import PredictionLog, read_prediction_log
+
+FEATURES = ['lastmonth_activity', 'lastyear_activity', 'number_of_employees']
+
+
+def record_rows(log, first, n_rows):
+    '''Record n_rows rows whose features are first, first + 1, ...'''
+    values = list(range(first, first + n_rows))
+    log.record(
+        [f'corp{value}' for value in values],
+        {column: values for column in FEATURES},
+        [value % 2 for value in values],
+        'v1')
+
+
+def test_flush_and_read_partitions(tmp_path):
+    '''Test the flushed records are read back from the hour partitions'''
+    log = PredictionLog(str(tmp_path), FEATURES, capacity=100)
+    record_rows(log, 0, 30)
+    record_rows(log, 30, 20)
+
+    assert log.flush() == 50
+    assert log.flush() == 0
+
+    partitions = [
+        os.path.relpath(root, tmp_path) for root, _, files in os.walk(tmp_path) if files]
+    assert len(partitions) == 1
+    assert partitions[0].startswith('date=') and '/hour=' in partitions[0]
+
+    current = read_prediction_log(str(tmp_path))
+    assert list(current.columns) == [
+        'corporation', *FEATURES, 'prediction', 'model_version', 'scored_at']
+    current = current.sort_values('lastmonth_activity')
+    assert current['lastyear_activity'].tolist() == list(range(50))
+    assert current['corporation'].tolist()[:2] == ['corp0', 'corp1']
+    assert current['prediction'].tolist()[:4] == [0, 1, 0, 1]
+
+    stats = log.stats()
+    assert (stats['recorded'], stats['written'], stats['dropped']) == (50, 50, 0)
+    assert stats['flushes'] == 1 and stats['last_flush_seconds'] > 0
+
+
+def test_full_buffer_drops_and_wraps(tmp_path):
+    '''Test a full buffer drops the new records and the ring wraps around'''
+    log = PredictionLog(str(tmp_path), FEATURES, capacity=10)
+    record_rows(log, 0, 8)
+    record_rows(log, 8, 5)
+    assert log.stats()['dropped'] == 3
+    assert log.flush() == 10
+
+    # the next records start in the middle of the ring and wrap around
+    record_rows(log, 100, 6)
+    record_rows(log, 106, 6)
+    assert log.flush() == 10
+
+    current = read_prediction_log(str(tmp_path))
+    assert sorted(current['lastmonth_activity'].tolist()) == \
+        list(range(10)) + list(range(100, 110))
+    assert log.stats()['dropped'] == 5
+
+
+def test_background_writer(tmp_path):
+    '''Test the writer flushes on its own and on stop'''
+    log = PredictionLog(str(tmp_path), FEATURES, capacity=100, flush_interval=0.05)
+    log.start()
+    record_rows(log, 0, 10)
+    for _ in range(100):
+        if log.stats()['written'] == 10:
+            break
+        time.sleep(0.01)
+    assert log.stats()['written'] == 10
+
+    record_rows(log, 10, 5)
+    log.stop()
+    assert log.stats()['written'] == 15
+    assert len(read_prediction_log(str(tmp_path))) == 15
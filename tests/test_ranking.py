@@ -0,0 +1,79 @@
+'''
+Unit test of the top N ranking of serving/ranking.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import asyncio
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from bulk_scoring import rank_file
+from serving.inference import load_model
+from serving.ranking import TopN
+from serving.records import stream_chunks
+
+MODEL_PATH = os.path.join('prod_deployment_path', 'model.pkl')
+
+
+def test_top_n_matches_full_sort():
+    '''Test the bounded heap keeps the same records as sorting everything'''
+    rng = np.random.default_rng(0)
+    # few distinct scores, so that there are many ties
+    scores = rng.integers(0, 20, 50000) / 20
+    ids = [f'id{row}' for row in range(scores.size)]
+
+    ranker = TopN(500)
+    for start in range(0, scores.size, 3000):
+        ranker.push(ids[start:start + 3000], scores[start:start + 3000])
+
+    # highest scores first, the earliest rows first on ties
+    expected = np.lexsort((np.arange(scores.size), -scores))[:500]
+    ranking = ranker.ranking()
+    assert ranker.population == 50000
+    assert [record['row'] for record in ranking] == expected.tolist()
+    assert [record['id'] for record in ranking] == [ids[row] for row in expected]
+    assert ranking[0]['rank'] == 1
+
+    with pytest.raises(ValueError):
+        TopN(0)
+
+
+def test_rank_file(tmp_path):
+    '''Test the ranking of a csv population scored by worker processes'''
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame({
+        'corporation': [f'c{row}' for row in range(3000)],
+        'lastmonth_activity': rng.integers(0, 2000, 3000),
+        'lastyear_activity': rng.integers(0, 15000, 3000),
+        'number_of_employees': rng.integers(0, 1500, 3000)})
+    input_path = tmp_path / 'population.csv'
+    data.to_csv(input_path, index=False)
+
+    ranking = rank_file(str(input_path), MODEL_PATH, top_n=50, chunk_size=400, workers=2)
+
+    risk = load_model(MODEL_PATH, compile_model=False).predict_proba(data)[:, 1]
+    expected = np.lexsort((np.arange(risk.size), -risk))[:50]
+    assert [record['id'] for record in ranking] == data['corporation'][expected].tolist()
+    np.testing.assert_allclose([record['risk_probability'] for record in ranking], risk[expected])
+
+
+def test_stream_chunks_across_pieces():
+    '''Test a body cut anywhere is split in chunks of whole lines'''
+    body = b'a,b\n1,2\n3,4\n\n5,6\n7,8'
+
+    async def pieces():
+        for start in range(0, len(body), 3):
+            yield body[start:start + 3]
+
+    async def collect():
+        return [chunk async for chunk in stream_chunks(pieces(), 3, 'csv')]
+
+    chunks = asyncio.run(collect())
+
+    assert chunks == [
+        ['a,b\n', '1,2\n', '3,4\n', '5,6\n'],
+        ['a,b\n', '7,8\n']]
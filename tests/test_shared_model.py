@@ -0,0 +1,69 @@
+'''
+Unit test of the shared model file of serving/shared_model.py with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import os
+import shutil
+import numpy as np
+import pytest
+from serving import model_store as model_store_module
+from serving.inference import load_model
+from serving.model_store import ModelStore
+from serving.shared_model import export_compiled, map_compiled
+from tests.helpers import make_data
+
+MODEL_PATH = os.path.join('prod_deployment_path', 'model.pkl')
+
+
+def test_mapped_arrays_predict_identically(tmp_path):
+    '''Test the mapped pipeline is read-only and predicts like sklearn'''
+    model = load_model(MODEL_PATH)
+    shared_path = str(tmp_path / 'model.bin')
+    export_compiled(model.compiled, shared_path)
+
+    mapped = map_compiled(shared_path)
+
+    assert isinstance(mapped.threshold.base, np.memmap)
+    assert not mapped.value.flags.writeable
+    data = make_data(10000)
+    X = mapped.to_array(data)
+    np.testing.assert_array_equal(mapped.predict(X), model.sk_pipe.predict(data))
+    np.testing.assert_allclose(mapped.predict_proba(X), model.sk_pipe.predict_proba(data))
+
+
+def test_workers_map_the_same_file(tmp_path, monkeypatch):
+    '''Test only the first worker unpickles the model, the others map its file'''
+    model_path = str(tmp_path / 'model.pkl')
+    shutil.copy(MODEL_PATH, model_path)
+    shared_dir = tmp_path / 'shm'
+    shared_dir.mkdir()
+
+    first = ModelStore(model_path, shared_dir=str(shared_dir))
+    assert first.status()['shared'] is True
+    assert 'unpickle' in first.last_load_timings
+
+    def fail(_):
+        raise AssertionError('the model should not be unpickled')
+    monkeypatch.setattr(model_store_module.pickle, 'loads', fail)
+
+    second = ModelStore(model_path, shared_dir=str(shared_dir))
+    assert second.current.version == first.current.version
+    assert 'unpickle' not in second.last_load_timings
+    assert os.listdir(shared_dir) == [f'risk_assessment_model_{first.current.version}.bin']
+
+    data = make_data(100)
+    np.testing.assert_array_equal(
+        second.current.model.predict(data), first.current.model.predict(data))
+
+
+def test_reject_other_files(tmp_path):
+    '''Test a file that is not a shared model is rejected'''
+    file_path = tmp_path / 'model.bin'
+    file_path.write_bytes(b'not a model' * 10)
+
+    with pytest.raises(ValueError):
+        map_compiled(str(file_path))
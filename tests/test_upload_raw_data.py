@@ -0,0 +1,163 @@
+'''
+Unit test of the raw data upload step of
+components/01_upload_raw_data with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import importlib.util
+import os
+import threading
+import time
+import pandas as pd
+
+spec = importlib.util.spec_from_file_location(
+    'upload_raw_data', os.path.join('components', '01_upload_raw_data', 'upload_raw_data.py'))
+upload_raw_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(upload_raw_data)
+
+
+class FlakyBucket(upload_raw_data.LocalBucket):
+    '''Local bucket whose first uploads of some blobs fail and that
+    counts the uploads running at the same time'''
+
+    def __init__(self, root_dir, failures=None, delay=0.0):
+        super().__init__(root_dir)
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def blob(self, blob_name, chunk_size=None):
+        blob = super().blob(blob_name, chunk_size)
+        blob.upload_from_string = self.flaky(blob_name, blob.upload_from_string)
+        blob.upload_from_filename = self.flaky(blob_name, blob.upload_from_filename)
+        return blob
+
+    def flaky(self, blob_name, upload):
+        def flaky_upload(*args, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+                failures = self.failures.get(blob_name, 0)
+                self.failures[blob_name] = failures - 1
+            try:
+                time.sleep(self.delay)
+                if failures > 0:
+                    raise ConnectionError('connection reset')
+                upload(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return flaky_upload
+
+
+def make_folder(folder, n_files):
+    '''Write n_files small csv files in folder'''
+    os.makedirs(folder)
+    for i in range(n_files):
+        pd.DataFrame({'corporation': ['nciw'], 'lastmonth_activity': [i]}).to_csv(
+            os.path.join(folder, f'dataset{i}.csv'), index=False)
+
+
+def test_concurrent_upload_with_retries(tmp_path):
+    '''Test every file is uploaded, concurrently, and the failures are retried'''
+    make_folder(tmp_path / 'train_data', 12)
+    bucket = FlakyBucket(
+        str(tmp_path / 'bucket'), failures={'raw/train_data/dataset3.csv': 2}, delay=0.02)
+
+    timings, failed, _ = upload_raw_data.upload_folder(
+        bucket, str(tmp_path / 'train_data'), 'raw/train_data/',
+        max_workers=4, retries=2, backoff=0.001)
+
+    assert failed == []
+    assert sorted(timings) == sorted(f'dataset{i}.csv' for i in range(12))
+    assert 1 < bucket.max_running <= 4
+    uploaded = pd.read_csv(tmp_path / 'bucket' / 'raw' / 'train_data' / 'dataset3.csv')
+    assert uploaded['lastmonth_activity'].tolist() == [3]
+
+
+def test_failed_files_are_not_ingested(tmp_path):
+    '''Test a file failing all its attempts is reported and left out of ingested_files'''
+    make_folder(tmp_path / 'train_data', 3)
+    bucket = FlakyBucket(str(tmp_path / 'bucket'), failures={'raw/dataset1.csv': 5})
+
+    timings, failed, _ = upload_raw_data.upload_folder(
+        bucket, str(tmp_path / 'train_data'), 'raw/', retries=1, backoff=0.001)
+    assert failed == ['dataset1.csv']
+
+    ingested_files_path = tmp_path / 'ingested_files'
+    upload_raw_data.write_ingested_files(
+        list(reversed(list(timings))), str(ingested_files_path))
+    assert ingested_files_path.read_text() == 'dataset0.csv\ndataset2.csv\n'
+
+
+def test_raw_mode_keeps_the_original_bytes(tmp_path):
+    '''Test the raw mode uploads the file byte for byte, in chunks, and
+    the csv mode rewrites it with an extra index column'''
+    make_folder(tmp_path / 'train_data', 1)
+    source = tmp_path / 'train_data' / 'dataset0.csv'
+    bucket = upload_raw_data.LocalBucket(str(tmp_path / 'bucket'))
+
+    upload_raw_data.upload_file(
+        bucket, str(source), 'raw/dataset0.csv', chunk_size=8, checksum='md5')
+    assert (tmp_path / 'bucket' / 'raw' / 'dataset0.csv').read_bytes() == source.read_bytes()
+
+    upload_raw_data.upload_file(bucket, str(source), 'csv/dataset0.csv', mode='csv')
+    rewritten = pd.read_csv(tmp_path / 'bucket' / 'csv' / 'dataset0.csv')
+    assert 'Unnamed: 0' in rewritten.columns
+
+
+def test_raw_mode_checksum_mismatch(tmp_path, monkeypatch):
+    '''Test an upload whose checksum does not match is retried and then fails'''
+    make_folder(tmp_path / 'train_data', 1)
+    monkeypatch.setattr(upload_raw_data, 'file_md5', lambda *args: 'corrupted')
+    bucket = upload_raw_data.LocalBucket(str(tmp_path / 'bucket'))
+
+    timings, failed, _ = upload_raw_data.upload_folder(
+        bucket, str(tmp_path / 'train_data'), 'raw/', retries=1, backoff=0.001, checksum='md5')
+
+    assert (timings, failed) == ({}, ['dataset0.csv'])
+    assert not (tmp_path / 'bucket' / 'raw' / 'dataset0.csv').exists()
+
+
+def test_manifest_skips_unchanged_files(tmp_path):
+    '''Test a second run only uploads the new and modified files and the
+    manifest tells which files are new since a given run'''
+    make_folder(tmp_path / 'train_data', 3)
+    bucket = upload_raw_data.LocalBucket(str(tmp_path / 'bucket'))
+    manifest_blob = 'raw/ingestion_manifest.json'
+
+    def ingestion_run():
+        manifest = upload_raw_data.IngestionManifest.download(bucket, manifest_blob)
+        manifest.start_run()
+        result = upload_raw_data.upload_folder(
+            bucket, str(tmp_path / 'train_data'), 'raw/train_data/', manifest=manifest)
+        manifest.upload(bucket, manifest_blob)
+        return result
+
+    timings, _, skipped = ingestion_run()
+    assert (len(timings), skipped) == (3, [])
+
+    # modify one file and add a new one
+    pd.DataFrame({'corporation': ['lsid'], 'lastmonth_activity': [7]}).to_csv(
+        tmp_path / 'train_data' / 'dataset1.csv', index=False)
+    pd.DataFrame({'corporation': ['abcd'], 'lastmonth_activity': [8]}).to_csv(
+        tmp_path / 'train_data' / 'dataset9.csv', index=False)
+    timings, _, skipped = ingestion_run()
+    assert sorted(timings) == ['dataset1.csv', 'dataset9.csv']
+    assert skipped == ['dataset0.csv', 'dataset2.csv']
+
+    manifest = upload_raw_data.IngestionManifest.download(bucket, manifest_blob)
+    assert manifest.last_run == 2
+    assert [entry['name'] for entry in manifest.new_since(1)] == ['dataset1.csv', 'dataset9.csv']
+    assert [entry['name'] for entry in manifest.changed_since(1)] == ['dataset1.csv']
+    assert len(manifest.new_since(0, 'raw/train_data/')) == 4
+    assert manifest.new_since(2) == []
+    entry = manifest.files['raw/train_data/dataset9.csv']
+    assert entry['size'] == (tmp_path / 'train_data' / 'dataset9.csv').stat().st_size
+    assert entry['md5'] == upload_raw_data.file_md5(str(tmp_path / 'train_data' / 'dataset9.csv'))
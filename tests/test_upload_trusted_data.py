@@ -0,0 +1,250 @@
+'''
+Unit test of the trusted data step of
+components/02_upload_trusted_data with pytest
+
+Author: Vitor Abdo
+Date: October/2026
+'''
+
+# import necessary packages
+import importlib.util
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    'upload_trusted_data',
+    os.path.join('components', '02_upload_trusted_data', 'upload_trusted_data.py'))
+upload_trusted_data = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(upload_trusted_data)
+
+sys.path.append('components')
+from dataset_format import (
+    DATASET_COLUMNS, DATASET_DTYPES, TRUSTED_ARROW_SCHEMA, dataset_bytes, iter_dataset, part_file_name, read_dataset,
+    read_trusted, write_dataset)
+from tests.helpers import make_raw_files
+
+
+class SlowBucket:
+    '''In memory bucket whose downloads take some time, like the network ones'''
+
+    class Blob:
+        def __init__(self, bucket, name):
+            self.bucket = bucket
+            self.name = name
+
+        def exists(self):
+            return self.name in self.bucket.blobs
+
+        def download_as_bytes(self):
+            time.sleep(self.bucket.delay)
+            self.bucket.downloads.append(self.name)
+            return self.bucket.blobs[self.name]
+
+        def download_to_filename(self, file_path):
+            with open(file_path, 'wb') as output_file:
+                output_file.write(self.download_as_bytes())
+
+        def upload_from_string(self, data, content_type=None):
+            self.bucket.blobs[self.name] = data
+
+        def delete(self):
+            del self.bucket.blobs[self.name]
+
+    def __init__(self, blobs, delay=0.0):
+        self.blobs = blobs
+        self.delay = delay
+        self.downloads = []
+
+    def list_blobs(self, prefix=''):
+        return [self.Blob(self, name) for name in self.blobs if name.startswith(prefix)]
+
+    def blob(self, blob_name):
+        return self.Blob(self, blob_name)
+
+
+def test_transform_matches_the_append_loop(tmp_path):
+    '''Test the single pass consolidation gives the rows of the old append loop'''
+    make_raw_files(tmp_path / 'raw', 6, 40)
+
+    pdf = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+
+    expected = pd.DataFrame(columns=list(upload_trusted_data.TRUSTED_SCHEMA))
+    for i in range(6):
+        current_pdf = pd.read_csv(tmp_path / 'raw' / f'dataset{i}.csv')
+        expected = pd.concat([expected, current_pdf]).reset_index(drop=True)
+    expected.drop([col for col in expected.columns if 'Unnamed' in col], axis=1, inplace=True)
+    expected.drop_duplicates(inplace=True)
+
+    assert list(pdf.columns) == list(upload_trusted_data.TRUSTED_SCHEMA)
+    assert pdf.index.tolist() == expected.index.tolist()
+    assert pdf.astype(str).values.tolist() == expected.astype(str).values.tolist()
+
+
+def test_missing_corporation_stays_missing(tmp_path):
+    '''Test a missing corporation is kept missing in the trusted rows and
+    their files, instead of becoming the string "nan"'''
+    os.makedirs(tmp_path / 'raw')
+    (tmp_path / 'raw' / 'dataset.csv').write_text(
+        'corporation,lastmonth_activity,lastyear_activity,number_of_employees,exited\n'
+        ',1,2,3,0\nabc,4,5,6,1\n')
+
+    pdf = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+    assert pdf['corporation'].isna().tolist() == [True, False]
+
+    write_dataset(pdf, str(tmp_path / 'trusted.parquet'), with_id=True)
+    assert pq.read_table(tmp_path / 'trusted.parquet').column('corporation').to_pylist() == [None, 'abc']
+
+
+def test_stream_writes_the_same_files(tmp_path):
+    '''Test the bounded memory mode writes the same csv files as the in memory one'''
+    make_raw_files(tmp_path / 'raw', 5, 37)
+    pdf = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+
+    rows_read, rows_written, hash_index = upload_trusted_data.stream_raw_data(
+        [str(tmp_path / 'raw')], str(tmp_path / 'trusted.csv'), str(tmp_path / 'dataset.csv'),
+        chunk_size=10, file_format='csv')
+
+    assert (rows_read, rows_written) == (5 * 37, len(pdf))
+    assert (hash_index == np.sort(upload_trusted_data.row_hashes(pdf))).all()
+    assert (tmp_path / 'trusted.csv').read_text() == pdf.to_csv()
+    assert (tmp_path / 'dataset.csv').read_text() == pdf.to_csv(index=False)
+
+
+def test_fetch_downloads_and_parses_in_memory(tmp_path):
+    '''Test the blobs are downloaded concurrently, straight to memory, and
+    give the same rows as the download to disk'''
+    make_raw_files(tmp_path / 'raw', 8, 25)
+    bucket = SlowBucket({
+        f'raw/train_data/{path.name}': path.read_bytes()
+        for path in (tmp_path / 'raw').iterdir()}, delay=0.2)
+
+    start = time.perf_counter()
+    pdf = upload_trusted_data.fetch_raw_data(bucket, 'raw/train_data/', max_workers=8)
+    elapsed = time.perf_counter() - start
+
+    # the 8 downloads of 0.2 seconds overlap instead of adding up
+    assert elapsed < 4 * bucket.delay
+    expected = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+    assert pdf.to_csv() == expected.to_csv()
+
+
+def test_parquet_trusted_files(tmp_path):
+    '''Test the parquet files have the bigquery schema and load the same
+    rows as the csv ones, which stay readable as a fallback'''
+    make_raw_files(tmp_path / 'raw', 5, 37)
+    pdf = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+
+    upload_trusted_data.stream_raw_data(
+        [str(tmp_path / 'raw')], str(tmp_path / 'trusted.parquet'), str(tmp_path / 'dataset.parquet'),
+        chunk_size=10, file_format='parquet')
+
+    trusted = pq.read_table(tmp_path / 'trusted.parquet')
+    assert trusted.schema.equals(TRUSTED_ARROW_SCHEMA)
+    assert trusted.column('ID').to_pylist() == pdf.index.tolist()
+    assert trusted.equals(pq.read_table(pa.BufferReader(dataset_bytes(pdf, 'parquet', with_id=True))))
+
+    dataset = read_dataset(str(tmp_path / 'dataset.parquet'), columns=DATASET_COLUMNS)
+    expected = read_dataset(pdf.to_csv(index=False).encode(), columns=DATASET_COLUMNS)
+    pd.testing.assert_frame_equal(dataset, expected)
+
+    # the old csv files with the index column load the same columns
+    (tmp_path / 'old.csv').write_text(pdf.to_csv())
+    pd.testing.assert_frame_equal(read_dataset(str(tmp_path / 'old.csv'), columns=DATASET_COLUMNS), expected)
+    assert read_dataset(str(tmp_path / 'dataset.parquet'), columns=['exited']).columns.tolist() == ['exited']
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'csv'])
+def test_loaders_use_the_compact_dtypes(tmp_path, file_format):
+    '''Test every loader gives the compact types, without the index column
+    of the old csv files, and refuses the integers that do not fit'''
+    make_raw_files(tmp_path / 'raw', 4, 25)
+    pdf = upload_trusted_data.transform_raw_data([str(tmp_path / 'raw')])
+    path = str(tmp_path / f'dataset.{file_format}')
+    trusted_path = str(tmp_path / f'trusted.{file_format}')
+    write_dataset(pdf, trusted_path, file_format, with_id=True)
+    if file_format == 'csv':
+        pdf.to_csv(path)
+    else:
+        write_dataset(pdf, path, file_format)
+
+    frames = [
+        read_dataset(path), read_dataset(path, columns=DATASET_COLUMNS), read_trusted(trusted_path),
+        *iter_dataset(path, 30), *iter_dataset(trusted_path, 30, with_id=True)]
+    for frame in frames:
+        assert frame.dtypes.astype(str).to_dict() == DATASET_DTYPES
+    assert frames[0].astype(str).values.tolist() == pdf.astype(str).values.tolist()
+    assert frames[2].index.tolist() == pdf.index.tolist()
+
+    # an integer column with missing values is float, one out of its type raises
+    pdf['number_of_employees'] = pdf['number_of_employees'].astype('Int64')
+    pdf.loc[pdf.index[0], 'number_of_employees'] = pd.NA
+    write_dataset(pdf, path, file_format)
+    assert read_dataset(path)['number_of_employees'].dtype == 'float64'
+    pdf.loc[pdf.index[0], 'number_of_employees'] = 2 ** 40
+    write_dataset(pdf, path, file_format)
+    with pytest.raises(ValueError):
+        read_dataset(path)
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'csv'])
+def test_incremental_update_matches_a_full_rebuild(tmp_path, file_format):
+    '''Test the part written from the new raw files through the hash index
+    gives, with the trusted set, the rows of a rebuild from the whole history,
+    without downloading the trusted set'''
+    make_raw_files(tmp_path / 'raw', 6, 30)
+    raw_blobs = {f'raw/{path.name}': path.read_bytes() for path in sorted((tmp_path / 'raw').iterdir())}
+    bucket = SlowBucket({name: data for name, data in raw_blobs.items() if name < 'raw/dataset4'})
+
+    trusted = upload_trusted_data.fetch_raw_data(bucket, 'raw/')
+    bucket.blob('trusted/train_set.' + file_format).upload_from_string(
+        dataset_bytes(trusted, file_format, with_id=True))
+    upload_trusted_data.save_hash_index(
+        bucket, 'trusted/row_hashes.npy', np.sort(upload_trusted_data.row_hashes(trusted)))
+    next_id = int(trusted.index.max()) + 1
+
+    # a second ingestion run brings two new files
+    bucket.blobs.update(raw_blobs)
+    bucket.downloads = []
+    hash_index = upload_trusted_data.load_hash_index(bucket, 'trusted/row_hashes.npy')
+    chunked_index, n_chunked = upload_trusted_data.stream_trusted_update(
+        bucket, ['raw/dataset4.csv', 'raw/dataset5.csv'], str(tmp_path / 'trusted'), str(tmp_path / 'dataset'),
+        hash_index, next_id, 7, file_format)
+    new_rows, hash_index = upload_trusted_data.update_trusted_data(
+        bucket, ['raw/dataset4.csv', 'raw/dataset5.csv'], hash_index, next_id)
+    assert not [name for name in bucket.downloads if name.startswith('trusted/train_set')]
+
+    rebuilt = upload_trusted_data.fetch_raw_data(bucket, 'raw/')
+    updated = pd.concat([trusted, new_rows])
+    assert len(new_rows) == n_chunked == len(rebuilt) - len(trusted) > 0
+    assert sorted(updated.astype(str).values.tolist()) == sorted(rebuilt.astype(str).values.tolist())
+    assert updated.index.is_unique and new_rows.index[0] == next_id
+    assert (hash_index == np.sort(upload_trusted_data.row_hashes(rebuilt))).all()
+
+    # the bounded memory update writes the same part
+    stored = read_trusted(dataset_bytes(new_rows, file_format, with_id=True), file_format)
+    pd.testing.assert_frame_equal(read_trusted(str(tmp_path / 'trusted'), file_format), stored)
+    pd.testing.assert_frame_equal(
+        read_dataset(str(tmp_path / 'dataset'), file_format=file_format), stored.reset_index(drop=True))
+    assert (chunked_index == hash_index).all()
+
+    # the downloaded artifact, the full set and its part, reads as the updated set
+    artifact_dir = tmp_path / 'artifact'
+    artifact_dir.mkdir()
+    write_dataset(trusted, str(artifact_dir / f'train_set.{file_format}'), file_format)
+    write_dataset(new_rows, str(artifact_dir / part_file_name(f'train_set.{file_format}', 2)), file_format)
+    expected = read_dataset(dataset_bytes(updated, file_format), file_format=file_format)
+    pd.testing.assert_frame_equal(read_dataset(str(artifact_dir)), expected, check_categorical=False)
+    chunks = list(iter_dataset(str(artifact_dir), 20))
+    assert sum(len(chunk) for chunk in chunks) == len(updated)
+
+    # a rebuild drops the parts of the previous runs
+    bucket.blob('trusted/' + part_file_name(f'train_set.{file_format}', 2)).upload_from_string(b'part')
+    assert upload_trusted_data.delete_trusted_parts(bucket, f'trusted/train_set.{file_format}') == 1
+    assert list(bucket.blobs).count(f'trusted/train_set.{file_format}') == 1
+    assert not [name for name in bucket.blobs if '.part-' in name]
\ No newline at end of file